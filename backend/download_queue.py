@@ -0,0 +1,35 @@
+"""下载队列：在线视频下载等 I/O 密集型任务在固定大小的线程池中排队执行，不阻塞事件循环。"""
+
+from __future__ import annotations
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+# 同时进行的下载数：每个下载内部还会并发拉取分片，过多会互相争抢带宽
+DOWNLOAD_WORKERS = 2
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_download_executor() -> ThreadPoolExecutor:
+    """获取全局下载线程池（首次调用时创建），超出 DOWNLOAD_WORKERS 的任务排队等待。"""
+
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=DOWNLOAD_WORKERS, thread_name_prefix="download"
+            )
+        return _executor
+
+
+def shutdown_download_executor() -> None:
+    """关闭下载线程池，服务退出时调用（未开始的任务直接取消）。"""
+
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
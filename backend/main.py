@@ -4,9 +4,14 @@ from __future__ import annotations
 
 import asyncio
 import errno
-import os
+import html
+import queue
 import shutil
 import sys
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, wait
+from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import List, Optional
 
@@ -32,6 +37,7 @@ from urllib.parse import quote, unquote
 from .utils import (
     BASE_DIR,
     STORAGE_DIR,
+    TEMP_DIR,
     build_file_url,
     create_job_dir,
     extract_archive,
@@ -39,9 +45,18 @@ from .utils import (
     make_zip,
     save_upload_file,
     maybe_prepare_cropped_video,
+    resolve_crop_rect,
 )
+from .download_queue import get_download_executor, shutdown_download_executor
 from .job_meta import load_job_meta, save_job_meta, update_job_progress
 from .pack_archive import make_zip_with_progress
+from .process_pool import (
+    QueueProgress,
+    get_process_pool,
+    progress_manager,
+    shutdown_process_pool,
+    threads_per_process,
+)
 
 # 将项目根目录加入路径，方便导入现有脚本
 if str(BASE_DIR) not in sys.path:
@@ -49,15 +64,49 @@ if str(BASE_DIR) not in sys.path:
 
 SCRIPTS_DIR = BASE_DIR / "scripts"
 
-from scripts.extract_frames import extract_frames  # noqa: E402
-from scripts.images_download import download_images_from_url  # noqa: E402
+from scripts.extract_frames import extract_frames, extract_keyframes  # noqa: E402
+from scripts.extract_frames_by_timestamps import (  # noqa: E402
+    build_video_index,
+    extract_frames_by_timestamps,
+    get_txt_files,
+)
+from scripts.frame_filters import FrameDeduplicator, SceneDetector  # noqa: E402
+from scripts.frame_shards import OUTPUT_MODES  # noqa: E402
+from scripts.frame_writer import INTERPOLATIONS, normalize_image_format  # noqa: E402
+from scripts.images_download import (  # noqa: E402
+    DEFAULT_MAX_PAGES,
+    crawl_images_from_url,
+    download_images_from_url,
+)
+from scripts.video_storyboard import generate_storyboard  # noqa: E402
+
+from .scrub_sprite import (  # noqa: E402
+    build_scrub_sprite,
+    get_cached_sprite,
+    is_valid_sprite_id,
+    sprite_content_id,
+)
 
 try:
-    from scripts.mp42mov import convert_to_live_photo  # noqa: E402
+    from scripts.mp42mov import (  # noqa: E402
+        convert_segments_to_live_photos,
+        convert_to_live_photo,
+        parse_segments,
+    )
 except ModuleNotFoundError:
     convert_to_live_photo = None
 try:
-    from scripts.mp42gif import mp4_to_gif as convert_mp4_to_gif  # noqa: E402
+    from scripts.mp42gif import (  # noqa: E402
+        ANIMATION_FORMATS,
+        FFMPEG_DITHERS,
+        GIF_PALETTES,
+        mp4_to_gif as convert_mp4_to_gif,
+        mp4_to_gif_ffmpeg,
+        mp4_to_gif_target_size,
+        mp4_to_loop_mp4,
+        mp4_to_webp,
+        resolve_gif_engine,
+    )
 except ModuleNotFoundError:
     convert_mp4_to_gif = None
 from scripts.scan import (  # noqa: E402
@@ -67,7 +116,12 @@ from scripts.scan import (  # noqa: E402
     scan_lan_devices,
     scan_devices_in_ranges,
 )
-from scripts.URL2mp4 import download_youtube_video  # noqa: E402
+from scripts.URL2mp4 import (  # noqa: E402
+    DEFAULT_CONCURRENT_FRAGMENTS,
+    MERGE_FORMATS,
+    DownloadCache,
+    download_youtube_video,
+)
 from scripts.yolo.json_to_yolo import decode_json  # noqa: E402
 from scripts.yolo.label_vis import process_all_annotations  # noqa: E402
 from scripts.yolo.write_img_path import generate_image_lists  # noqa: E402
@@ -83,7 +137,15 @@ assert split_spec.loader is not None
 split_spec.loader.exec_module(split_module)
 distribute_files = split_module.distribute_files
 
-app = FastAPI(title="脚本工具箱 API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    yield
+    # 服务退出时关闭后台进程池与下载队列
+    shutdown_process_pool()
+    shutdown_download_executor()
+
+
+app = FastAPI(title="脚本工具箱 API", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -120,12 +182,12 @@ def api_get_job(module_id: str, job_id: str) -> JSONResponse:
 def api_delete_job(module_id: str, job_id: str) -> JSONResponse:
     """
     删除指定模块下某个任务的结果目录（含本地存储的帧图、压缩包等）。
-    目前仅支持 extract-frames 模块；前端删除历史记录时调用此接口同步清理服务端。
+    目前仅支持 extract-frames 与 extract-frames-by-timestamps 模块；前端删除历史记录时调用此接口同步清理服务端。
     """
     if not job_id or not job_id.strip():
         raise HTTPException(status_code=400, detail="job_id 不能为空")
     # 仅允许删除已知模块，避免路径遍历
-    if module_id not in ("extract-frames",):
+    if module_id not in ("extract-frames", "extract-frames-by-timestamps"):
         raise HTTPException(
             status_code=400, detail=f"不支持删除模块 {module_id} 的任务"
         )
@@ -179,30 +241,59 @@ def gif_view_page(
     request: Request, file: str, title: Optional[str] = None
 ) -> HTMLResponse:
     """
-    微信友好：GIF 预览页。用于手机端长按保存/添加表情，或桌面端直接查看。
-    参数 `file` 形如 /files/.../xxx.gif
+    微信友好：动图预览页。用于手机端长按保存/添加表情，或桌面端直接查看。
+    参数 `file` 形如 /files/.../xxx.gif（也可以是同名的 .webp / .mp4）。
+    同目录下存在同名的其他格式时按客户端能力选择：支持 H.264 的浏览器播放循环 MP4，
+    其次动态 WebP，最后回退 GIF；微信内始终展示 GIF，保证长按可添加表情。
     """
     try:
         cleaned = (file or "").strip()
-        if not cleaned.startswith("/files/"):
-            raise ValueError("非法文件路径")
-        rel = cleaned[len("/files/") :]
-        gif_path = STORAGE_DIR / rel
-        if not gif_path.exists() or not gif_path.is_file():
-            raise FileNotFoundError("GIF 文件不存在")
-        if gif_path.suffix.lower() != ".gif":
-            raise ValueError("仅支持 .gif 文件")
+        anim_path = _resolve_storage_ref(cleaned)
+        if anim_path.suffix.lower() not in (".gif", ".webp", ".mp4"):
+            raise ValueError("仅支持 .gif / .webp / .mp4 文件")
     except Exception as exc:  # noqa: BLE001
         return HTMLResponse(
-            content=f"<h1>无法显示</h1><p>{str(exc)}</p>",
+            content=f"<h1>无法显示</h1><p>{html.escape(str(exc))}</p>",
             status_code=404,
         )
 
     base_url = str(request.base_url).rstrip("/")
-    gif_url = f"{base_url}{cleaned}"
-    display_title = (title or gif_path.stem).strip() or "GIF 预览"
+    url_dir = cleaned.rsplit("/", 1)[0]
+    urls = {}
+    for ext in (".gif", ".webp", ".mp4"):
+        sibling = anim_path.with_suffix(ext)
+        if sibling.is_file():
+            urls[ext] = html.escape(f"{base_url}{url_dir}/{quote(sibling.name)}")
+    display_title = html.escape((title or anim_path.stem).strip() or "动图预览")
+    is_wechat = "MicroMessenger" in request.headers.get("user-agent", "")
+
+    if ".gif" in urls and ".webp" in urls and not is_wechat:
+        image_html = (
+            f'<picture><source srcset="{urls[".webp"]}" type="image/webp" />'
+            f'<img src="{urls[".gif"]}" alt="{display_title}" /></picture>'
+        )
+    elif ".gif" in urls or ".webp" in urls:
+        image_html = f'<img src="{urls.get(".gif") or urls[".webp"]}" alt="{display_title}" />'
+    else:
+        image_html = ""
+
+    if ".mp4" in urls and not (is_wechat and image_html):
+        # 视频无法播放（如不支持 H.264）时换成图片
+        stage_html = (
+            f'<video src="{urls[".mp4"]}" autoplay loop muted playsinline '
+            f'onerror="var f=document.getElementById(\'fallback\');'
+            f'if(f&&f.innerHTML){{this.replaceWith(f.content.cloneNode(true));}}"></video>'
+            f'<template id="fallback">{image_html}</template>'
+        )
+    else:
+        stage_html = image_html
 
-    html = f"""<!DOCTYPE html>
+    labels = {".gif": "下载 GIF", ".webp": "下载 WebP", ".mp4": "下载 MP4"}
+    actions_html = "".join(
+        f'<a class="btn" href="{url}" download>{labels[ext]}</a>' for ext, url in urls.items()
+    )
+
+    page = f"""<!DOCTYPE html>
 <html lang="zh-CN">
   <head>
     <meta charset="UTF-8" />
@@ -234,7 +325,7 @@ def gif_view_page(
       .title {{ margin: 0 0 8px; font-size: 20px; font-weight: 700; }}
       .subtitle {{ margin: 0 0 14px; font-size: 13px; color: var(--muted); }}
       .stage {{ display: grid; place-items: center; background: #000; border-radius: 12px; overflow: hidden; }}
-      .stage img {{ width: 100%; height: auto; display: block; image-rendering: -webkit-optimize-contrast; }}
+      .stage img, .stage video {{ width: 100%; height: auto; display: block; image-rendering: -webkit-optimize-contrast; }}
       .hint {{ font-size: 12px; color: var(--muted); margin-top: 8px; }}
       .actions {{ display: flex; gap: 10px; flex-wrap: wrap; margin-top: 12px; }}
       .btn {{ padding: 8px 12px; border-radius: 10px; border: 1px solid rgba(255,255,255,0.12); background: rgba(255,255,255,0.04); color: var(--text); text-decoration: none; }}
@@ -245,16 +336,16 @@ def gif_view_page(
       <h1 class="title">{display_title}</h1>
       <p class="subtitle">长按图片可保存/添加到表情（微信内打开更友好）</p>
       <div class="stage">
-        <img src="{gif_url}" alt="{display_title}" />
+        {stage_html}
       </div>
       <div class="actions">
-        <a class="btn" href="{gif_url}" download>下载 GIF</a>
+        {actions_html}
       </div>
       <p class="hint">如在微信中打开：长按图片 → 保存图片/添加到表情。</p>
     </main>
   </body>
 </html>"""
-    return HTMLResponse(content=html)
+    return HTMLResponse(content=page)
 
 
 @app.get("/api/utils/qrcode")
@@ -289,126 +380,112 @@ def _extract_frames_with_progress(
     output_path: Path,
     output_dir_name: str,
     input_filename: str,
+    image_options: Optional[dict] = None,
+    mode: str = "interval",
+    dedup_threshold: Optional[int] = None,
+    scene_options: Optional[dict] = None,
+    shard_options: Optional[dict] = None,
 ):
     """
     后台任务：执行视频抽帧并更新进度。
+    mode 为 interval 时按帧率抽帧，为 keyframe 时仅解码关键帧，
+    为 scene 时按场景切换抽帧（scene_options 传给 SceneDetector）。
+    dedup_threshold 不为空时跳过与上一保留帧近似重复的帧。
+    shard_options 指定 tar / npy 输出时，帧直接写入少量大文件，不再打包 zip。
     """
-    import cv2
-
     try:
         # 初始化 meta.json（状态：running）
         update_job_progress(
             "extract-frames", job_id, 0.0, "正在解析视频...", status="running"
         )
 
-        # 打开视频文件
-        cap = cv2.VideoCapture(str(video_path))
-        if not cap.isOpened():
-            raise IOError("无法打开视频文件")
-
-        # 获取视频属性
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        duration = total_frames / fps if fps > 0 else 0
-        if end_sec == -1:
-            end_sec = duration
-
-        # 验证时间范围有效性
-        if start_sec < 0 or end_sec > duration or start_sec >= end_sec:
-            cap.release()
-            raise ValueError(f"无效时间范围 (视频时长: {duration:.2f}秒)")
-
-        # 将秒转换为帧号
-        start_frame = int(start_sec * fps)
-        end_frame = min(int(end_sec * fps), total_frames - 1)
-
-        # 计算帧间隔
-        interval = max(1, int(round(fps / n_fps)))  # 至少间隔1帧
-
-        # 估算需要处理的帧数（用于进度计算）
-        frames_to_process = end_frame - start_frame + 1
-        estimated_saved = max(1, frames_to_process // interval)
+        def on_extract_progress(percent: float, message: str) -> None:
+            update_job_progress(
+                "extract-frames", job_id, percent, message, status="running"
+            )
 
-        update_job_progress(
-            "extract-frames",
-            job_id,
-            5.0,
-            f"开始抽帧：预计生成约 {estimated_saved} 张图片",
-            status="running",
+        dedup = (
+            FrameDeduplicator(dedup_threshold) if dedup_threshold is not None else None
         )
 
-        # 定位到起始帧
-        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
-
-        count = 0
-        saved_count = 0
-        current_frame = start_frame
-        last_progress_update = 0
-
-        while current_frame <= end_frame:
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            # 检查是否达到保存间隔
-            if count % interval == 0:
-                # 计算当前时间戳
-                timestamp = current_frame / fps
-                frame_path = (
-                    output_path / f"{input_filename}_frame_{timestamp:.2f}s.jpg"
-                )
-                cv2.imwrite(str(frame_path), frame)
-                saved_count += 1
-
-                # 每保存 10 张图片或每 5% 进度更新一次
-                progress = (
-                    5.0 + ((current_frame - start_frame) / frames_to_process) * 95.0
-                )
-                if (
-                    saved_count - last_progress_update >= 10
-                    or progress - last_progress_update >= 5.0
-                ):
-                    update_job_progress(
-                        "extract-frames",
-                        job_id,
-                        progress,
-                        f"已抽取 {saved_count} 张图片...",
-                        status="running",
-                    )
-                    last_progress_update = progress
-
-            count += 1
-            current_frame += 1
+        scene_detector = (
+            SceneDetector(**(scene_options or {})) if mode == "scene" else None
+        )
 
-        cap.release()
+        # 解码在当前线程，编码写盘由脚本内部的线程池完成
+        timestamps: Optional[List[float]] = None
+        if mode == "keyframe":
+            timestamps = extract_keyframes(
+                video_path=str(video_path),
+                start_sec=start_sec,
+                end_sec=end_sec,
+                output_dir=str(output_path),
+                progress_callback=on_extract_progress,
+                filename=input_filename,
+                image_options=image_options,
+                dedup=dedup,
+                shard_options=shard_options,
+            )
+            saved_count = len(timestamps)
+        else:
+            saved_count = extract_frames(
+                video_path=str(video_path),
+                start_sec=start_sec,
+                end_sec=end_sec,
+                n_fps=n_fps,
+                output_dir=str(output_path),
+                progress_callback=on_extract_progress,
+                filename=input_filename,
+                image_options=image_options,
+                dedup=dedup,
+                scene_detector=scene_detector,
+                shard_options=shard_options,
+            )
 
         if saved_count == 0:
             raise ValueError("未生成任何图像文件")
 
-        # 打包阶段，带进度回调写入 meta
-        def on_zip_progress(zip_percent: float, message: str) -> None:
-            update_job_progress(
-                "extract-frames", job_id, zip_percent, message, status="running"
-            )
+        output_mode = (shard_options or {}).get("mode", "files")
+        zip_path: Optional[Path] = None
+        if output_mode == "files":
+            # 打包阶段，带进度回调写入 meta
+            def on_zip_progress(zip_percent: float, message: str) -> None:
+                update_job_progress(
+                    "extract-frames", job_id, zip_percent, message, status="running"
+                )
 
-        zip_path = output_path.parent / f"{output_dir_name}.zip"
-        make_zip_with_progress(output_path, zip_path, progress_callback=on_zip_progress)
+            zip_path = output_path.parent / f"{output_dir_name}.zip"
+            make_zip_with_progress(
+                output_path, zip_path, progress_callback=on_zip_progress
+            )
 
-        # 生成文件列表
+        # 生成文件列表；分片输出本身就是少量大文件，可直接下载，无需预览与打包
         files = sorted(iter_files(output_path))
         files_urls = [build_file_url(file_path) for file_path in files]
         preview_limit = 8
-        previews = files_urls[:preview_limit]
+        previews = files_urls[:preview_limit] if output_mode == "files" else []
+
+        dropped = dedup.dropped if dedup is not None else 0
+        message = f"抽帧完成，共生成 {saved_count} 张图片"
+        if dropped:
+            message += f"（已跳过 {dropped} 张重复帧）"
 
         result = {
-            "message": f"抽帧完成，共生成 {saved_count} 张图片",
+            "message": message,
             "job_id": job_id,
             "input_filename": input_filename,
-            "archive": build_file_url(zip_path),
+            "archive": build_file_url(zip_path) if zip_path is not None else None,
             "files": files_urls,
             "total_files": len(files_urls),
             "previews": previews,
+            "mode": mode,
+            "output_mode": output_mode,
+            "dropped_duplicates": dropped,
         }
+        if scene_detector is not None:
+            result["scenes"] = scene_detector.scenes
+        if timestamps is not None:
+            result["timestamps"] = [round(t, 3) for t in timestamps]
 
         # 最终保存（100%，状态：success）
         save_job_meta("extract-frames", job_id, result, status="success")
@@ -436,18 +513,73 @@ async def api_extract_frames(
     video: UploadFile = File(...),
     start_sec: Optional[float] = Form(None),
     end_sec: Optional[float] = Form(None),
-    n_fps: int = Form(...),
+    n_fps: Optional[int] = Form(None),
     output_dir: str = Form("frames"),
     crop_x: Optional[int] = Form(None),
     crop_y: Optional[int] = Form(None),
     crop_w: Optional[int] = Form(None),
     crop_h: Optional[int] = Form(None),
+    image_format: str = Form("jpg"),
+    quality: Optional[int] = Form(None),
+    max_edge: Optional[int] = Form(None),
+    interpolation: str = Form("area"),
+    grayscale: bool = Form(False),
+    mode: str = Form("interval"),
+    dedup_threshold: Optional[int] = Form(None),
+    scene_threshold: Optional[float] = Form(None),
+    min_scene_frames: Optional[int] = Form(None),
+    max_scene_frames: Optional[int] = Form(None),
+    output_mode: str = Form("files"),
+    shard_size_mb: Optional[float] = Form(None),
 ):
     """
     视频抽帧接口（异步模式）。
     上传完成后立即返回 job_id，后台异步执行抽帧任务。
     前端可通过 /api/jobs/extract-frames/{job_id} 轮询获取进度。
+    可通过 image_format/quality/max_edge/interpolation/grayscale 控制输出图片，
+    缩放与编码在抽帧过程中完成，不会先写出原图。
+    mode：interval（默认，按 n_fps 抽帧）、keyframe（仅解码关键帧，结果附带真实时间戳）
+    或 scene（按场景切换抽帧，可配合 scene_threshold/min_scene_frames/max_scene_frames）。
+    dedup_threshold：近重复帧过滤阈值（dHash 汉明距离），留空不过滤。
+    output_mode：files（默认，逐帧图片 + zip）、tar（WebDataset 风格 tar 分片，
+    分片大小由 shard_size_mb 控制）或 npy（单个 .npy 帧堆栈 + 时间戳索引 JSON）。
     """
+    try:
+        mode = (mode or "interval").strip().lower()
+        if mode not in ("interval", "keyframe", "scene"):
+            raise ValueError(f"不支持的抽帧模式: {mode}")
+        if mode == "interval" and (n_fps is None or n_fps <= 0):
+            raise ValueError("请填写有效的抽帧帧率 n_fps")
+        if dedup_threshold is not None and not (0 <= dedup_threshold <= 64):
+            raise ValueError("去重阈值需在 0-64 之间")
+        scene_options = {}
+        if scene_threshold is not None:
+            if not (0 < scene_threshold <= 255):
+                raise ValueError("场景切换阈值需在 0-255 之间")
+            scene_options["threshold"] = scene_threshold
+        if min_scene_frames is not None:
+            scene_options["min_scene_frames"] = max(1, min_scene_frames)
+        if max_scene_frames is not None and max_scene_frames > 0:
+            scene_options["max_scene_frames"] = max_scene_frames
+        image_options = {
+            "image_format": normalize_image_format(image_format),
+            "quality": quality,
+            "max_edge": max_edge,
+            "interpolation": (interpolation or "area").strip().lower(),
+            "grayscale": grayscale,
+        }
+        if image_options["interpolation"] not in INTERPOLATIONS:
+            raise ValueError(f"不支持的插值方式: {interpolation}")
+        shard_options = {"mode": (output_mode or "files").strip().lower()}
+        if shard_options["mode"] not in OUTPUT_MODES:
+            raise ValueError(f"不支持的输出模式: {output_mode}")
+        if shard_options["mode"] == "tar" and shard_size_mb is not None:
+            if shard_size_mb <= 0:
+                raise ValueError("分片大小需大于 0")
+            shard_options["shard_size_mb"] = shard_size_mb
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
     job_id, job_dir = create_job_dir("extract-frames")
     input_filename = (video.filename or "").strip() or "video"
     video_path = job_dir / input_filename
@@ -478,10 +610,15 @@ async def api_extract_frames(
         video_path=video_path,
         start_sec=float(start_sec) if start_sec is not None else 0.0,
         end_sec=float(end_sec) if end_sec is not None else -1,
-        n_fps=int(n_fps),
+        n_fps=int(n_fps or 0),
         output_path=output_path,
         output_dir_name=output_dir_name,
         input_filename=input_filename,
+        image_options=image_options,
+        mode=mode,
+        dedup_threshold=dedup_threshold,
+        scene_options=scene_options,
+        shard_options=shard_options,
     )
 
     # 立即返回 job_id，前端开始轮询
@@ -582,32 +719,433 @@ async def api_extract_single_frame(
     }
 
 
+def _resolve_storage_ref(ref: str) -> Path:
+    """
+    将 /files/... 形式的文件引用解析为存储目录内的真实路径，
+    用于复用之前任务已上传的视频，禁止越出存储目录。
+    """
+    cleaned = unquote((ref or "").strip())
+    if not cleaned.startswith("/files/"):
+        raise ValueError(f"非法文件引用：{ref}")
+    path = (STORAGE_DIR / cleaned[len("/files/") :]).resolve()
+    if STORAGE_DIR.resolve() not in path.parents or not path.is_file():
+        raise FileNotFoundError(f"引用的文件不存在：{ref}")
+    return path
+
+
+def _extract_frames_by_timestamps_batch(
+    job_id: str,
+    items: List[dict],
+    output_root: Path,
+    image_options: Optional[dict] = None,
+    unmatched: Optional[List[str]] = None,
+):
+    """
+    后台任务：每个视频一个进程池任务并行抽帧。工作进程每处理一个时间节点就通过队列上报进度，
+    整体进度取各视频进度的平均值；每完成一个视频更新一次 meta 中的逐视频状态。
+    items 中每项包含 name/video_path/txt_path/output_dir，处理后补充 status/saved/skipped。
+    """
+    module_id = "extract-frames-by-timestamps"
+    try:
+        total = len(items)
+        update_job_progress(
+            module_id, job_id, 0.0, f"开始处理 {total} 个视频...", status="running"
+        )
+
+        def public_items() -> List[dict]:
+            keys = ("name", "video", "status", "saved", "skipped", "error")
+            return [{k: item[k] for k in keys if k in item} for item in items]
+
+        with progress_manager() as manager:
+            progress_queue = manager.Queue()
+            pool = get_process_pool()
+            futures = {}
+            for index, item in enumerate(items):
+                item["status"] = "running"
+                future = pool.submit(
+                    extract_frames_by_timestamps,
+                    video_path=item["video_path"],
+                    txt_path=item["txt_path"],
+                    output_dir=item["output_dir"],
+                    workers=threads_per_process(),
+                    image_options=image_options,
+                    progress_callback=QueueProgress(progress_queue, index),
+                )
+                futures[future] = index
+
+            fractions = [0.0] * total
+            done = 0
+            pending = set(futures)
+            while pending:
+                finished, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                message = None
+                while True:
+                    try:
+                        index, percent, _ = progress_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    fractions[index] = max(fractions[index], min(percent, 100.0) / 100.0)
+                    message = (
+                        f"已完成 {done}/{total} 个视频，"
+                        f"{items[index]['name']} 抽帧 {percent:.0f}%"
+                    )
+
+                for future in finished:
+                    index = futures[future]
+                    item = items[index]
+                    try:
+                        saved, skipped = future.result()
+                        item.update(status="success", saved=saved, skipped=skipped)
+                    except Exception as exc:  # noqa: BLE001
+                        item.update(status="failed", error=str(exc))
+                    fractions[index] = 1.0
+                    done += 1
+                if finished:
+                    meta = load_job_meta(module_id, job_id)
+                    meta["videos"] = public_items()
+                    save_job_meta(module_id, job_id, meta)
+                    message = f"已完成 {done}/{total} 个视频"
+
+                if message is not None:
+                    update_job_progress(
+                        module_id,
+                        job_id,
+                        sum(fractions) / total * 90.0,
+                        message,
+                        status="running",
+                    )
+
+        total_saved = sum(item.get("saved", 0) for item in items)
+        if total_saved == 0:
+            errors = [item["error"] for item in items if item.get("error")]
+            raise ValueError(errors[0] if errors else "未生成任何图像文件")
+
+        def on_zip_progress(zip_percent: float, message: str) -> None:
+            update_job_progress(
+                module_id, job_id, 90.0 + zip_percent * 0.1, message, status="running"
+            )
+
+        zip_path = output_root.parent / f"{output_root.name}.zip"
+        make_zip_with_progress(output_root, zip_path, progress_callback=on_zip_progress)
+
+        files_urls = [build_file_url(path) for path in sorted(iter_files(output_root))]
+        failed = [item for item in items if item["status"] == "failed"]
+        message = f"抽帧完成，共处理 {total} 个视频，生成 {total_saved} 张图片"
+        if failed:
+            message += f"（{len(failed)} 个视频失败）"
+
+        result = {
+            "message": message,
+            "job_id": job_id,
+            "archive": build_file_url(zip_path),
+            "files": files_urls,
+            "total_files": len(files_urls),
+            "previews": files_urls[:8],
+            "videos": public_items(),
+            "unmatched": unmatched or [],
+        }
+        save_job_meta(module_id, job_id, result, status="success")
+        update_job_progress(module_id, job_id, 100.0, "处理完成", status="success")
+
+    except Exception as exc:  # noqa: BLE001
+        error_result = {
+            "job_id": job_id,
+            "message": f"处理失败：{str(exc)}",
+            "status": "failed",
+            "videos": [
+                {k: item[k] for k in ("name", "status", "error") if k in item}
+                for item in items
+            ],
+        }
+        save_job_meta(module_id, job_id, error_result, status="failed")
+        update_job_progress(
+            module_id, job_id, 0.0, f"处理失败：{str(exc)}", status="failed"
+        )
+
+
+@app.post("/api/tasks/extract-frames-by-timestamps")
+async def api_extract_frames_by_timestamps(
+    background_tasks: BackgroundTasks,
+    timestamps_archive: UploadFile = File(...),
+    videos: Optional[List[UploadFile]] = File(None),
+    video_refs: str = Form(""),
+    image_format: str = Form("jpg"),
+    quality: Optional[int] = Form(None),
+    max_edge: Optional[int] = Form(None),
+    interpolation: str = Form("area"),
+    grayscale: bool = Form(False),
+):
+    """
+    按时间节点批量抽帧接口（异步模式）。
+    timestamps_archive 为单个 txt 或包含多个 txt 的 zip/tar 包（每行一个 hour:min:second），
+    每个 txt 按文件名匹配同名视频；视频可通过 videos 上传，
+    或在 video_refs 中填写之前任务中已上传视频的 /files/... 地址（逗号或换行分隔）。
+    每个视频在进程池中并行处理，前端可通过 /api/jobs/extract-frames-by-timestamps/{job_id}
+    轮询整体进度与 videos 字段中的逐个视频状态。
+    """
+    module_id = "extract-frames-by-timestamps"
+    try:
+        image_options = {
+            "image_format": normalize_image_format(image_format),
+            "quality": quality,
+            "max_edge": max_edge,
+            "interpolation": (interpolation or "area").strip().lower(),
+            "grayscale": grayscale,
+        }
+        if image_options["interpolation"] not in INTERPOLATIONS:
+            raise ValueError(f"不支持的插值方式: {interpolation}")
+        ref_paths = [
+            _resolve_storage_ref(ref)
+            for ref in video_refs.replace(",", "\n").splitlines()
+            if ref.strip()
+        ]
+    except (ValueError, FileNotFoundError) as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    job_id, job_dir = create_job_dir(module_id)
+
+    # 保存时间节点文件：单个 txt 直接放入目录，压缩包则解压
+    timestamps_dir = job_dir / "timestamps"
+    archive_name = Path(timestamps_archive.filename or "timestamps.txt").name
+    archive_path = job_dir / archive_name
+    save_upload_file(timestamps_archive, archive_path)
+    try:
+        if archive_path.suffix.lower() == ".txt":
+            timestamps_dir.mkdir(parents=True, exist_ok=True)
+            shutil.move(str(archive_path), timestamps_dir / archive_name)
+        else:
+            extract_archive(archive_path, timestamps_dir)
+        txt_files = get_txt_files(str(timestamps_dir))
+    except (ValueError, FileNotFoundError) as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    # 上传的视频优先，其次是引用的已有视频；只遍历一次目录建立文件名索引
+    videos_dir = job_dir / "videos"
+    for video in videos or []:
+        if video.filename:
+            save_upload_file(video, videos_dir / Path(video.filename).name)
+    video_index = build_video_index(str(videos_dir)) if videos_dir.exists() else {}
+    for ref_path in ref_paths:
+        video_index.setdefault(ref_path.stem, str(ref_path))
+
+    output_root = job_dir / "frames"
+    items: List[dict] = []
+    unmatched: List[str] = []
+    for txt_file in txt_files:
+        name = Path(txt_file).stem
+        video_path = video_index.get(name)
+        if video_path is None:
+            unmatched.append(Path(txt_file).name)
+            continue
+        items.append(
+            {
+                "name": name,
+                "video": Path(video_path).name,
+                "video_path": video_path,
+                "txt_path": txt_file,
+                "output_dir": str(output_root / name),
+                "status": "pending",
+            }
+        )
+    if not items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"没有找到与时间节点文件同名的视频：{', '.join(unmatched)}",
+        )
+
+    initial_meta = {
+        "job_id": job_id,
+        "message": "任务已创建，等待处理",
+        "status": "pending",
+        "progress": 0.0,
+        "progress_message": "任务已创建",
+        "videos": [
+            {"name": item["name"], "video": item["video"], "status": "pending"}
+            for item in items
+        ],
+        "unmatched": unmatched,
+    }
+    save_job_meta(module_id, job_id, initial_meta, status="pending")
+
+    background_tasks.add_task(
+        _extract_frames_by_timestamps_batch,
+        job_id=job_id,
+        items=items,
+        output_root=output_root,
+        image_options=image_options,
+        unmatched=unmatched,
+    )
+
+    return {
+        "job_id": job_id,
+        "message": f"任务已创建，共匹配 {len(items)} 个视频，正在后台处理",
+        "status": "pending",
+        "videos": initial_meta["videos"],
+        "unmatched": unmatched,
+    }
+
+
+@app.post("/api/tasks/video-storyboard")
+def api_video_storyboard(
+    video: UploadFile = File(...),
+    interval: Optional[float] = Form(None),
+    columns: int = Form(5),
+    rows: int = Form(5),
+    thumb_width: int = Form(160),
+    image_format: str = Form("jpg"),
+    quality: Optional[int] = Form(None),
+):
+    """
+    生成视频故事板：少量缩略图大图 + WebVTT 缩略图轨道。
+    只顺序解码一次视频，适合快速浏览视频内容；VTT 中的大图地址为相对路径，
+    与大图位于同一目录，可直接作为播放器的 thumbnails 轨道使用。
+    同步端点：整段解码由 FastAPI 放入线程池执行，不阻塞事件循环。
+    """
+    try:
+        image_options = {
+            "image_format": normalize_image_format(image_format),
+            "quality": quality,
+        }
+        if interval is not None and interval <= 0:
+            raise ValueError("缩略图间隔必须大于 0")
+        if not (1 <= columns <= 20 and 1 <= rows <= 20):
+            raise ValueError("行数与列数需在 1-20 之间")
+        if not (32 <= thumb_width <= 640):
+            raise ValueError("缩略图宽度需在 32-640 像素之间")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    job_id, job_dir = create_job_dir("video-storyboard")
+    video_path = job_dir / video.filename
+    save_upload_file(video, video_path)
+
+    try:
+        result = generate_storyboard(
+            video_path=str(video_path),
+            output_dir=str(job_dir / "storyboard"),
+            interval=interval,
+            columns=columns,
+            rows=rows,
+            thumb_width=thumb_width,
+            filename=video_path.stem,
+            image_options=image_options,
+        )
+    except Exception as exc:  # noqa: BLE001
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    sheet_urls = [build_file_url(Path(path)) for path in result["sheets"]]
+    vtt_url = build_file_url(Path(result["vtt"]))
+    return {
+        "message": (
+            f"故事板生成完成：{result['thumbnails']} 张缩略图，"
+            f"每 {result['interval']:.2f} 秒一张，共 {len(sheet_urls)} 张大图"
+        ),
+        "job_id": job_id,
+        "files": sheet_urls + [vtt_url],
+        "previews": sheet_urls,
+        "total_files": len(sheet_urls) + 1,
+        "vtt": vtt_url,
+        "interval": result["interval"],
+        "tile_width": result["tile_width"],
+        "tile_height": result["tile_height"],
+    }
+
+
+@app.get("/api/video-sprites")
+def api_get_video_sprite(sprite_id: str) -> JSONResponse:
+    """
+    查询缩略图条缓存。sprite_id 由 POST 接口按视频内容生成并返回，命中时返回大图与 JSON 索引地址，
+    前端据此在拖动进度条时本地显示预览，无需再次上传视频。
+    """
+    sprite_id = sprite_id.strip()
+    if not is_valid_sprite_id(sprite_id):
+        raise HTTPException(status_code=400, detail="无效的 sprite_id")
+    cached = get_cached_sprite(sprite_id)
+    if cached is None:
+        raise HTTPException(status_code=404, detail="缩略图条尚未生成或已过期")
+    return JSONResponse(cached)
+
+
+@app.post("/api/video-sprites")
+def api_create_video_sprite(video: UploadFile = File(...)) -> JSONResponse:
+    """
+    为视频生成缩略图条（默认每秒一张，全部拼在一张大图中）并缓存。
+    以上传内容的哈希作为 sprite_id，同一视频已缓存时直接返回。
+    """
+    video_path = TEMP_DIR / f"sprite-{uuid.uuid4().hex}{Path(video.filename or '').suffix}"
+    save_upload_file(video, video_path)
+    try:
+        return JSONResponse(build_scrub_sprite(sprite_content_id(video_path), video_path))
+    except Exception as exc:  # noqa: BLE001
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    finally:
+        video_path.unlink(missing_ok=True)
+
+
 @app.post("/api/tasks/mp4-to-gif")
-async def api_mp4_to_gif(
+def api_mp4_to_gif(
     video: UploadFile = File(...),
     start_sec: Optional[float] = Form(None),
     end_sec: Optional[float] = Form(None),
     color_depth: Optional[int] = Form(None),
     scale: Optional[float] = Form(None),
+    engine: str = Form("auto"),
+    dither: str = Form("sierra2_4a"),
+    palette: str = Form("adaptive"),
+    max_bytes: Optional[int] = Form(None),
+    output_format: str = Form("gif"),
     crop_x: Optional[int] = Form(None),
     crop_y: Optional[int] = Form(None),
     crop_w: Optional[int] = Form(None),
     crop_h: Optional[int] = Form(None),
 ):
+    """
+    视频转 GIF / WebP / MP4 动画。
+    同步端点：调色板编码、目标体积搜索等由 FastAPI 放入线程池执行，不阻塞事件循环。
+    """
     if convert_mp4_to_gif is None:
         raise HTTPException(
             status_code=503, detail="GIF 转换功能暂时不可用，请稍后重试"
         )
+    try:
+        engine_name = resolve_gif_engine(engine)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except RuntimeError as exc:
+        raise HTTPException(status_code=503, detail=str(exc)) from exc
+    dither_name = (dither or "sierra2_4a").strip().lower()
+    if dither_name not in FFMPEG_DITHERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"dither 仅支持: {', '.join(FFMPEG_DITHERS)}",
+        )
+    palette_mode = (palette or "adaptive").strip().lower()
+    if palette_mode not in GIF_PALETTES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"palette 仅支持: {', '.join(GIF_PALETTES)}",
+        )
+    if max_bytes is not None and max_bytes <= 0:
+        raise HTTPException(status_code=400, detail="max_bytes 必须为正整数")
+    fmt = (output_format or "gif").strip().lower()
+    formats = list(ANIMATION_FORMATS) if fmt == "all" else [fmt]
+    if any(f not in ANIMATION_FORMATS for f in formats):
+        raise HTTPException(
+            status_code=400,
+            detail=f"output_format 仅支持: {', '.join(ANIMATION_FORMATS)}, all",
+        )
 
     job_id, job_dir = create_job_dir("mp4-to-gif")
     video_path = job_dir / video.filename
     save_upload_file(video, video_path)
-    video_path = maybe_prepare_cropped_video(
-        job_dir, video_path, crop_x, crop_y, crop_w, crop_h
-    )
-
-    # 输出 GIF 文件名采用源视频名
-    output_path = job_dir / f"{video_path.stem}.gif"
+    # 各格式输出放在同一目录并使用相同文件名，/gif 预览页据此查找同名的其他格式
+    out_dir = job_dir / "animation"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_stem = Path(video.filename).stem or "animation"
+    try:
+        crop = resolve_crop_rect(video_path, crop_x, crop_y, crop_w, crop_h)
+    except Exception as exc:  # noqa: BLE001
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
 
     # 归一化参数
     start = float(start_sec) if start_sec is not None else 0.0
@@ -617,51 +1155,258 @@ async def api_mp4_to_gif(
     if not (0.1 <= scl <= 1.0):
         scl = 1.0
 
-    # mp4_to_gif 需要数值型 end_time；若未提供，则读取视频时长
-    if end_sec is None:
+    outputs = []
+    if "webp" in formats or "mp4" in formats:
         try:
-            from moviepy import VideoFileClip as _VideoFileClip  # type: ignore
+            end_opt = float(end_sec) if end_sec is not None else None
+            if "mp4" in formats:
+                mp4_path = out_dir / f"{out_stem}.mp4"
+                mp4_to_loop_mp4(
+                    str(video_path), str(mp4_path), start, end_opt, scale=scl, crop=crop
+                )
+                outputs.append(mp4_path)
+            if "webp" in formats:
+                webp_path = out_dir / f"{out_stem}.webp"
+                mp4_to_webp(
+                    str(video_path), str(webp_path), start, end_opt, scale=scl, crop=crop
+                )
+                outputs.append(webp_path)
+        except RuntimeError as exc:
+            raise HTTPException(status_code=503, detail=str(exc)) from exc
+        except Exception as exc:  # noqa: BLE001
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    fit = None
+    if "gif" in formats:
+        if max_bytes is not None:
+            # 目标体积模式：试编码 + 二分查找 scale / fps / colors，上传一次即可得到满足体积的 GIF
+            try:
+                if engine_name == "pil":
+                    # pil 引擎不支持滤镜图内裁剪，先生成裁剪后的视频
+                    video_path = maybe_prepare_cropped_video(
+                        job_dir, video_path, crop_x, crop_y, crop_w, crop_h
+                    )
+                output_path = out_dir / f"{out_stem}.gif"
+                fit = mp4_to_gif_target_size(
+                    input_path=str(video_path),
+                    output_path=str(output_path),
+                    max_bytes=max_bytes,
+                    start_time=start,
+                    end_time=float(end_sec) if end_sec is not None else None,
+                    color_depth=colors,
+                    scale=scl,
+                    engine=engine_name,
+                    dither=dither_name,
+                    crop=crop if engine_name == "ffmpeg" else None,
+                    palette=palette_mode,
+                    executor=get_process_pool(),
+                    work_dir=str(job_dir),
+                )
+            except Exception as exc:  # noqa: BLE001
+                raise HTTPException(status_code=400, detail=str(exc)) from exc
+        elif engine_name == "ffmpeg":
+            # 裁剪并入同一个滤镜图，截取、缩放、调色板一次完成
+            output_path = out_dir / f"{out_stem}.gif"
+            try:
+                mp4_to_gif_ffmpeg(
+                    input_path=str(video_path),
+                    output_path=str(output_path),
+                    start_time=start,
+                    end_time=float(end_sec) if end_sec is not None else None,
+                    fps=None,  # 使用源视频帧率
+                    color_depth=colors,
+                    scale=scl,
+                    dither=dither_name,
+                    crop=crop,
+                )
+            except Exception as exc:  # noqa: BLE001
+                raise HTTPException(status_code=400, detail=str(exc)) from exc
+        else:
+            video_path = maybe_prepare_cropped_video(
+                job_dir, video_path, crop_x, crop_y, crop_w, crop_h
+            )
+            # 输出 GIF 文件名采用源视频名
+            output_path = out_dir / f"{out_stem}.gif"
+
+            # mp4_to_gif 需要数值型 end_time；若未提供，则读取视频时长
+            if end_sec is None:
+                try:
+                    from moviepy import VideoFileClip as _VideoFileClip  # type: ignore
+
+                    clip = _VideoFileClip(str(video_path))
+                    end = float(clip.duration or 0.0)
+                    clip.close()
+                except Exception:
+                    end = start  # 兜底：避免 None 传入
+            else:
+                end = float(end_sec)
+
+            try:
+                convert_mp4_to_gif(
+                    input_path=str(video_path),
+                    output_path=str(output_path),
+                    start_time=start,
+                    end_time=end,
+                    fps=None,  # 使用源视频帧率
+                    color_depth=colors,
+                    scale=scl,
+                    executor=get_process_pool(),  # 逐帧量化在共享进程池中并行
+                    palette=palette_mode,
+                )
+            except Exception as exc:  # noqa: BLE001
+                raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+        outputs.insert(0, output_path)
+    files = [build_file_url(p) for p in outputs]
+    message = "GIF 生成完成" if formats == ["gif"] else "动画生成完成"
+    if fit is not None and not fit["fits"]:
+        message = "GIF 生成完成，但已降到最低画质仍超出目标体积，建议缩短时长或裁剪画面"
+    return {
+        "message": message,
+        "job_id": job_id,
+        "engine": engine_name,
+        "fit": fit,
+        "files": files,
+        # MP4 无法以图片预览，只在文件列表中提供
+        "previews": [url for url in files if not url.endswith(".mp4")],
+        "total_files": len(files),
+    }
 
-            clip = _VideoFileClip(str(video_path))
-            end = float(clip.duration or 0.0)
-            clip.close()
-        except Exception:
-            end = start  # 兜底：避免 None 传入
-    else:
-        end = float(end_sec)
+
+# 网页图片的持久化 HTTP 缓存（ETag / Last-Modified），重复抓取同一图库时只发送条件请求
+IMAGES_HTTP_CACHE_DIR = STORAGE_DIR / "images-download-cache"
+# 多页抓取的上限，避免单个任务无限扩张
+IMAGES_CRAWL_MAX_DEPTH = 5
+IMAGES_CRAWL_MAX_PAGES = 5000
+
+
+def _crawl_images_with_progress(
+    job_id: str,
+    job_dir: Path,
+    target_dir: Path,
+    page_url: str,
+    max_depth: int,
+    max_pages: int,
+):
+    """
+    后台任务：多页抓取网页图片并更新进度。
+    图片边抓取边写入 target_dir，结束后打包为 zip。
+    """
+    module_id = "images-download"
+
+    def on_progress(pages_done: int, pages_found: int, images: int) -> None:
+        # 以已发现的网页数为分母：抓取过程中会继续发现新网页，进度可能回落，但不会长期停在 0 附近
+        percent = min(99.0, pages_done / max(pages_found, 1) * 100.0)
+        update_job_progress(
+            module_id,
+            job_id,
+            percent,
+            f"已抓取 {pages_done}/{pages_found} 个网页，保存 {images} 张图片",
+            status="running",
+        )
 
     try:
-        convert_mp4_to_gif(
-            input_path=str(video_path),
-            output_path=str(output_path),
-            start_time=start,
-            end_time=end,
-            fps=None,  # 使用源视频帧率
-            color_depth=colors,
-            scale=scl,
+        update_job_progress(module_id, job_id, 0.0, "正在抓取起始网页...", status="running")
+        summary = crawl_images_from_url(
+            page_url,
+            str(target_dir),
+            max_depth=max_depth,
+            max_pages=max_pages,
+            cache_dir=str(IMAGES_HTTP_CACHE_DIR),
+            progress_callback=on_progress,
         )
+        target_dir.mkdir(parents=True, exist_ok=True)
+        files = sorted(iter_files(target_dir))
+        zip_path = job_dir / f"{target_dir.name}.zip"
+        make_zip(target_dir, zip_path)
+        files_urls = [build_file_url(file_path) for file_path in files]
+        result = {
+            "message": f"抓取完成，共 {summary['pages']} 个网页、{len(files)} 张图片",
+            "job_id": job_id,
+            "page_url": page_url,
+            "archive": build_file_url(zip_path),
+            "files": files_urls,
+            "total_files": len(files_urls),
+            # 多页抓取的图片可能很多，只预览前若干张
+            "previews": files_urls[:24],
+            "pages": summary["pages"],
+            "failed": len(summary["errors"]),
+        }
+        save_job_meta(module_id, job_id, result, status="success")
+        update_job_progress(module_id, job_id, 100.0, "抓取完成", status="success")
     except Exception as exc:  # noqa: BLE001
-        raise HTTPException(status_code=400, detail=str(exc)) from exc
-
-    file_url = build_file_url(output_path)
-    return {
-        "message": "GIF 生成完成",
-        "job_id": job_id,
-        "files": [file_url],
-        "previews": [file_url],
-        "total_files": 1,
-    }
+        error_result = {
+            "job_id": job_id,
+            "page_url": page_url,
+            "message": f"抓取失败：{str(exc)}",
+            "status": "failed",
+        }
+        save_job_meta(module_id, job_id, error_result, status="failed")
+        update_job_progress(
+            module_id, job_id, 0.0, f"抓取失败：{str(exc)}", status="failed"
+        )
 
 
 @app.post("/api/tasks/images-download")
 async def api_images_download(
     page_url: str = Form(...),
     save_path: str = Form("downloads"),
+    max_depth: Optional[int] = Form(None),
+    max_pages: Optional[int] = Form(None),
 ):
+    """
+    网页图片批量下载。max_depth 为空或 0 时只下载当前网页（同步返回结果）；
+    大于 0 时进入多页抓取模式：跟随同站链接至指定深度、最多 max_pages 个网页，
+    任务在后台队列中执行，前端通过 /api/jobs/images-download/{job_id} 轮询进度。
+    """
+    if max_depth:
+        try:
+            if not (0 < max_depth <= IMAGES_CRAWL_MAX_DEPTH):
+                raise ValueError(f"抓取深度需在 0-{IMAGES_CRAWL_MAX_DEPTH} 之间")
+            pages = DEFAULT_MAX_PAGES if max_pages is None else int(max_pages)
+            if not (1 <= pages <= IMAGES_CRAWL_MAX_PAGES):
+                raise ValueError(f"网页数上限需在 1-{IMAGES_CRAWL_MAX_PAGES} 之间")
+            if not page_url.strip().lower().startswith(("http://", "https://")):
+                raise ValueError("请输入以 http:// 或 https:// 开头的网址")
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+        job_id, job_dir = create_job_dir("images-download")
+        target_dir = job_dir / (save_path.strip() or "downloads")
+        save_job_meta(
+            "images-download",
+            job_id,
+            {
+                "job_id": job_id,
+                "page_url": page_url.strip(),
+                "message": "抓取任务已加入队列",
+                "status": "pending",
+                "progress": 0.0,
+                "progress_message": "排队中",
+            },
+            status="pending",
+        )
+        get_download_executor().submit(
+            _crawl_images_with_progress,
+            job_id,
+            job_dir,
+            target_dir,
+            page_url.strip(),
+            int(max_depth),
+            pages,
+        )
+        return {
+            "job_id": job_id,
+            "message": "抓取任务已加入队列，正在后台处理",
+            "status": "pending",
+        }
+
     job_id, job_dir = create_job_dir("images-download")
     target_dir = job_dir / (save_path.strip() or "downloads")
     try:
-        download_images_from_url(page_url, str(target_dir))
+        download_images_from_url(
+            page_url, str(target_dir), cache_dir=str(IMAGES_HTTP_CACHE_DIR)
+        )
     except Exception as exc:  # noqa: BLE001
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
@@ -680,27 +1425,63 @@ async def api_images_download(
 
 
 @app.post("/api/tasks/mp4-to-live-photo")
-async def api_mp4_to_live_photo(
+def api_mp4_to_live_photo(
     video: UploadFile = File(...),
     output_prefix: str = Form(...),
     duration: Optional[float] = Form(None),
     keyframe_time: Optional[float] = Form(None),
+    segments: str = Form(""),
     crop_x: Optional[int] = Form(None),
     crop_y: Optional[int] = Form(None),
     crop_w: Optional[int] = Form(None),
     crop_h: Optional[int] = Form(None),
 ):
+    """
+    视频转实况照片。segments 为空时按 duration / keyframe_time 生成一组；
+    填写 segments（每行 起始时间,时长,封面时间点）时从同一视频并行生成多组，并打包为 zip。
+    同步端点：ffmpeg 转换由 FastAPI 放入线程池执行，不阻塞事件循环。
+    """
     if convert_to_live_photo is None:
         raise HTTPException(
             status_code=503, detail="实况照片功能暂时不可用，请稍后重试"
         )
+    default_duration = float(duration) if duration is not None else 3.0
+    default_keyframe = float(keyframe_time) if keyframe_time is not None else 1.0
+    try:
+        segment_list = parse_segments(segments, default_duration, default_keyframe)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
 
     job_id, job_dir = create_job_dir("mp4-to-live-photo")
     video_path = job_dir / video.filename
     save_upload_file(video, video_path)
-    video_path = maybe_prepare_cropped_video(
-        job_dir, video_path, crop_x, crop_y, crop_w, crop_h
-    )
+    # 裁剪并入 ffmpeg 滤镜图，与截取、编码、封面提取在同一次调用中完成
+    crop = resolve_crop_rect(video_path, crop_x, crop_y, crop_w, crop_h)
+
+    if segment_list:
+        output_dir = job_dir / "live_photos"
+        prefix = output_dir / (output_prefix.strip() or "live_photo")
+        prefix.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            pairs = convert_segments_to_live_photos(
+                str(video_path), str(prefix), segment_list, crop=crop
+            )
+        except Exception as exc:  # noqa: BLE001
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+        zip_path = job_dir / "live_photos.zip"
+        make_zip(output_dir, zip_path)
+        files_urls = [
+            build_file_url(Path(path)) for jpg, mov in pairs for path in (mov, jpg)
+        ]
+        return {
+            "message": f"实况照片生成完成，共 {len(pairs)} 组",
+            "job_id": job_id,
+            "archive": build_file_url(zip_path),
+            "files": files_urls,
+            "previews": [build_file_url(Path(jpg)) for jpg, _ in pairs],
+            "total_files": len(files_urls),
+        }
 
     prefix = job_dir / (output_prefix.strip() or "live_photo")
     prefix.parent.mkdir(parents=True, exist_ok=True)
@@ -709,8 +1490,9 @@ async def api_mp4_to_live_photo(
         convert_to_live_photo(
             input_video=str(video_path),
             output_prefix=str(prefix),
-            duration=float(duration) if duration is not None else 3.0,
-            keyframe_time=float(keyframe_time) if keyframe_time is not None else 1.0,
+            duration=default_duration,
+            keyframe_time=default_keyframe,
+            crop=crop,
         )
     except Exception as exc:  # noqa: BLE001
         raise HTTPException(status_code=400, detail=str(exc)) from exc
@@ -728,11 +1510,12 @@ async def api_mp4_to_live_photo(
 
 
 @app.post("/api/tasks/network-scan")
-async def api_network_scan(network_range: str = Form(...)):
+def api_network_scan(network_range: str = Form(...)):
     """
     局域网扫描：仅扫描用户显式提供的网段（CIDR），不再尝试自动识别本机网段。
     - 支持以逗号/空白分隔的多个 CIDR，例如： "192.168.1.0/24, 10.0.0.0/24"
     - 返回按类型分组的设备信息，同时保留 devices 扁平列表（向后兼容）。
+    同步端点：由 FastAPI 放入线程池执行，端口探测使用独立的事件循环，不阻塞服务。
     """
     try:
         cleaned = (network_range or "").strip()
@@ -810,29 +1593,122 @@ async def api_folder_split(
     }
 
 
-@app.post("/api/tasks/url-to-mp4")
-async def api_url_to_mp4(video_url: str = Form(...)):
-    job_id, job_dir = create_job_dir("url-to-mp4")
-    cwd = os.getcwd()
+# 在线视频下载缓存：相同视频（规范 ID + 格式）重复提交时直接复用，超出容量按 LRU 淘汰
+URL_DOWNLOAD_CACHE = DownloadCache(STORAGE_DIR / "url-to-mp4-cache")
+
+
+def _download_url_video(
+    job_id: str,
+    job_dir: Path,
+    video_url: str,
+    concurrent_fragments: int,
+    merge_format: str,
+):
+    """
+    后台任务：下载在线视频到作业目录并更新进度。
+    在下载队列的线程中执行，输出目录显式传入，不切换进程工作目录。
+    """
+    module_id = "url-to-mp4"
+    downloads_dir = job_dir / "Downloads"
+    last_report = [0.0, -1.0]  # [上次写入时间, 上次写入进度]
+
+    def on_progress(percent: float, message: str) -> None:
+        # yt-dlp 回调非常频繁，限制 meta.json 的写入频率
+        now = time.monotonic()
+        if now - last_report[0] < 0.5 and percent - last_report[1] < 5:
+            return
+        last_report[0], last_report[1] = now, percent
+        update_job_progress(module_id, job_id, percent, message, status="running")
+
     try:
-        os.chdir(job_dir)
-        download_youtube_video(video_url)
+        update_job_progress(module_id, job_id, 0.0, "正在解析链接...", status="running")
+        download_youtube_video(
+            video_url,
+            output_dir=str(downloads_dir),
+            progress_callback=on_progress,
+            concurrent_fragments=concurrent_fragments,
+            merge_format=merge_format,
+            cache=URL_DOWNLOAD_CACHE,
+        )
+
+        zip_path = job_dir / "downloads.zip"
+        make_zip(downloads_dir, zip_path)
+        files_urls = [build_file_url(path) for path in sorted(iter_files(downloads_dir))]
+        result = {
+            "message": "下载任务完成",
+            "job_id": job_id,
+            "video_url": video_url,
+            "archive": build_file_url(zip_path),
+            "files": files_urls,
+            "total_files": len(files_urls),
+        }
+        save_job_meta(module_id, job_id, result, status="success")
+        update_job_progress(module_id, job_id, 100.0, "下载完成", status="success")
     except Exception as exc:  # noqa: BLE001
+        error_result = {
+            "job_id": job_id,
+            "video_url": video_url,
+            "message": f"下载失败：{str(exc)}",
+            "status": "failed",
+        }
+        save_job_meta(module_id, job_id, error_result, status="failed")
+        update_job_progress(
+            module_id, job_id, 0.0, f"下载失败：{str(exc)}", status="failed"
+        )
+
+
+@app.post("/api/tasks/url-to-mp4")
+async def api_url_to_mp4(
+    video_url: str = Form(...),
+    concurrent_fragments: Optional[int] = Form(None),
+    merge_format: str = Form("mp4"),
+):
+    """
+    在线视频下载接口（异步模式）。
+    提交后立即返回 job_id，下载在后台队列中执行（同时进行的下载数有上限，其余排队），
+    前端可通过 /api/jobs/url-to-mp4/{job_id} 轮询进度。
+    concurrent_fragments：分片格式（DASH / HLS）并发下载的分片数（1-16），
+    merge_format：音视频分离时合并输出的容器格式。
+    """
+    url = (video_url or "").strip()
+    merge_format = (merge_format or "mp4").strip().lower()
+    try:
+        if not url.lower().startswith(("http://", "https://")):
+            raise ValueError("请输入以 http:// 或 https:// 开头的视频链接")
+        if merge_format not in MERGE_FORMATS:
+            raise ValueError(f"merge_format 仅支持: {', '.join(MERGE_FORMATS)}")
+        fragments = (
+            DEFAULT_CONCURRENT_FRAGMENTS
+            if concurrent_fragments is None
+            else int(concurrent_fragments)
+        )
+        if not (1 <= fragments <= 16):
+            raise ValueError("并发分片数需在 1-16 之间")
+    except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
-    finally:
-        os.chdir(cwd)
 
-    downloads_dir = job_dir / "Downloads"
-    if not downloads_dir.exists():
-        raise HTTPException(status_code=500, detail="未生成下载文件")
+    job_id, job_dir = create_job_dir("url-to-mp4")
+    save_job_meta(
+        "url-to-mp4",
+        job_id,
+        {
+            "job_id": job_id,
+            "video_url": url,
+            "message": "任务已加入下载队列",
+            "status": "pending",
+            "progress": 0.0,
+            "progress_message": "排队中",
+        },
+        status="pending",
+    )
+    get_download_executor().submit(
+        _download_url_video, job_id, job_dir, url, fragments, merge_format
+    )
 
-    zip_path = job_dir / "downloads.zip"
-    make_zip(downloads_dir, zip_path)
     return {
-        "message": "下载任务完成",
         "job_id": job_id,
-        "archive": build_file_url(zip_path),
-        "files": [build_file_url(path) for path in iter_files(downloads_dir)],
+        "message": "任务已加入下载队列，正在后台处理",
+        "status": "pending",
     }
 
 
@@ -1367,7 +2243,16 @@ async def api_yolo_label_vis(
     output_dir: str = Form("label_output"),
     suffix: str = Form("_annotated"),
     class_names: str = Form(""),
+    output_mode: str = Form("files"),
+    shard_size_mb: Optional[float] = Form(None),
 ):
+    """
+    YOLO 标注可视化。output_mode 为 tar 时结果写入 WebDataset 风格的 tar 分片，
+    不再逐张写图片和打包 zip。
+    """
+    output_mode = (output_mode or "files").strip().lower()
+    if output_mode not in ("files", "tar"):
+        raise HTTPException(status_code=400, detail=f"不支持的输出模式: {output_mode}")
     if annotations_archive is None or images_archive is None:
         raise HTTPException(status_code=400, detail="请同时上传标注和图像压缩包")
 
@@ -1400,17 +2285,26 @@ async def api_yolo_label_vis(
             output_dir=str(output_path),
             output_suffix=suffix,
             class_names=classes_list,
+            output_mode=output_mode,
+            shard_size_mb=shard_size_mb if shard_size_mb and shard_size_mb > 0 else 256,
         )
     except Exception as exc:  # noqa: BLE001
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
+    files = [build_file_url(path) for path in sorted(iter_files(output_path))]
+    if output_mode == "tar":
+        return {
+            "message": f"标注可视化完成，已写入 {len(files)} 个 tar 分片",
+            "job_id": job_id,
+            "files": files,
+        }
     zip_path = job_dir / "label_vis.zip"
     make_zip(output_path, zip_path)
     return {
         "message": "标注可视化完成",
         "job_id": job_id,
         "archive": build_file_url(zip_path),
-        "files": [build_file_url(path) for path in iter_files(output_path)],
+        "files": files,
     }
 
 
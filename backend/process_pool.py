@@ -0,0 +1,71 @@
+"""后台进程池：CPU 密集型任务（如多视频批量抽帧）在独立进程中并行执行。"""
+
+from __future__ import annotations
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+# 进程数：保留一半核给 Web 服务与各进程内部的编码线程
+PROCESS_POOL_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+
+# 工作进程从干净的 forkserver 派生，而不是直接 fork Web 服务进程：
+# 直接 fork 会继承当时打开的所有管道（如 moviepy 正在读取的 ffmpeg 输出），
+# 导致对应的 ffmpeg 进程永远等不到读端关闭而无法退出
+try:
+    _MP_CONTEXT = multiprocessing.get_context("forkserver")
+except ValueError:  # Windows 仅支持 spawn
+    _MP_CONTEXT = multiprocessing.get_context("spawn")
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """获取全局进程池（首次调用时创建）。"""
+
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=PROCESS_POOL_WORKERS, mp_context=_MP_CONTEXT
+            )
+        return _pool
+
+
+class QueueProgress:
+    """
+    可跨进程传递的进度回调：在工作进程中以 callback(percent, message) 调用，
+    把 (key, percent, message) 放入 Manager 队列，由提交任务的线程汇总。
+    """
+
+    def __init__(self, queue, key) -> None:
+        self.queue = queue
+        self.key = key
+
+    def __call__(self, percent: float, message: str) -> None:
+        self.queue.put((self.key, percent, message))
+
+
+def progress_manager():
+    """创建用于跨进程进度上报的 Manager（with 块结束时关闭其服务进程）。"""
+
+    return _MP_CONTEXT.Manager()
+
+
+def threads_per_process() -> int:
+    """每个进程内可用的线程数，避免进程数 × 线程数远超 CPU 核数。"""
+
+    return max(1, (os.cpu_count() or 2) // PROCESS_POOL_WORKERS)
+
+
+def shutdown_process_pool() -> None:
+    """关闭全局进程池，服务退出时调用。"""
+
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
@@ -0,0 +1,155 @@
+"""视频裁剪/拖动预览使用的缩略图条（sprite）缓存。
+
+以上传视频内容的哈希为键，同一视频只生成一次：所有缩略图拼在同一张大图中，
+另附 JSON 索引，前端拖动进度条时直接按时间计算坐标，之后的拖动预览不再需要任何服务端请求。
+缓存总大小超过上限时按最近使用时间（LRU）淘汰。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from .utils import STORAGE_DIR, build_file_url
+
+from scripts.video_storyboard import generate_storyboard, write_storyboard_index
+
+SPRITE_DIR = STORAGE_DIR / "video-sprites"
+SPRITE_INDEX_NAME = "sprite.json"
+
+# 缩略图参数：默认每秒一张，超过 SPRITE_MAX_THUMBNAILS 张时自动拉大间隔，
+# 缩略图足够小，保证长视频的整张大图尺寸仍在浏览器可接受范围内
+SPRITE_COLUMNS = 20
+SPRITE_THUMB_WIDTH = 96
+SPRITE_MAX_THUMBNAILS = 1200
+# 缓存总大小上限
+SPRITE_CACHE_MAX_BYTES = 1024 ** 3
+
+_SPRITE_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+# sprite_id -> [锁, 引用数]；最后一个使用者释放后即移除，字典不会随请求数增长
+_locks: Dict[str, List] = {}
+_locks_guard = threading.Lock()
+_evict_lock = threading.Lock()
+
+
+def sprite_content_id(video_path: Path) -> str:
+    """按视频内容计算缓存键（SHA-256 前 32 位），不同视频即使文件名、大小相同也不会混用。"""
+
+    digest = hashlib.sha256()
+    with Path(video_path).open("rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+
+def is_valid_sprite_id(sprite_id: str) -> bool:
+    """sprite_id 只能是 sprite_content_id 生成的十六进制串，防止拼出任意路径。"""
+
+    return bool(_SPRITE_ID_RE.match(sprite_id or ""))
+
+
+@contextmanager
+def _sprite_lock(sprite_id: str) -> Iterator[None]:
+    with _locks_guard:
+        entry = _locks.setdefault(sprite_id, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                _locks.pop(sprite_id, None)
+
+
+def _sprite_payload(sprite_id: str, index_path: Path) -> dict:
+    index = json.loads(index_path.read_text(encoding="utf-8"))
+    payload = {
+        **index,
+        "sprite_id": sprite_id,
+        "image": build_file_url(index_path.parent / index["image"]),
+        "index": build_file_url(index_path),
+    }
+    # 旧缓存的索引没有 vtt 字段，前端回退为按索引计算
+    if index.get("vtt"):
+        payload["vtt"] = build_file_url(index_path.parent / index["vtt"])
+    return payload
+
+
+def get_cached_sprite(sprite_id: str) -> Optional[dict]:
+    """返回已缓存的缩略图条信息并刷新最近使用时间；不存在（或刚被淘汰）时返回 None。"""
+
+    entry = SPRITE_DIR / sprite_id
+    try:
+        payload = _sprite_payload(sprite_id, entry / SPRITE_INDEX_NAME)
+        now = time.time()
+        os.utime(entry, (now, now))
+    except (OSError, ValueError, KeyError):
+        return None
+    return payload
+
+
+def _evict(keep: str) -> None:
+    """缓存总大小超过 SPRITE_CACHE_MAX_BYTES 时，按目录修改时间从旧到新删除。"""
+
+    with _evict_lock:
+        entries = []
+        total = 0
+        for path in SPRITE_DIR.iterdir():
+            if path.name.startswith(".") or not path.is_dir():
+                continue
+            size = sum(f.stat().st_size for f in path.iterdir() if f.is_file())
+            entries.append((path.stat().st_mtime, path.name, path, size))
+            total += size
+        for _, name, path, size in sorted(entries):
+            if total <= SPRITE_CACHE_MAX_BYTES:
+                break
+            if name == keep:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+
+def build_scrub_sprite(sprite_id: str, video_path: Path) -> dict:
+    """
+    生成（或复用）视频的缩略图条。先在临时目录生成，完成后整体改名，
+    避免并发请求读到写了一半的文件；同一视频的并发请求只生成一次。
+    """
+
+    with _sprite_lock(sprite_id):
+        cached = get_cached_sprite(sprite_id)
+        if cached is not None:
+            return cached
+
+        SPRITE_DIR.mkdir(parents=True, exist_ok=True)
+        work_dir = SPRITE_DIR / f".{sprite_id}-{uuid.uuid4().hex[:8]}"
+        try:
+            result = generate_storyboard(
+                video_path=str(video_path),
+                output_dir=str(work_dir),
+                interval=None,
+                columns=SPRITE_COLUMNS,
+                rows=None,
+                thumb_width=SPRITE_THUMB_WIDTH,
+                max_thumbnails=SPRITE_MAX_THUMBNAILS,
+                filename="sprite",
+                image_options={"image_format": "jpg", "quality": 70},
+            )
+            write_storyboard_index(str(work_dir / SPRITE_INDEX_NAME), result)
+            work_dir.replace(SPRITE_DIR / sprite_id)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        _evict(keep=sprite_id)
+        return get_cached_sprite(sprite_id)
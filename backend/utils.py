@@ -183,6 +183,25 @@ def crop_video_ffmpeg(
     return output_path
 
 
+def resolve_crop_rect(
+    video_path: Path,
+    crop_x: Optional[int],
+    crop_y: Optional[int],
+    crop_w: Optional[int],
+    crop_h: Optional[int],
+) -> Optional[Tuple[int, int, int, int]]:
+    """
+    读取视频尺寸并规范化用户提供的裁剪框，返回 (x, y, w, h)；未提供或无效时返回 None。
+    可直接并入 ffmpeg 滤镜图，省去单独生成裁剪视频的一次编码。
+    """
+
+    if crop_x is None or crop_y is None or crop_w is None or crop_h is None:
+        return None
+
+    vw, vh = get_video_size(video_path)
+    return _normalize_crop(vw, vh, crop_x, crop_y, crop_w, crop_h)
+
+
 def maybe_prepare_cropped_video(
     job_dir: Path,
     video_path: Path,
@@ -195,11 +214,7 @@ def maybe_prepare_cropped_video(
     若用户提供 crop_x/crop_y/crop_w/crop_h，则先生成裁剪后的视频文件并返回新路径；否则返回原路径。
     """
 
-    if crop_x is None or crop_y is None or crop_w is None or crop_h is None:
-        return video_path
-
-    vw, vh = get_video_size(video_path)
-    normalized = _normalize_crop(vw, vh, crop_x, crop_y, crop_w, crop_h)
+    normalized = resolve_crop_rect(video_path, crop_x, crop_y, crop_w, crop_h)
     if normalized is None:
         return video_path
     x, y, w, h = normalized
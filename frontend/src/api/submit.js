@@ -36,6 +36,45 @@ export const serializeForm = (form) => {
   return formData;
 };
 
+/**
+ * 轮询后台任务（/api/jobs/{module}/{job_id}）直到成功或失败，期间回调进度。
+ * @param {string} moduleId
+ * @param {string} jobId
+ * @param {(text: string) => void} onProgress
+ * @returns {Promise<Record<string, any>>} 成功时的任务结果
+ */
+const waitForJob = (moduleId, jobId, onProgress) =>
+  new Promise((resolve, reject) => {
+    const url = resolveEndpointUrl(`/api/jobs/${moduleId}/${jobId}`);
+    const poll = async () => {
+      try {
+        const response = await fetch(url);
+        if (response.status === 404) {
+          reject(new Error(`任务不存在或已过期（任务编号：${jobId}）`));
+          return;
+        }
+        if (response.ok) {
+          const data = await response.json();
+          if (data.status === "success") {
+            resolve(data);
+            return;
+          }
+          if (data.status === "failed") {
+            reject(new Error(typeof data.message === "string" ? data.message : "任务处理失败"));
+            return;
+          }
+          const progress = typeof data.progress === "number" ? data.progress : 0;
+          const message = typeof data.progress_message === "string" ? data.progress_message : "处理中...";
+          onProgress(progress > 0 ? `${progress.toFixed(1)}% - ${message}` : message);
+        }
+      } catch (_e) {
+        // 网络抖动时继续轮询
+      }
+      setTimeout(poll, 1000);
+    };
+    setTimeout(poll, 500);
+  });
+
 /**
  * 处理表单提交。
  * @param {SubmitEvent} event
@@ -97,7 +136,14 @@ export const handleSubmit = async (event) => {
       throw new Error(detail);
     }
 
-    const result = await response.json().catch(() => ({ message: "提交成功" }));
+    let result = await response.json().catch(() => ({ message: "提交成功" }));
+    // 排队执行的后台任务：提交后轮询进度，完成后再展示结果
+    if (result.status === "pending" && typeof result.job_id === "string") {
+      updateStatus(form, "info", result.message || "任务已排队", `任务编号：${result.job_id}`);
+      result = await waitForJob(module.id, result.job_id, (text) =>
+        updateStatus(form, "info", "后端正在处理...", text)
+      );
+    }
     const successMessage =
       typeof result.message === "string" && result.message.trim() !== ""
         ? result.message.trim()
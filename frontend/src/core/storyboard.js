@@ -0,0 +1,149 @@
+/**
+ * 故事板缩略图轨道工具：解析后端生成的 WebVTT（`sheet.jpg#xywh=x,y,w,h`），
+ * 或按缩略图条 JSON 索引计算，按时间查找缩略图并以 CSS 背景的方式显示大图中的对应区域，
+ * 悬停预览无需再请求服务端。
+ */
+
+/**
+ * @typedef {Object} StoryboardCue
+ * @property {number} start 起始时间（秒）
+ * @property {number} end 结束时间（秒）
+ * @property {string} url 大图地址（已解析为绝对地址）
+ * @property {number} x 缩略图在大图中的横坐标
+ * @property {number} y 缩略图在大图中的纵坐标
+ * @property {number} w 缩略图宽度
+ * @property {number} h 缩略图高度
+ */
+
+/**
+ * 将 VTT 时间戳（HH:MM:SS.mmm 或 MM:SS.mmm）转换为秒。
+ * @param {string} text
+ * @returns {number}
+ */
+const parseVttTime = (text) => {
+  const parts = text.trim().split(":").map(Number);
+  if (parts.some((n) => !Number.isFinite(n))) {
+    return Number.NaN;
+  }
+  return parts.reduce((total, n) => total * 60 + n, 0);
+};
+
+/**
+ * 解析故事板 WebVTT 文本。
+ * @param {string} text VTT 内容
+ * @param {string} baseUrl VTT 文件地址，用于解析大图的相对路径
+ * @returns {StoryboardCue[]}
+ */
+export const parseStoryboardVtt = (text, baseUrl) => {
+  /** @type {StoryboardCue[]} */
+  const cues = [];
+  const blocks = text.replace(/\r\n/g, "\n").split(/\n{2,}/);
+  blocks.forEach((block) => {
+    const lines = block.split("\n").filter((line) => line.trim() !== "");
+    const timeIndex = lines.findIndex((line) => line.includes("-->"));
+    if (timeIndex < 0 || timeIndex + 1 >= lines.length) {
+      return;
+    }
+    const [startText, endText] = lines[timeIndex].split("-->");
+    const [path, fragment] = lines[timeIndex + 1].trim().split("#xywh=");
+    const rect = (fragment || "").split(",").map(Number);
+    const start = parseVttTime(startText);
+    const end = parseVttTime(endText);
+    if (!Number.isFinite(start) || !Number.isFinite(end) || rect.length !== 4 || rect.some((n) => !Number.isFinite(n))) {
+      return;
+    }
+    const [x, y, w, h] = rect;
+    cues.push({ start, end, url: new URL(path, baseUrl).toString(), x, y, w, h });
+  });
+  return cues.sort((a, b) => a.start - b.start);
+};
+
+/**
+ * 下载并解析故事板轨道。
+ * @param {string} vttUrl
+ * @returns {Promise<StoryboardCue[]>}
+ */
+export const loadStoryboardTrack = async (vttUrl) => {
+  const response = await fetch(vttUrl);
+  if (!response.ok) {
+    throw new Error(`故事板轨道加载失败，状态码 ${response.status}`);
+  }
+  return parseStoryboardVtt(await response.text(), response.url || vttUrl);
+};
+
+/**
+ * 二分查找指定时间对应的缩略图。
+ * @param {StoryboardCue[]} cues 已按 start 排序
+ * @param {number} time 秒
+ * @returns {StoryboardCue|null}
+ */
+export const findStoryboardCue = (cues, time) => {
+  if (!cues.length || !Number.isFinite(time)) {
+    return null;
+  }
+  let lo = 0;
+  let hi = cues.length - 1;
+  while (lo < hi) {
+    const mid = (lo + hi + 1) >> 1;
+    if (cues[mid].start <= time) {
+      lo = mid;
+    } else {
+      hi = mid - 1;
+    }
+  }
+  return cues[lo];
+};
+
+/**
+ * 把缩略图显示到元素上（背景图 + 偏移），大图由浏览器缓存，切换时无额外请求。
+ * @param {HTMLElement} el
+ * @param {StoryboardCue|null} cue
+ * @returns {void}
+ */
+export const applyStoryboardCue = (el, cue) => {
+  if (!cue) {
+    el.hidden = true;
+    return;
+  }
+  el.hidden = false;
+  el.style.width = `${cue.w}px`;
+  el.style.height = `${cue.h}px`;
+  el.style.backgroundImage = `url("${cue.url}")`;
+  el.style.backgroundPosition = `-${cue.x}px -${cue.y}px`;
+  el.style.backgroundRepeat = "no-repeat";
+};
+
+/**
+ * @typedef {Object} ScrubSprite
+ * @property {string} image 大图地址
+ * @property {number} interval 缩略图间隔（秒）
+ * @property {number} count 缩略图数量
+ * @property {number} columns 大图列数
+ * @property {number} tile_width 缩略图宽度
+ * @property {number} tile_height 缩略图高度
+ * @property {StoryboardCue[]|null} [cues] 已加载的 WebVTT 轨道，存在时优先使用
+ */
+
+/**
+ * 按后端 JSON 索引（所有缩略图位于同一张大图）计算指定时间的缩略图。
+ * @param {ScrubSprite} sprite
+ * @param {number} time 秒
+ * @returns {StoryboardCue|null}
+ */
+export const findSpriteCue = (sprite, time) => {
+  if (!sprite || !sprite.count || !(sprite.interval > 0) || !Number.isFinite(time)) {
+    return null;
+  }
+  const index = Math.min(Math.max(Math.floor(time / sprite.interval), 0), sprite.count - 1);
+  const w = sprite.tile_width;
+  const h = sprite.tile_height;
+  return {
+    start: index * sprite.interval,
+    end: (index + 1) * sprite.interval,
+    url: sprite.image,
+    x: (index % sprite.columns) * w,
+    y: Math.floor(index / sprite.columns) * h,
+    w,
+    h
+  };
+};
@@ -45,7 +45,7 @@ export const VIDEO_PARENT_ID = "video-processing";
  * 视频处理子模块 ID 列表。
  * @type {string[]}
  */
-export const VIDEO_SUBMODULE_IDS = ["extract-frames", "mp4-to-gif", "mp4-to-live-photo", "url-to-mp4"];
+export const VIDEO_SUBMODULE_IDS = ["extract-frames", "video-storyboard", "mp4-to-gif", "mp4-to-live-photo", "url-to-mp4"];
 
 /**
  * 模块信息集合，涵盖当前目录下的 Python 脚本。
@@ -109,23 +109,173 @@ export const MODULES = [
         label: "输出文件夹",
         placeholder: "例如 frames",
         description: "后台会在作业目录下创建该文件夹存放结果图片。"
+      },
+      {
+        id: "mode",
+        type: "select",
+        label: "抽帧模式",
+        options: ["interval", "keyframe", "scene"],
+        description:
+          "interval 按帧率抽帧；keyframe 仅解码关键帧，速度极快，适合快速浏览视频内容；scene 按镜头切换抽取每个场景的首帧（后两者忽略帧率）。"
+      },
+      {
+        id: "scene_threshold",
+        type: "number",
+        step: "any",
+        label: "场景切换阈值",
+        placeholder: "默认 30",
+        description: "仅 scene 模式生效：相邻帧缩略图的平均像素差（0-255），越小越敏感。"
+      },
+      {
+        id: "min_scene_frames",
+        type: "number",
+        label: "场景最少帧数",
+        placeholder: "默认 15",
+        description: "仅 scene 模式生效：短于该长度的切换视为闪烁忽略。"
+      },
+      {
+        id: "max_scene_frames",
+        type: "number",
+        label: "场景最多帧数",
+        placeholder: "留空不限",
+        description: "仅 scene 模式生效：长镜头超过该帧数时补采一帧。"
+      },
+      {
+        id: "dedup_threshold",
+        type: "number",
+        label: "重复帧过滤阈值",
+        placeholder: "例如 4，留空不过滤",
+        description: "与上一张保留帧的感知哈希差异不超过该值时跳过，适合静止画面较多的视频（建议 2-8）。"
+      },
+      {
+        id: "image_format",
+        type: "select",
+        label: "图片格式",
+        options: ["jpg", "webp", "png"],
+        description: "WebP 体积最小；PNG 为无损格式，体积较大。"
+      },
+      {
+        id: "quality",
+        type: "number",
+        label: "图片质量",
+        placeholder: "1-100，留空使用默认值",
+        description: "对 JPG/WebP 生效；PNG 会映射为压缩级别。"
+      },
+      {
+        id: "max_edge",
+        type: "number",
+        label: "长边上限（像素）",
+        placeholder: "例如 640，留空保持原分辨率",
+        description: "抽帧时直接等比缩小，仅缩小不放大，可显著减少磁盘占用与下载体积。"
+      },
+      {
+        id: "interpolation",
+        type: "select",
+        label: "缩放插值",
+        options: ["area", "linear", "cubic", "lanczos", "nearest"],
+        description: "缩小图片时推荐 area。"
+      },
+      {
+        id: "grayscale",
+        type: "select",
+        label: "灰度输出",
+        options: ["false", "true"]
+      },
+      {
+        id: "output_mode",
+        type: "select",
+        label: "输出方式",
+        options: ["files", "tar", "npy"],
+        description:
+          "files 逐帧输出图片并打包 zip；tar 按顺序写入 WebDataset 风格的 tar 分片；npy 写入单个 .npy 帧堆栈并附带时间戳索引（可内存映射读取，需所有帧尺寸一致）。"
+      },
+      {
+        id: "shard_size_mb",
+        type: "number",
+        step: "any",
+        label: "分片大小（MB）",
+        placeholder: "默认 256",
+        description: "仅 tar 模式生效，单个分片达到该大小后切换到下一个。"
       }
     ],
     guide: {
       title: "使用建议",
       tips: [
         "长视频抽帧请合理设置时间段，避免生成过多图片。",
+        "用于训练数据集时，建议设置长边上限（如 640）与 WebP 格式。",
         "如需保证时间戳，请确保上传的视频 FPS 信息正确。",
         "输出目录名仅支持英文字母、数字和下划线。"
       ]
     }
   },
+  {
+    id: "video-storyboard",
+    name: "视频故事板",
+    summary: "一次解码生成缩略图拼接大图与 WebVTT 缩略图轨道，快速浏览视频内容。",
+    description:
+      "上传视频后，后台调用 `video_storyboard.py` 按固定间隔截取缩略图并拼接为少量大图，同时输出 `.vtt` 缩略图轨道，可用于播放器进度条悬停预览。",
+    endpoint: "/api/tasks/video-storyboard",
+    tags: [
+      { id: "media", label: "视频处理" },
+      { id: "opencv", label: "OpenCV" }
+    ],
+    fields: [
+      {
+        id: "video",
+        type: "file",
+        label: "视频文件",
+        accept: "video/*",
+        required: true,
+        description: "支持 mp4、mov 等常见格式。"
+      },
+      {
+        id: "interval",
+        type: "number",
+        step: "any",
+        label: "缩略图间隔（秒）",
+        placeholder: "留空自动计算",
+        description: "默认按视频时长自动选择，最多约 200 张缩略图，间隔不小于 1 秒。"
+      },
+      {
+        id: "columns",
+        type: "number",
+        label: "每张大图列数",
+        placeholder: "默认 5"
+      },
+      {
+        id: "rows",
+        type: "number",
+        label: "每张大图行数",
+        placeholder: "默认 5"
+      },
+      {
+        id: "thumb_width",
+        type: "number",
+        label: "缩略图宽度（像素）",
+        placeholder: "默认 160",
+        description: "高度按视频比例计算，范围 32-640。"
+      },
+      {
+        id: "image_format",
+        type: "select",
+        label: "大图格式",
+        options: ["jpg", "webp", "png"]
+      }
+    ],
+    guide: {
+      title: "使用建议",
+      tips: [
+        "只想大致浏览视频内容时，优先使用故事板而不是逐帧抽帧。",
+        "生成的 .vtt 与大图位于同一目录，可直接作为播放器的 thumbnails 轨道。"
+      ]
+    }
+  },
   {
     id: "mp4-to-gif",
     name: "MP4 转 GIF",
     summary: "截取视频片段并导出为 GIF 动图。",
     description:
-      "上传 MP4/MOV 等常见视频格式，设置起止时间与目标帧率，后台将调用 `mp42gif.py` 输出 GIF 文件。",
+      "上传 MP4/MOV 等常见视频格式，设置起止时间与目标帧率，后台将调用 `mp42gif.py` 输出 GIF 文件（默认使用 ffmpeg 调色板滤镜）。",
     endpoint: "/api/tasks/mp4-to-gif",
     tags: [
       { id: "media", label: "视频处理" },
@@ -143,6 +293,7 @@ export const MODULES = [
       {
         id: "start_sec",
         type: "number",
+        step: "any",
         label: "起始时间（秒）",
         placeholder: "例如 0",
         description: "默认为 0，建议小于结束时间。"
@@ -150,6 +301,7 @@ export const MODULES = [
       {
         id: "end_sec",
         type: "number",
+        step: "any",
         label: "结束时间（秒）",
         placeholder: "留空表示处理到视频末尾"
       },
@@ -159,6 +311,45 @@ export const MODULES = [
         label: "分辨率缩放",
         options: ["原始（100%）", "75%", "50%", "33%"],
         description: "用于减小 GIF 体积（仅缩小，不放大）。"
+      },
+      {
+        id: "engine",
+        type: "select",
+        label: "编码引擎",
+        options: ["auto", "ffmpeg", "pil"],
+        description:
+          "auto 在服务器安装了 ffmpeg 时使用 ffmpeg（单次滤镜图生成调色板，速度快数十倍），否则回退到逐帧量化的 pil 引擎。"
+      },
+      {
+        id: "dither",
+        type: "select",
+        label: "抖动算法",
+        options: ["sierra2_4a", "floyd_steinberg", "sierra2", "bayer", "heckbert", "none"],
+        description: "仅 ffmpeg 引擎生效；bayer 体积更小，floyd_steinberg 过渡更细腻。"
+      },
+      {
+        id: "palette",
+        type: "select",
+        label: "调色板",
+        options: ["adaptive", "global"],
+        description:
+          "仅 pil 引擎生效。adaptive 逐帧生成调色板；global 所有帧共用一个调色板并只写入变化区域（其余透明），文件通常小数倍，便于在手机上快速打开。"
+      },
+      {
+        id: "max_bytes",
+        type: "number",
+        label: "体积上限（字节）",
+        placeholder: "例如 1000000（约 1MB），留空表示不限制",
+        description:
+          "填写后自动在分辨率缩放、帧率、颜色数之间寻找不超过该体积的最高画质（以上述设置为上限），适合微信等有大小限制的场景。"
+      },
+      {
+        id: "output_format",
+        type: "select",
+        label: "输出格式",
+        options: ["gif", "webp", "mp4", "all"],
+        description:
+          "webp 为动态 WebP，mp4 为无声循环 H.264 视频，二者编码更快、体积更小；all 同时输出三种格式，预览页按浏览器能力自动选择，微信内仍使用 GIF。"
       }
     ],
     guide: {
@@ -186,13 +377,27 @@ export const MODULES = [
         label: "网页地址",
         placeholder: "https://example.com",
         required: true
+      },
+      {
+        id: "max_depth",
+        type: "number",
+        label: "抓取深度",
+        placeholder: "默认 0，仅当前网页",
+        description: "大于 0 时跟随同站链接继续抓取（1 表示再抓取当前网页链接到的网页，最大 5），任务在后台执行。"
+      },
+      {
+        id: "max_pages",
+        type: "number",
+        label: "网页数上限",
+        placeholder: "默认 50",
+        description: "多页抓取时最多访问的网页数（1-5000）。"
       }
     ],
     guide: {
       title: "注意事项",
       tips: [
         "仅用于合法授权的网站采集，请勿抓取受版权保护的内容。",
-        "如页面图片为懒加载，建议先在本地浏览器滚动加载后复制最终地址。"
+        "懒加载属性（data-src、srcset 等）与 CSS 背景图会一并识别；由脚本动态插入的图片仍无法获取。"
       ]
     }
   },
@@ -249,6 +454,7 @@ export const MODULES = [
       {
         id: "duration",
         type: "number",
+        step: "any",
         label: "目标时长（秒）",
         placeholder: "默认 3",
         description: "超出原视频长度时会自动截断。"
@@ -256,9 +462,17 @@ export const MODULES = [
       {
         id: "keyframe_time",
         type: "number",
+        step: "any",
         label: "封面时间点（秒）",
         placeholder: "默认 1.0",
         description: "建议介于 0.1 与时长-0.1 之间。"
+      },
+      {
+        id: "segments",
+        type: "textarea",
+        label: "批量片段（可选）",
+        placeholder: "每行一个片段：起始时间,时长,封面时间点\n如 0,3,1\n12.5,3,1.5",
+        description: "填写后从同一视频并行生成多组实况照片并打包下载；时长与封面时间点可省略，使用上方的默认值。"
       }
     ],
     guide: {
@@ -355,6 +569,20 @@ export const MODULES = [
         label: "视频链接",
         placeholder: "https://...",
         required: true
+      },
+      {
+        id: "concurrent_fragments",
+        type: "number",
+        label: "并发分片数",
+        placeholder: "默认 4",
+        description: "DASH / HLS 等分片格式同时下载的分片数（1-16），适当调大可提升下载速度。"
+      },
+      {
+        id: "merge_format",
+        type: "select",
+        label: "合并格式",
+        options: ["mp4", "mkv", "webm", "mov"],
+        description: "音视频分开下载时合并输出的容器格式。"
       }
     ],
     guide: {
@@ -440,6 +668,21 @@ export const MODULES = [
         label: "类别名称",
         placeholder: "空格分隔，如 car truck person",
         description: "若留空则使用标签文件中的 ID。"
+      },
+      {
+        id: "output_mode",
+        type: "select",
+        label: "输出方式",
+        options: ["files", "tar"],
+        description: "files 逐张输出图片并打包 zip；tar 写入 WebDataset 风格的 tar 分片，适合大批量数据。"
+      },
+      {
+        id: "shard_size_mb",
+        type: "number",
+        step: "any",
+        label: "分片大小（MB）",
+        placeholder: "默认 256",
+        description: "仅 tar 模式生效。"
       }
     ],
     guide: {
@@ -508,6 +751,7 @@ export const MODULES = [
       {
         id: "trainval_ratio",
         type: "number",
+        step: "any",
         label: "训练+验证占比",
         placeholder: "0.9",
         description: "与脚本默认一致，可覆盖。"
@@ -515,6 +759,7 @@ export const MODULES = [
       {
         id: "train_ratio",
         type: "number",
+        step: "any",
         label: "训练集占比",
         placeholder: "0.9",
         description: "仅作用在训练+验证子集内。"
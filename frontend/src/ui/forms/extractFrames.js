@@ -18,6 +18,27 @@ export const renderExtractFramesFields = (module) => {
   const endField = findField("end_sec");
   const fpsField = findField("n_fps");
   const scaleField = findField("scale");
+  const outputFields = [
+    "mode",
+    "scene_threshold",
+    "min_scene_frames",
+    "max_scene_frames",
+    "dedup_threshold",
+    "image_format",
+    "quality",
+    "max_edge",
+    "interpolation",
+    "grayscale",
+    "output_mode",
+    "shard_size_mb",
+    "engine",
+    "dither",
+    "palette",
+    "max_bytes",
+    "output_format"
+  ]
+    .map(findField)
+    .filter(Boolean);
 
   return `
     <div class="form__group form__group--video">
@@ -145,9 +166,33 @@ export const renderExtractFramesFields = (module) => {
     </div>`
         : ""
     }
+    ${outputFields.map(renderOutputOptionField).join("")}
   `;
 };
 
+/**
+ * 渲染抽帧模式与输出图片参数字段（格式、质量、缩放、灰度）。
+ * @param {{id:string,type:string,label:string,placeholder?:string,description?:string,options?:string[],step?:string}} field
+ * @returns {string}
+ */
+const renderOutputOptionField = (field) => {
+  const hint = field.description ? `<p class="form__hint">${field.description}</p>` : "";
+  const control =
+    field.type === "select"
+      ? `<select class="select" name="${field.id}" id="extract-${field.id}">
+          ${(field.options ?? []).map((option) => `<option value="${option}">${option}</option>`).join("")}
+        </select>`
+      : `<input class="input" type="number" min="0" step="${field.step ?? "1"}" name="${field.id}" id="extract-${field.id}" placeholder="${
+          field.placeholder ?? ""
+        }" />`;
+  return `
+    <div class="form__group">
+      <label class="form__label" for="extract-${field.id}">${field.label}</label>
+      ${control}
+      ${hint}
+    </div>`;
+};
+
 /**
  * 初始化抽帧模块交互。
  * @param {HTMLFormElement | null} form
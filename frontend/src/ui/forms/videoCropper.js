@@ -7,8 +7,12 @@
  * 说明：
  * - 若表单已存在视频预览（如抽帧模块），会复用已有 <video> 并叠加框选层
  * - 若表单没有预览，则自动插入一个预览播放器用于框选
+ * - 选中视频后向后端获取一次缩略图条（按会话缓存），拖动进度条时本地显示预览缩略图
  */
 
+import { applyStoryboardCue, findSpriteCue, findStoryboardCue, loadStoryboardTrack } from "../../core/storyboard.js";
+import { resolveEndpointUrl, resolveFileUrl } from "../../core/url.js";
+
 const CROPPER_MOUNT_ATTR = "data-video-cropper-mounted";
 const MIN_DISPLAY_SIZE = 6;
 
@@ -199,6 +203,58 @@ const mapToVideoPixels = (displayRect, video, stageSize) => {
   return { x, y, w, h };
 };
 
+/**
+ * 生成视频会话标识（文件名 + 大小 + 修改时间），仅用于在本页内记住已上传视频对应的 sprite_id。
+ * @param {File} file
+ * @returns {string}
+ */
+const buildSpriteSessionKey = (file) => `${file.name}|${file.size}|${file.lastModified}`;
+
+/** @type {Map<string, string>} 会话标识 -> 后端按视频内容生成的 sprite_id */
+const spriteIdsBySession = new Map();
+
+/**
+ * 获取视频的拖动预览缩略图条：本页已上传过的视频先按 sprite_id 查询缓存，
+ * 未命中（首次或已被后端淘汰）时上传视频生成。
+ * @param {File} file
+ * @returns {Promise<import("../../core/storyboard.js").ScrubSprite|null>}
+ */
+const fetchScrubSprite = async (file) => {
+  const sessionKey = buildSpriteSessionKey(file);
+  try {
+    let response = null;
+    const knownId = spriteIdsBySession.get(sessionKey);
+    if (knownId) {
+      const lookupUrl = new URL(resolveEndpointUrl("/api/video-sprites"));
+      lookupUrl.searchParams.set("sprite_id", knownId);
+      response = await fetch(lookupUrl.toString());
+    }
+    if (!response || response.status === 404) {
+      const formData = new FormData();
+      formData.append("video", file);
+      response = await fetch(resolveEndpointUrl("/api/video-sprites"), {
+        method: "POST",
+        body: formData
+      });
+    }
+    if (!response.ok) return null;
+    const sprite = await response.json();
+    if (sprite.sprite_id) {
+      spriteIdsBySession.set(sessionKey, sprite.sprite_id);
+    }
+    /** @type {import("../../core/storyboard.js").StoryboardCue[]|null} */
+    let cues = null;
+    if (sprite.vtt) {
+      // 优先使用后端生成的 WebVTT 轨道，加载失败时按 JSON 索引计算
+      cues = await loadStoryboardTrack(resolveFileUrl(sprite.vtt)).catch(() => null);
+    }
+    return { ...sprite, image: resolveFileUrl(sprite.image), cues: cues && cues.length ? cues : null };
+  } catch (_err) {
+    // 预览缩略图是增强功能，失败时静默降级
+    return null;
+  }
+};
+
 /**
  * 挂载视频裁剪框选 UI（如果表单存在视频输入）。
  * @param {HTMLFormElement|null} form
@@ -248,6 +304,17 @@ export const setupVideoCropperForForm = (form) => {
   let enableEl = null;
   /** @type {HTMLElement|null} */
   let valueEl = null;
+  /** @type {HTMLInputElement|null} */
+  let scrubRange = null;
+  /** @type {HTMLDivElement|null} */
+  let scrubThumb = null;
+  // 是否由本组件注入拖动条（抽帧模块已有进度条时直接复用）
+  let ownsScrubRange = false;
+  // 拖动预览只初始化一次（找不到可用的拖动条时 scrubThumb 保持为空）
+  let scrubSetupDone = false;
+  /** @type {import("../../core/storyboard.js").ScrubSprite|null} */
+  let scrubSprite = null;
+  let spriteSessionKey = "";
 
   const ensureUi = () => {
     if (panel && stage && overlay && rectEl && video && enableEl && valueEl) return;
@@ -309,6 +376,18 @@ export const setupVideoCropperForForm = (form) => {
         <div class="video-cropper__panel-row video-cropper__panel-row--meta">
           <span class="video-cropper__meta" data-crop-value>未选择区域</span>
         </div>
+        <div class="video-cropper__scrub" data-crop-scrub>
+          <input
+            class="video-preview__seek"
+            type="range"
+            min="0"
+            max="0"
+            value="0"
+            step="0.01"
+            disabled
+            data-crop-scrub-range
+          />
+        </div>
         <p class="form__hint">裁剪坐标以原始分辨率像素为准；不启用时将使用全画面处理。</p>
       `;
       // 若抽帧模块存在 timeline/toolbars，放在预览容器里更自然；否则放在视频下方
@@ -326,6 +405,33 @@ export const setupVideoCropperForForm = (form) => {
     enableEl = panel ? panel.querySelector("[data-crop-enable]") : null;
     valueEl = panel ? panel.querySelector("[data-crop-value]") : null;
 
+    // 拖动预览：抽帧模块已有进度条时复用，否则使用面板内注入的拖动条
+    if (!scrubSetupDone) {
+      scrubSetupDone = true;
+      const existingSeek = form.querySelector("[data-video-seek]");
+      const panelScrub = panel ? panel.querySelector("[data-crop-scrub]") : null;
+      let scrubWrapper = panelScrub;
+      if (existingSeek instanceof HTMLInputElement) {
+        scrubWrapper = document.createElement("div");
+        scrubWrapper.className = "video-cropper__scrub";
+        existingSeek.insertAdjacentElement("beforebegin", scrubWrapper);
+        scrubWrapper.appendChild(existingSeek);
+        scrubRange = existingSeek;
+        if (panelScrub instanceof HTMLElement) panelScrub.remove();
+      } else if (panelScrub instanceof HTMLElement) {
+        const r = panelScrub.querySelector("[data-crop-scrub-range]");
+        scrubRange = r instanceof HTMLInputElement ? r : null;
+        ownsScrubRange = true;
+      }
+      if (scrubWrapper instanceof HTMLElement) {
+        const thumb = document.createElement("div");
+        thumb.className = "video-cropper__scrub-thumb";
+        thumb.hidden = true;
+        scrubWrapper.appendChild(thumb);
+        scrubThumb = thumb;
+      }
+    }
+
     // 默认隐藏：只有选了文件才显示（复用抽帧预览时由抽帧逻辑控制，但不影响这里额外再控制）
     if (panel) {
       panel.hidden = true;
@@ -508,6 +614,92 @@ export const setupVideoCropperForForm = (form) => {
     overlay.addEventListener("lostpointercapture", finish);
   };
 
+  /**
+   * 拖动条上按时间显示缩略图（来自已缓存的缩略图条，不请求服务端）。
+   * @param {number} time
+   * @returns {void}
+   */
+  const showScrubThumb = (time) => {
+    if (!scrubRange || !scrubThumb || !scrubSprite) return;
+    const max = Number.parseFloat(scrubRange.max) || 0;
+    if (max <= 0) return;
+    const cue = scrubSprite.cues ? findStoryboardCue(scrubSprite.cues, time) : findSpriteCue(scrubSprite, time);
+    applyStoryboardCue(scrubThumb, cue);
+    scrubThumb.style.left = `${(Math.min(Math.max(time, 0), max) / max) * 100}%`;
+  };
+
+  const hideScrubThumb = () => {
+    if (scrubThumb) scrubThumb.hidden = true;
+  };
+
+  const bindScrubEvents = () => {
+    if (!scrubRange) return;
+    const range = scrubRange;
+    /**
+     * @param {PointerEvent} ev
+     * @returns {number}
+     */
+    const timeAtPointer = (ev) => {
+      const rect = range.getBoundingClientRect();
+      const ratio = rect.width > 0 ? Math.min(Math.max((ev.clientX - rect.left) / rect.width, 0), 1) : 0;
+      return ratio * (Number.parseFloat(range.max) || 0);
+    };
+    range.addEventListener("pointermove", (ev) => {
+      if (ev instanceof PointerEvent) showScrubThumb(timeAtPointer(ev));
+    });
+    range.addEventListener("pointerleave", hideScrubThumb);
+    range.addEventListener("input", () => {
+      showScrubThumb(Number.parseFloat(range.value));
+    });
+
+    if (!ownsScrubRange) return;
+    // 注入的拖动条：拖动过程中只显示缩略图，松手后才让视频 seek
+    let dragging = false;
+    range.addEventListener("pointerdown", () => {
+      dragging = true;
+    });
+    range.addEventListener("change", () => {
+      dragging = false;
+      hideScrubThumb();
+      const value = Number.parseFloat(range.value);
+      if (video && Number.isFinite(value)) {
+        video.currentTime = Math.max(value, 0);
+      }
+    });
+    if (video instanceof HTMLVideoElement) {
+      const v = video;
+      const syncRange = () => {
+        const duration = Number.isFinite(v.duration) ? v.duration : 0;
+        range.max = String(duration);
+        range.disabled = duration <= 0;
+        if (!dragging) range.value = String(v.currentTime || 0);
+      };
+      v.addEventListener("loadedmetadata", syncRange);
+      v.addEventListener("timeupdate", syncRange);
+      v.addEventListener("emptied", syncRange);
+    }
+  };
+
+  /**
+   * 为当前视频加载拖动预览缩略图条（每个文件会话只请求一次）。
+   * @param {File|null} file
+   * @returns {void}
+   */
+  const loadScrubSprite = (file) => {
+    const key = file ? buildSpriteSessionKey(file) : "";
+    if (key === spriteSessionKey) return;
+    spriteSessionKey = key;
+    scrubSprite = null;
+    hideScrubThumb();
+    if (!file) return;
+    void fetchScrubSprite(file).then((sprite) => {
+      // 期间用户可能已更换文件
+      if (spriteSessionKey === key) {
+        scrubSprite = sprite;
+      }
+    });
+  };
+
   const bindPanelEvents = () => {
     if (!panel) return;
     const clearBtn = panel.querySelector("[data-crop-clear]");
@@ -640,6 +832,7 @@ export const setupVideoCropperForForm = (form) => {
       const [file] = fileInput.files ?? [];
       syncPreviewVisibility(!!file);
       ensurePreviewVideoSource(file ?? null);
+      loadScrubSprite(file ?? null);
       // 文件变更时清空旧选择
       clearSelection();
       updateVisibility();
@@ -683,6 +876,7 @@ export const setupVideoCropperForForm = (form) => {
     form.addEventListener("reset", () => {
       revokeInjectedUrl();
       clearSelection();
+      loadScrubSprite(null);
       if (enableEl) enableEl.checked = false;
       updateVisibility();
     });
@@ -693,6 +887,7 @@ export const setupVideoCropperForForm = (form) => {
   ensureUi();
   bindOverlayEvents();
   bindPanelEvents();
+  bindScrubEvents();
   bindVideoEvents();
   bindFileInputEvents();
   updateVisibility();
@@ -84,7 +84,7 @@ const renderVideoSubmoduleCards = (modules) =>
 
 /**
  * 生成字段输入控件。
- * @param {{id:string,type:string,label:string,required?:boolean,placeholder?:string,description?:string,options?:string[],accept?:string}} field
+ * @param {{id:string,type:string,label:string,required?:boolean,placeholder?:string,description?:string,options?:string[],accept?:string,step?:string}} field
  * @returns {string}
  */
 const renderField = (field) => {
@@ -126,7 +126,7 @@ const renderField = (field) => {
         <div class="form__group">
           <label class="form__label" for="${field.id}">${field.label}${field.required ? "<sup>*</sup>" : ""
         }</label>
-          <input class="input" type="${field.type}" ${baseAttributes} placeholder="${field.placeholder ?? ""}" />
+          <input class="input" type="${field.type}" ${baseAttributes} ${field.step ? `step="${field.step}"` : ""} placeholder="${field.placeholder ?? ""}" />
           ${hint}
         </div>
       `;
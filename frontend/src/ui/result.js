@@ -148,18 +148,23 @@ export const renderResult = (form, module, payload) => {
     }
 
     if (module.id === "mp4-to-gif" && Array.isArray(payload.files) && payload.files.length > 0) {
-      const first = payload.files[0];
-      if (typeof first === "string" && first.trim() !== "") {
-        const viewUrl = resolveFileUrl(first);
-        const downloadUrl = buildDownloadUrl(first);
-        const wechatUrl = buildGifViewUrl(first);
-        const qrUrl = `${BACKEND_BASE_URL}/api/utils/qrcode?url=${encodeURIComponent(wechatUrl)}`;
+      const files = payload.files.filter((file) => typeof file === "string" && file.trim() !== "");
+      files.forEach((file) => {
+        const ext = (file.split(".").pop() || "").toUpperCase();
+        actionItems.push(`<a class="button" href="${buildDownloadUrl(file)}">下载 ${ext === "WEBP" ? "WebP" : ext}</a>`);
+      });
+      const gif = files.find((file) => file.toLowerCase().endsWith(".gif"));
+      if (gif) {
         actionItems.push(
-          `<a class="button" href="${downloadUrl}">下载 GIF</a>`,
-          `<button class="button" type="button" data-copy-gif data-src="${viewUrl}">复制 GIF</button>`,
-          `<a class="button" href="${qrUrl}" target="_blank" rel="noopener noreferrer">微信二维码</a>`
+          `<button class="button" type="button" data-copy-gif data-src="${resolveFileUrl(gif)}">复制 GIF</button>`
         );
       }
+      if (files.length > 0) {
+        // 预览页会按客户端能力在同名的 MP4 / WebP / GIF 之间选择
+        const wechatUrl = buildGifViewUrl(gif || files[0]);
+        const qrUrl = `${BACKEND_BASE_URL}/api/utils/qrcode?url=${encodeURIComponent(wechatUrl)}`;
+        actionItems.push(`<a class="button" href="${qrUrl}" target="_blank" rel="noopener noreferrer">微信二维码</a>`);
+      }
     }
 
     if (actionItems.length === 0 && Array.isArray(payload.files) && payload.files.length > 0) {
@@ -1,30 +1,243 @@
 # 导入所需的库
+import hashlib
 import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
 import yt_dlp
 
-def download_youtube_video(url):
+# 合并音视频时可选的容器格式（yt-dlp merge_output_format）
+MERGE_FORMATS = ("mp4", "mkv", "webm", "mov")
+# 默认并发下载的分片数（DASH / HLS 等分片格式生效）
+DEFAULT_CONCURRENT_FRAGMENTS = 4
+# 下载缓存默认容量上限
+DEFAULT_CACHE_MAX_BYTES = 5 * 1024 ** 3
+
+
+class DownloadCache:
+    """
+    已完成下载的本地缓存：以提取器给出的规范视频 ID + 选中的格式为键，
+    同一视频无论以何种链接形式提交（短链、带参数等）都能命中。
+
+    每个条目是缓存目录下的一个子目录（保留原文件名），目录修改时间即最近使用时间，
+    总大小超过上限时按 LRU 淘汰。文件在缓存与任务目录之间优先用硬链接共享，不额外占用空间。
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        """
+        @param cache_dir: 缓存目录
+        @param max_bytes: 缓存总大小上限（字节）
+        """
+        self.cache_dir = str(cache_dir)
+        self.max_bytes = int(max_bytes)
+        self._locks = {}  # key -> [锁, 引用数]；最后一个使用者释放后即移除
+        self._locks_guard = threading.Lock()
+        self._evict_lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(info, merge_format):
+        """
+        由 extract_info(download=False) 的结果生成缓存键。
+        通用提取器（直链）的 ID 只是文件名，需要再加上完整 URL 区分不同站点。
+        """
+        parts = [info.get('extractor_key') or info.get('extractor') or '', str(info.get('id') or '')]
+        if parts[0].lower() == 'generic' or not parts[1]:
+            parts.append(info.get('webpage_url') or info.get('original_url') or '')
+        parts += [str(info.get('format_id') or ''), merge_format]
+        return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()[:24]
+
+    @contextmanager
+    def lock(self, key):
+        """同一键的下载串行执行：并发提交的相同视频只下载一次，后到的请求直接命中缓存。"""
+        with self._locks_guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._locks_guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    self._locks.pop(key, None)
+
+    def fetch(self, key, output_dir):
+        """
+        命中时把缓存文件放入 output_dir 并刷新最近使用时间。
+        与 _evict 持有同一把锁，避免条目在链接到一半时被其它键的 store 淘汰。
+
+        @return: 输出文件路径列表；未命中返回 None
+        """
+        entry = os.path.join(self.cache_dir, key)
+        with self._evict_lock:
+            if not os.path.isdir(entry):
+                return None
+            names = sorted(os.listdir(entry))
+            if not names:
+                return None
+            os.makedirs(output_dir, exist_ok=True)
+            files = []
+            for name in names:
+                target = os.path.join(output_dir, name)
+                _link_or_copy(os.path.join(entry, name), target)
+                files.append(target)
+            now = time.time()
+            os.utime(entry, (now, now))
+        return files
+
+    def store(self, key, files):
+        """把下载结果加入缓存（单个条目超过容量上限时不缓存），随后按 LRU 淘汰旧条目。"""
+        size = sum(os.path.getsize(f) for f in files)
+        if not files or size > self.max_bytes:
+            return
+        staging = tempfile.mkdtemp(prefix=".tmp-", dir=self.cache_dir)
+        try:
+            for f in files:
+                _link_or_copy(f, os.path.join(staging, os.path.basename(f)))
+            entry = os.path.join(self.cache_dir, key)
+            shutil.rmtree(entry, ignore_errors=True)
+            os.replace(staging, entry)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        self._evict(keep=key)
+
+    def _evict(self, keep):
+        with self._evict_lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.cache_dir):
+                path = os.path.join(self.cache_dir, name)
+                if name.startswith('.') or not os.path.isdir(path):
+                    continue
+                size = sum(e.stat().st_size for e in os.scandir(path) if e.is_file())
+                entries.append((os.path.getmtime(path), name, path, size))
+                total += size
+            for _, name, path, size in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if name == keep:
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+
+
+def _link_or_copy(src, dst):
+    """优先创建硬链接（同一文件系统时零拷贝），失败时退回复制。"""
+    if os.path.exists(dst):
+        os.remove(dst)
     try:
-        # 设置下载选项
-        ydl_opts = {
-            'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]',
-            'outtmpl': os.path.join(os.getcwd(), 'Downloads', '%(title)s.%(ext)s'),
-            'progress_hooks': [progress_hook],
-            'quiet': False
-        }
-        
-        # 创建下载目录（如果不存在）
-        download_dir = os.path.join(os.getcwd(), 'Downloads')
-        os.makedirs(download_dir, exist_ok=True)
-        
-        # 下载视频
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            print(f"正在下载: {url}")
-            ydl.download([url])
-        
-        print("\n下载完成！视频已保存到: Downloads 文件夹")
-        
-    except Exception as e:
-        print(f"下载过程中发生错误: {e}")
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def download_youtube_video(url, output_dir=None, progress_callback=None,
+                           concurrent_fragments=DEFAULT_CONCURRENT_FRAGMENTS, merge_format="mp4",
+                           cache=None):
+    """
+    下载视频到指定目录。
+
+    输出路径完全由 output_dir 决定，不依赖也不修改当前工作目录，多个下载可在同一进程中并发执行。
+
+    @param url: 视频链接
+    @param output_dir: 输出目录，默认为当前目录下的 Downloads
+    @param progress_callback: 进度回调 callback(percent, message)，percent 为 0-100；为空时打印到终端
+    @param concurrent_fragments: 分片格式（DASH / HLS）并发下载的分片数
+    @param merge_format: 音视频分离时合并输出的容器格式
+    @param cache: 可选的 DownloadCache；先解析视频 ID 与格式，命中时直接复用已下载的文件
+    @return: 下载完成的文件路径列表
+    """
+    if merge_format not in MERGE_FORMATS:
+        raise ValueError(f"不支持的合并格式: {merge_format}，可选: {', '.join(MERGE_FORMATS)}")
+    download_dir = output_dir or os.path.join(os.getcwd(), 'Downloads')
+    os.makedirs(download_dir, exist_ok=True)
+
+    # 设置下载选项
+    ydl_opts = {
+        'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]',
+        'outtmpl': os.path.join(download_dir, '%(title)s.%(ext)s'),
+        'noplaylist': True,
+        'concurrent_fragment_downloads': max(1, int(concurrent_fragments or 1)),
+        'merge_output_format': merge_format,
+        'quiet': progress_callback is not None,
+        'noprogress': progress_callback is not None,
+    }
+    if progress_callback is None:
+        ydl_opts['progress_hooks'] = [progress_hook]
+    else:
+        hook = _ProgressReporter(progress_callback)
+        ydl_opts['progress_hooks'] = [hook.on_download]
+        ydl_opts['postprocessor_hooks'] = [hook.on_postprocess]
+
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        # 先只解析信息（视频 ID、选中的格式），再决定是否需要真正下载
+        info = ydl.extract_info(url, download=False)
+        if cache is None:
+            return _download_info(ydl, info)
+
+        key = cache.make_key(info, merge_format)
+        with cache.lock(key):
+            files = cache.fetch(key, download_dir)
+            if files:
+                if progress_callback is not None:
+                    progress_callback(100.0, "命中下载缓存")
+                return files
+            files = _download_info(ydl, info)
+            cache.store(key, files)
+            return files
+
+
+def _download_info(ydl, info):
+    """按已解析的信息下载视频（不再重复请求页面），返回生成的文件路径。"""
+    info = ydl.process_ie_result(info, download=True)
+    files = [
+        item['filepath']
+        for item in (info or {}).get('requested_downloads') or []
+        if item.get('filepath') and os.path.exists(item['filepath'])
+    ]
+    if not files:
+        raise RuntimeError("下载结束但未生成视频文件")
+    return files
+
+
+class _ProgressReporter:
+    """
+    把 yt-dlp 的下载 / 后处理事件换算为整体进度：
+    音视频分离时按 requested_formats 的数量均分 0-95%，合并等后处理占最后 5%。
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def on_download(self, d):
+        info = d.get('info_dict') or {}
+        formats = info.get('requested_formats') or [info]
+        ids = [f.get('format_id') for f in formats]
+        index = ids.index(info.get('format_id')) if info.get('format_id') in ids else 0
+
+        if d['status'] == 'downloading':
+            total = d.get('total_bytes') or d.get('total_bytes_estimate')
+            if total:
+                fraction = d.get('downloaded_bytes', 0) / total
+            elif d.get('fragment_count'):
+                fraction = (d.get('fragment_index') or 0) / d['fragment_count']
+            else:
+                fraction = 0.0
+            fraction = min(max(fraction, 0.0), 1.0)
+            percent = (index + fraction) / len(formats) * 95.0
+            speed = d.get('speed')
+            speed_text = f"，{speed / 1024 / 1024:.1f} MB/s" if speed else ""
+            self.callback(percent, f"正在下载 ({index + 1}/{len(formats)}) {fraction * 100:.0f}%{speed_text}")
+        elif d['status'] == 'finished':
+            self.callback((index + 1) / len(formats) * 95.0, f"第 {index + 1}/{len(formats)} 个文件下载完成")
+
+    def on_postprocess(self, d):
+        if d['status'] == 'started' and d.get('postprocessor') == 'Merger':
+            self.callback(95.0, "下载完成，正在合并音视频...")
+
 
 def progress_hook(d):
     """
@@ -35,9 +248,14 @@ def progress_hook(d):
     elif d['status'] == 'finished':
         print("\n下载完成！正在处理合并文件...")
 
+
 if __name__ == "__main__":
     # 获取用户输入的URL
     url = input("请输入YouTube视频的URL: ")
-    
+
     # 下载视频
-    download_youtube_video(url)
\ No newline at end of file
+    try:
+        download_youtube_video(url)
+        print("\n下载完成！视频已保存到: Downloads 文件夹")
+    except Exception as e:
+        print(f"下载过程中发生错误: {e}")
@@ -1,71 +1,276 @@
 import cv2
 import os
+import re
+import shutil
 import argparse
+import subprocess
+import threading
+import queue
 
-def extract_frames(video_path, start_sec, end_sec, n_fps, output_dir):
+import numpy as np
+
+# 兼容直接以脚本运行与模块方式运行
+try:
+    from .frame_filters import FrameDeduplicator, SceneDetector
+    from .frame_shards import OUTPUT_MODES, create_frame_writer
+except ImportError:
+    from frame_filters import FrameDeduplicator, SceneDetector  # type: ignore
+    from frame_shards import OUTPUT_MODES, create_frame_writer  # type: ignore
+
+
+def extract_frames(video_path, start_sec, end_sec, n_fps, output_dir,
+                   progress_callback=None, filename=None, workers=None,
+                   image_options=None, dedup=None, scene_detector=None,
+                   shard_options=None):
+    """
+    按时间范围与帧率抽帧。解码在当前线程进行，编码写盘交给 FrameWriter 线程池。
+
+    progress_callback(percent, message) 在抽帧过程中被周期性调用，percent 为 0.0～100.0。
+    filename 为输出文件名前缀，默认取视频文件名。
+    image_options 为输出图像参数（image_format/quality/max_edge/interpolation/grayscale），
+    直接传给 FrameWriter。
+    dedup 为可选的 FrameDeduplicator，与上一保留帧近似重复的采样帧不会写盘，
+    丢弃数量可从 dedup.dropped 读取。
+    scene_detector 为可选的 SceneDetector；提供时改为逐帧解码并只保存每个场景的首帧，
+    此时忽略 n_fps。
+    shard_options 为输出模式，如 {"mode": "tar", "shard_size_mb": 256}：tar 模式写入
+    WebDataset 风格的 tar 分片，npy 模式写入单个 .npy 帧堆栈与时间戳索引，默认逐帧写图片文件。
+    """
     # 检查视频文件是否存在
     if not os.path.isfile(video_path):
         raise FileNotFoundError(f"视频文件不存在: {video_path}")
-    
+
     # 创建输出目录
     os.makedirs(output_dir, exist_ok=True)
 
-    filename = os.path.basename(video_path)
-    
+    if not filename:
+        filename = os.path.basename(video_path)
+
+    # 先构造写入器，参数错误时无需打开视频
+    writer = create_frame_writer(output_dir, filename, workers, image_options, shard_options)
+
     # 打开视频文件
-    cap = cv2.VideoCapture(video_path)
+    cap = cv2.VideoCapture(str(video_path))
     if not cap.isOpened():
+        writer.close()
         raise IOError("无法打开视频文件")
-    
+
     # 获取视频属性
     fps = cap.get(cv2.CAP_PROP_FPS)
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    duration = total_frames / fps
-    if end_sec==-1:
+    duration = total_frames / fps if fps > 0 else 0
+    if end_sec is None or end_sec == -1:
         end_sec = duration
-    
+    if start_sec is None:
+        start_sec = 0.0
+
     # 验证时间范围有效性
     if start_sec < 0 or end_sec > duration or start_sec >= end_sec:
         cap.release()
+        writer.close()
         raise ValueError(f"无效时间范围 (视频时长: {duration:.2f}秒)")
-    
+
     # 将秒转换为帧号
     start_frame = int(start_sec * fps)
     end_frame = min(int(end_sec * fps), total_frames - 1)
-    
-    # 计算帧间隔
-    interval = max(1, int(round(fps / n_fps)))  # 至少间隔1帧
-    
+
+    # 计算帧间隔；场景模式需要逐帧计算差异
+    if scene_detector is not None:
+        interval = 1
+    else:
+        interval = max(1, int(round(fps / n_fps)))  # 至少间隔1帧
+
+    # 估算需要处理的帧数（用于进度计算）
+    frames_to_process = end_frame - start_frame + 1
+    estimated_saved = max(1, frames_to_process // interval)
+
     print(f"视频信息: {total_frames} 帧, FPS: {fps:.2f}, 时长: {duration:.2f}秒")
     print(f"抽帧范围: {start_sec:.2f}秒 - {end_sec:.2f}秒 (帧 {start_frame}-{end_frame})")
-    print(f"抽帧设置: 每秒 {n_fps} 帧 (间隔: {interval} 帧)")
-    
+    if scene_detector is not None:
+        print(f"抽帧设置: 按场景切换抽帧 (阈值: {scene_detector.threshold})")
+        if progress_callback:
+            progress_callback(5.0, "开始按场景抽帧...")
+    else:
+        print(f"抽帧设置: 每秒 {n_fps} 帧 (间隔: {interval} 帧)")
+        if progress_callback:
+            progress_callback(5.0, f"开始抽帧：预计生成约 {estimated_saved} 张图片")
+
     # 定位到起始帧
     cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
-    
+
     count = 0
     saved_count = 0
     current_frame = start_frame
-    
-    while current_frame <= end_frame:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
-        # 检查是否达到保存间隔
-        if count % interval == 0:
-            # 计算当前时间戳
-            timestamp = current_frame / fps
-            frame_path = os.path.join(output_dir, filename+f"_frame_{timestamp:.2f}s.jpg")
-            cv2.imwrite(frame_path, frame)
-            saved_count += 1
-        
-        count += 1
-        current_frame += 1
-    
+    last_progress_update = 0.0
+    last_saved_reported = 0
+
+    try:
+        while current_frame <= end_frame:
+            # 非采样帧只 grab 不 retrieve，省去像素格式转换
+            if count % interval != 0:
+                if not cap.grab():
+                    break
+                count += 1
+                current_frame += 1
+                continue
+
+            ret, frame = cap.read()
+            if not ret:
+                break
+
+            keep = scene_detector is None or scene_detector.is_scene_start(frame)
+            if keep and (dedup is None or dedup.accept(frame)):
+                # 计算当前时间戳
+                timestamp = current_frame / fps
+                frame_path = os.path.join(output_dir, filename+f"_frame_{timestamp:.2f}s{writer.ext}")
+                writer.submit(frame_path, frame, {"timestamp": round(timestamp, 3)})
+                saved_count += 1
+
+            # 每新增 10 张图片或每 5% 进度回调一次
+            if progress_callback:
+                progress = 5.0 + ((current_frame - start_frame) / frames_to_process) * 95.0
+                if progress - last_progress_update >= 5.0 or saved_count - last_saved_reported >= 10:
+                    progress_callback(progress, f"已抽取 {saved_count} 张图片...{_dedup_note(dedup)}")
+                    last_progress_update = progress
+                    last_saved_reported = saved_count
+
+            count += 1
+            current_frame += 1
+    finally:
+        cap.release()
+        writer.close()
+
+    if writer.failed:
+        print(f"警告: {writer.failed} 张图像写入失败，例如: {writer.errors[0]}")
+    print(f"完成! 共保存 {writer.written} 张图像到: {output_dir}{_dedup_note(dedup)}")
+    return writer.written
+
+
+def _dedup_note(dedup):
+    """生成去重统计的附加说明文字。"""
+    if dedup is None or not dedup.dropped:
+        return ""
+    return f"（已跳过 {dedup.dropped} 张重复帧）"
+
+# showinfo 滤镜每输出一帧打印一行，从中取真实时间戳与帧尺寸
+_SHOWINFO_RE = re.compile(r"\bn:\s*\d+.*?\bpts_time:\s*(\S+).*?\bs:(\d+)x(\d+)")
+
+
+def _read_showinfo(stream, out_queue):
+    """后台线程：逐行解析 ffmpeg stderr，把 (pts_time, w, h) 放入队列，结束时放入 None。"""
+    try:
+        for raw in iter(stream.readline, b""):
+            match = _SHOWINFO_RE.search(raw.decode("utf-8", "replace"))
+            if match:
+                out_queue.put((float(match.group(1)), int(match.group(2)), int(match.group(3))))
+    finally:
+        out_queue.put(None)
+
+
+def _read_exact(stream, size):
+    """从管道读取恰好 size 字节，流提前结束时返回 None。"""
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        chunk = stream.read(remaining)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def extract_keyframes(video_path, start_sec, end_sec, output_dir,
+                      progress_callback=None, filename=None, workers=None,
+                      image_options=None, dedup=None, shard_options=None):
+    """
+    仅解码关键帧（I 帧）进行抽帧，适合快速浏览视频内容。
+
+    通过 ffmpeg 的 -skip_frame nokey 跳过全部非关键帧解码，帧以 BGR 原始数据经管道读入，
+    再交给 FrameWriter 编码写盘。时间戳取自解码器输出的真实 pts，而非按帧率推算。
+    返回已保存帧的时间戳列表（秒）。其余参数含义同 extract_frames。
+    """
+    if not os.path.isfile(video_path):
+        raise FileNotFoundError(f"视频文件不存在: {video_path}")
+    if shutil.which("ffmpeg") is None:
+        raise RuntimeError("关键帧模式需要 ffmpeg，请先安装并加入 PATH")
+
+    os.makedirs(output_dir, exist_ok=True)
+    if not filename:
+        filename = os.path.basename(video_path)
+
+    # 读取时长用于校验范围与计算进度
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise IOError("无法打开视频文件")
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     cap.release()
-    print(f"完成! 共保存 {saved_count} 张图像到: {output_dir}")
-    return saved_count
+    duration = total_frames / fps if fps > 0 else 0
+    if end_sec is None or end_sec == -1:
+        end_sec = duration
+    if start_sec is None:
+        start_sec = 0.0
+    if start_sec < 0 or end_sec > duration or start_sec >= end_sec:
+        raise ValueError(f"无效时间范围 (视频时长: {duration:.2f}秒)")
+
+    print(f"关键帧抽取: {start_sec:.2f}秒 - {end_sec:.2f}秒")
+    if progress_callback:
+        progress_callback(5.0, "开始抽取关键帧...")
+
+    writer = create_frame_writer(output_dir, filename, workers, image_options, shard_options)
+    cmd = [
+        "ffmpeg", "-hide_banner", "-nostats",
+        "-skip_frame", "nokey",
+        "-ss", f"{start_sec:.3f}", "-copyts",
+        "-i", str(video_path),
+        "-an", "-sn",
+        "-vf", "showinfo",
+        "-fps_mode", "passthrough",
+        "-f", "rawvideo", "-pix_fmt", "bgr24",
+        "pipe:1",
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    info_queue = queue.Queue()
+    reader = threading.Thread(target=_read_showinfo, args=(proc.stderr, info_queue), daemon=True)
+    reader.start()
+
+    timestamps = []
+    span = end_sec - start_sec
+    try:
+        while True:
+            info = info_queue.get()
+            if info is None:
+                break
+            pts_time, w, h = info
+            data = _read_exact(proc.stdout, w * h * 3)
+            if data is None:
+                break
+            if pts_time > end_sec:
+                break
+            if pts_time < start_sec:
+                continue
+            frame = np.frombuffer(data, dtype=np.uint8).reshape(h, w, 3)
+            if dedup is not None and not dedup.accept(frame):
+                continue
+            frame_path = os.path.join(output_dir, filename+f"_frame_{pts_time:.2f}s{writer.ext}")
+            writer.submit(frame_path, frame, {"timestamp": round(pts_time, 3)})
+            timestamps.append(pts_time)
+            if progress_callback:
+                progress = 5.0 + min(1.0, (pts_time - start_sec) / span) * 95.0
+                progress_callback(progress, f"已抽取 {len(timestamps)} 个关键帧...{_dedup_note(dedup)}")
+    finally:
+        # 已到达结束时间时无需等待 ffmpeg 读完剩余文件
+        if proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+        proc.wait()
+        reader.join(timeout=5)
+        writer.close()
+
+    print(f"完成! 共保存 {writer.written} 个关键帧到: {output_dir}{_dedup_note(dedup)}")
+    return timestamps
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -77,16 +282,66 @@ if __name__ == "__main__":
     parser.add_argument("--end_sec", type=float, help="结束时间(秒)")
     parser.add_argument("--n_fps", type=int, help="每秒抽取帧数")
     parser.add_argument("--output_dir",default="output1", help="输出目录路径")
+    parser.add_argument("--workers", type=int, default=None, help="编码写盘线程数（默认按 CPU 核数）")
+    parser.add_argument("--image_format", default="jpg", choices=["jpg", "webp", "png"], help="输出图片格式")
+    parser.add_argument("--quality", type=int, default=None, help="编码质量 1-100（默认使用 OpenCV 默认值）")
+    parser.add_argument("--max_edge", type=int, default=None, help="输出图片长边上限（像素），仅缩小")
+    parser.add_argument("--interpolation", default="area", choices=["area", "linear", "cubic", "lanczos", "nearest"], help="缩放插值方式")
+    parser.add_argument("--grayscale", action="store_true", help="输出灰度图")
+    parser.add_argument("--keyframes_only", action="store_true", help="仅抽取关键帧（忽略 n_fps，需要 ffmpeg）")
+    parser.add_argument("--dedup_threshold", type=int, default=None, help="近重复帧过滤阈值（dHash 汉明距离，建议 2-8），不设置则不过滤")
+
+    parser.add_argument("--scene", action="store_true", help="按场景切换抽帧：仅保存每个场景的首帧（忽略 n_fps）")
+    parser.add_argument("--scene_threshold", type=float, default=30.0, help="场景切换阈值（缩略灰度图平均像素差，0-255）")
+    parser.add_argument("--min_scene_frames", type=int, default=15, help="场景最少帧数，短于该长度的切换视为闪烁忽略")
+    parser.add_argument("--max_scene_frames", type=int, default=None, help="场景最多帧数，超过后强制补采一帧")
+    parser.add_argument("--output_mode", default="files", choices=list(OUTPUT_MODES), help="输出方式：逐帧图片 / tar 分片（WebDataset）/ .npy 帧堆栈")
+    parser.add_argument("--shard_size_mb", type=float, default=256, help="tar 分片的目标大小（MB）")
 
     args = parser.parse_args()
-    
-    try:
-        extract_frames(
-            video_path=args.video_path,
-            start_sec=args.start_sec,
-            end_sec=args.end_sec,
-            n_fps=args.n_fps,
-            output_dir=args.output_dir
+    dedup = FrameDeduplicator(args.dedup_threshold) if args.dedup_threshold is not None else None
+    scene_detector = None
+    if args.scene:
+        scene_detector = SceneDetector(
+            threshold=args.scene_threshold,
+            min_scene_frames=args.min_scene_frames,
+            max_scene_frames=args.max_scene_frames
         )
+    image_options = {
+        "image_format": args.image_format,
+        "quality": args.quality,
+        "max_edge": args.max_edge,
+        "interpolation": args.interpolation,
+        "grayscale": args.grayscale,
+    }
+    shard_options = {"mode": args.output_mode}
+    if args.output_mode == "tar":
+        shard_options["shard_size_mb"] = args.shard_size_mb
+
+    try:
+        if args.keyframes_only:
+            extract_keyframes(
+                video_path=args.video_path,
+                start_sec=args.start_sec,
+                end_sec=args.end_sec,
+                output_dir=args.output_dir,
+                workers=args.workers,
+                image_options=image_options,
+                dedup=dedup,
+                shard_options=shard_options
+            )
+        else:
+            extract_frames(
+                video_path=args.video_path,
+                start_sec=args.start_sec,
+                end_sec=args.end_sec,
+                n_fps=args.n_fps,
+                output_dir=args.output_dir,
+                workers=args.workers,
+                image_options=image_options,
+                dedup=dedup,
+                scene_detector=scene_detector,
+                shard_options=shard_options
+            )
     except Exception as e:
-        print(f"错误: {str(e)}")
\ No newline at end of file
+        print(f"错误: {str(e)}")
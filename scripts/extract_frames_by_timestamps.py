@@ -6,8 +6,17 @@
 """
 import cv2
 import os
+import re
+import shutil
 import argparse
-from typing import List, Tuple
+import subprocess
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 兼容直接以脚本运行与模块方式运行
+try:
+    from .frame_writer import FrameWriter
+except ImportError:
+    from frame_writer import FrameWriter  # type: ignore
 
 
 def parse_time_string(time_str: str) -> float:
@@ -111,44 +120,110 @@ def get_txt_files(input_path: str) -> List[str]:
     return sorted(txt_files)
 
 
-def find_video_file(txt_path: str, video_dir: str) -> str:
+# 支持的视频格式
+VIDEO_EXTENSIONS = ['.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv', '.m4v', '.webm', '.3gp']
+
+
+def build_video_index(video_dir: str) -> Dict[str, str]:
+    """
+    遍历一次视频文件夹，建立 文件名（不含扩展名） -> 视频路径 的索引。
+    同名文件以遍历中最先出现者为准。
+    
+    @param video_dir: 视频文件夹路径
+    @return: 索引字典
+    """
+    index: Dict[str, str] = {}
+    for root, dirs, files in os.walk(video_dir):
+        dirs.sort()
+        for file in sorted(files):
+            file_basename, file_ext = os.path.splitext(file)
+            if file_ext.lower() in VIDEO_EXTENSIONS:
+                index.setdefault(file_basename, os.path.join(root, file))
+    return index
+
+
+def find_video_file(txt_path: str, video_dir: str, index: Optional[Dict[str, str]] = None) -> str:
     """
     根据txt文件名在视频文件夹中查找对应的同名视频文件。
     
     @param txt_path: txt文件路径
     @param video_dir: 视频文件夹路径
+    @param index: build_video_index 生成的索引；批量匹配时传入以避免重复遍历目录
     @return: 找到的视频文件路径
     """
-    # 支持的视频格式
-    video_extensions = ['.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv', '.m4v', '.webm', '.3gp']
+    if index is None:
+        index = build_video_index(video_dir)
     
     # 获取txt文件名（不含扩展名）
     txt_basename = os.path.splitext(os.path.basename(txt_path))[0]
     
-    # 在视频文件夹中查找同名视频文件
-    for root, dirs, files in os.walk(video_dir):
-        for file in files:
-            file_basename = os.path.splitext(file)[0]
-            file_ext = os.path.splitext(file)[1].lower()
-            
-            # 检查文件名是否匹配且扩展名是视频格式
-            if file_basename == txt_basename and file_ext in video_extensions:
-                return os.path.join(root, file)
+    video_path = index.get(txt_basename)
+    if video_path:
+        return video_path
     
     # 如果没找到，抛出异常
     raise FileNotFoundError(
         f"在视频文件夹 {video_dir} 中未找到与 {txt_path} 同名的视频文件。"
-        f"期望的文件名: {txt_basename} + 支持的扩展名: {', '.join(video_extensions)}"
+        f"期望的文件名: {txt_basename} + 支持的扩展名: {', '.join(VIDEO_EXTENSIONS)}"
     )
 
 
-def extract_frames_by_timestamps(video_path: str, txt_path: str, output_dir: str):
+def estimate_gop_frames(video_path: str, fps: float, probe_seconds: float = 30.0) -> int:
+    """
+    估算视频的关键帧间隔（GOP 长度，单位：帧）。
+
+    使用 ffmpeg 只解码开头 probe_seconds 秒内的关键帧，取相邻关键帧时间差的中位数；
+    ffmpeg 不可用或关键帧不足两个时，按常见的 2 秒 GOP 估算。
+    
+    @param video_path: 视频文件路径
+    @param fps: 视频帧率
+    @param probe_seconds: 探测时长（秒）
+    @return: GOP 长度（帧），至少为 1
+    """
+    fallback = max(1, int(round(fps * 2))) if fps > 0 else 50
+    if shutil.which("ffmpeg") is None or fps <= 0:
+        return fallback
+    
+    cmd = [
+        "ffmpeg", "-hide_banner", "-nostats",
+        "-skip_frame", "nokey",
+        "-t", str(probe_seconds),
+        "-i", video_path,
+        "-an", "-sn",
+        "-vf", "showinfo",
+        "-f", "null", "-",
+    ]
+    try:
+        proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=60)
+    except (OSError, subprocess.SubprocessError):
+        return fallback
+    
+    stderr = proc.stderr.decode("utf-8", "replace")
+    key_times = [float(t) for t in re.findall(r"\bn:\s*\d+.*?\bpts_time:\s*(\S+)", stderr)]
+    gaps = sorted(b - a for a, b in zip(key_times, key_times[1:]) if b > a)
+    if not gaps:
+        return fallback
+    median_gap = gaps[len(gaps) // 2]
+    return max(1, int(round(median_gap * fps)))
+
+
+def extract_frames_by_timestamps(video_path: str, txt_path: str, output_dir: str,
+                                 workers: Optional[int] = None,
+                                 image_options: Optional[dict] = None,
+                                 seek_threshold: Optional[int] = None,
+                                 progress_callback: Optional[Callable[[float, str], None]] = None):
     """
     从视频中提取指定时间点的帧并保存。
     
     @param video_path: 输入视频文件路径
     @param txt_path: 包含时间节点的txt文件路径
     @param output_dir: 输出目录路径
+    @param workers: 编码写盘线程数，默认按 CPU 核数
+    @param image_options: 输出图像参数（image_format/quality/max_edge/interpolation/grayscale）
+    @param seek_threshold: 相邻两个目标帧间隔超过该帧数时才 seek，否则顺序 grab；
+        默认取估算的 GOP 长度（每次 seek 都要从前一个关键帧开始解码，间隔小于一个 GOP 时顺序读取更省）
+    @param progress_callback: 进度回调 callback(percent, message)，每处理完一个时间节点调用一次
+    @return: (保存数量, 跳过数量)
     """
     # 检查视频文件是否存在
     if not os.path.isfile(video_path):
@@ -179,51 +254,84 @@ def extract_frames_by_timestamps(video_path: str, txt_path: str, output_dir: str
     
     print(f"视频信息: {total_frames} 帧, FPS: {fps:.2f}, 时长: {duration:.2f}秒")
     
+    if seek_threshold is None:
+        seek_threshold = estimate_gop_frames(video_path, fps)
+    seek_threshold = max(0, int(seek_threshold))
+    print(f"定位策略: 间隔超过 {seek_threshold} 帧时 seek，否则顺序读取")
+    
     # 获取视频文件名（不含扩展名）用于生成输出文件名
     video_basename = os.path.splitext(os.path.basename(video_path))[0]
     
-    saved_count = 0
     skipped_count = 0
+    seek_count = 0
+    writer = FrameWriter(workers=workers, **(image_options or {}))
+    # next_frame: 下一次 read() 将返回的帧号；None 表示尚未定位
+    next_frame: Optional[int] = None
+    last_frame_number: Optional[int] = None
+    last_frame = None
     
-    # 遍历每个时间节点
-    for timestamp_seconds, time_string in timestamps:
-        # 验证时间节点是否在视频时长范围内
-        if timestamp_seconds > duration:
-            print(f"警告: 时间节点 {time_string} ({timestamp_seconds}秒) 超出视频时长 ({duration:.2f}秒)，已跳过")
-            skipped_count += 1
-            continue
-        
-        # 将时间转换为帧号（精确到秒，取该秒的第一帧）
-        frame_number = int(timestamp_seconds * fps)
-        if frame_number >= total_frames:
-            frame_number = total_frames - 1
-        
-        # 定位到指定帧
-        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
-        ret, frame = cap.read()
-        
-        if not ret:
-            print(f"警告: 无法读取时间节点 {time_string} ({timestamp_seconds}秒) 对应的帧，已跳过")
-            skipped_count += 1
-            continue
-        
-        # 生成输出文件名：视频名_时间戳.jpg（使用原始时间字符串，替换冒号为下划线）
-        safe_time_string = time_string.replace(':', '_')
-        output_filename = f"{video_basename}_{safe_time_string}.jpg"
-        output_path = os.path.join(output_dir, output_filename)
-        
-        # 保存帧
-        success = cv2.imwrite(output_path, frame)
-        if success:
-            print(f"已保存: {output_filename} (时间节点: {time_string}, 帧号: {frame_number})")
-            saved_count += 1
-        else:
-            print(f"错误: 无法保存帧到 {output_path}")
-            skipped_count += 1
+    try:
+        # 遍历每个时间节点
+        for index, (timestamp_seconds, time_string) in enumerate(timestamps):
+            if progress_callback is not None and index > 0:
+                progress_callback(index / len(timestamps) * 100.0,
+                                  f"已处理 {index}/{len(timestamps)} 个时间节点")
+            # 验证时间节点是否在视频时长范围内
+            if timestamp_seconds > duration:
+                print(f"警告: 时间节点 {time_string} ({timestamp_seconds}秒) 超出视频时长 ({duration:.2f}秒)，已跳过")
+                skipped_count += 1
+                continue
+            
+            # 将时间转换为帧号（精确到秒，取该秒的第一帧）
+            frame_number = int(timestamp_seconds * fps)
+            if frame_number >= total_frames:
+                frame_number = total_frames - 1
+            
+            if frame_number == last_frame_number and last_frame is not None:
+                # 多个时间节点落在同一帧，直接复用
+                ret, frame = True, last_frame
+            else:
+                # 目标帧在当前位置之后且间隔不超过阈值：顺序 grab 跳过，避免重复解码同一 GOP
+                if (
+                    next_frame is None
+                    or frame_number < next_frame
+                    or frame_number - next_frame > seek_threshold
+                ):
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+                    next_frame = frame_number
+                    seek_count += 1
+                while next_frame < frame_number and cap.grab():
+                    next_frame += 1
+                ret, frame = cap.read()
+                next_frame += 1
+                last_frame_number = frame_number if ret else None
+                last_frame = frame if ret else None
+            
+            if not ret:
+                print(f"警告: 无法读取时间节点 {time_string} ({timestamp_seconds}秒) 对应的帧，已跳过")
+                skipped_count += 1
+                continue
+            
+            # 生成输出文件名：视频名_时间戳.jpg（使用原始时间字符串，替换冒号为下划线）
+            safe_time_string = time_string.replace(':', '_')
+            output_filename = f"{video_basename}_{safe_time_string}{writer.ext}"
+            output_path = os.path.join(output_dir, output_filename)
+            
+            # 提交给后台线程编码保存
+            writer.submit(output_path, frame)
+            print(f"已提交: {output_filename} (时间节点: {time_string}, 帧号: {frame_number})")
+    finally:
+        cap.release()
+        writer.close()
+    if progress_callback is not None:
+        progress_callback(100.0, f"已处理 {len(timestamps)}/{len(timestamps)} 个时间节点")
     
-    cap.release()
+    saved_count = writer.written
+    for error in writer.errors:
+        print(f"错误: {error}")
+    skipped_count += writer.failed
     
-    print(f"完成! 共保存 {saved_count} 张图像到: {output_dir}")
+    print(f"完成! 共保存 {saved_count} 张图像到: {output_dir}（seek {seek_count} 次）")
     if skipped_count > 0:
         print(f"警告: 跳过了 {skipped_count} 个时间节点")
     
@@ -253,6 +361,23 @@ if __name__ == "__main__":
         required=True,
         help="输出目录路径。如果处理多个txt文件，每个txt文件的输出将保存在以txt文件名命名的子目录中"
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="编码写盘线程数（默认按 CPU 核数）"
+    )
+    parser.add_argument(
+        "--seek_threshold",
+        type=int,
+        default=None,
+        help="相邻时间节点间隔超过该帧数时才 seek，否则顺序读取（默认取估算的 GOP 长度）"
+    )
+    parser.add_argument("--image_format", default="jpg", choices=["jpg", "webp", "png"], help="输出图片格式")
+    parser.add_argument("--quality", type=int, default=None, help="编码质量 1-100（默认使用 OpenCV 默认值）")
+    parser.add_argument("--max_edge", type=int, default=None, help="输出图片长边上限（像素），仅缩小")
+    parser.add_argument("--interpolation", default="area", choices=["area", "linear", "cubic", "lanczos", "nearest"], help="缩放插值方式")
+    parser.add_argument("--grayscale", action="store_true", help="输出灰度图")
     
     args = parser.parse_args()
     
@@ -282,6 +407,8 @@ if __name__ == "__main__":
         total_saved = 0
         total_skipped = 0
         failed_files = []
+        # 文件夹模式下只遍历一次视频目录
+        video_index = build_video_index(args.video_path) if txt_is_dir else None
         
         # 处理每个txt文件
         for txt_file in txt_files:
@@ -289,7 +416,7 @@ if __name__ == "__main__":
             if txt_is_dir:
                 # 文件夹模式：为每个txt文件查找对应的同名视频文件
                 try:
-                    video_file = find_video_file(txt_file, args.video_path)
+                    video_file = find_video_file(txt_file, args.video_path, video_index)
                     print(f"\n匹配: {os.path.basename(txt_file)} <-> {os.path.basename(video_file)}")
                 except FileNotFoundError as e:
                     print(f"\n错误: {e}")
@@ -310,7 +437,16 @@ if __name__ == "__main__":
                 saved, skipped = extract_frames_by_timestamps(
                     video_path=video_file,
                     txt_path=txt_file,
-                    output_dir=txt_output_dir
+                    output_dir=txt_output_dir,
+                    workers=args.workers,
+                    seek_threshold=args.seek_threshold,
+                    image_options={
+                        "image_format": args.image_format,
+                        "quality": args.quality,
+                        "max_edge": args.max_edge,
+                        "interpolation": args.interpolation,
+                        "grayscale": args.grayscale,
+                    }
                 )
                 total_saved += saved
                 total_skipped += skipped
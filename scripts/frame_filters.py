@@ -0,0 +1,133 @@
+"""
+抽帧过程中的帧筛选工具。
+
+在解码线程中对已解码的帧数组做低成本的特征计算，
+决定该帧是否值得写盘，从而减少写入、打包、下载与标注的帧数。
+"""
+from typing import Optional
+
+import cv2
+import numpy as np
+
+
+def difference_hash(frame, hash_size: int = 8) -> np.ndarray:
+    """
+    计算差值哈希（dHash）：缩小为 (hash_size+1) x hash_size 的灰度图，比较水平相邻像素。
+
+    @param frame: BGR 或灰度图像数组
+    @param hash_size: 哈希边长，结果为 hash_size*hash_size 位
+    @return: 展平的布尔数组
+    """
+    if frame.ndim == 3:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(frame, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    return (small[:, 1:] > small[:, :-1]).ravel()
+
+
+class FrameDeduplicator:
+    """
+    近重复帧过滤器：与上一张保留帧的 dHash 汉明距离不超过阈值时丢弃当前帧。
+
+    用法::
+
+        dedup = FrameDeduplicator(threshold=4)
+        if dedup.accept(frame):
+            writer.submit(path, frame)
+        print(dedup.dropped)
+    """
+
+    def __init__(self, threshold: int = 4, hash_size: int = 8):
+        """
+        @param threshold: 判定为重复的最大汉明距离（0 表示仅丢弃哈希完全相同的帧）
+        @param hash_size: 哈希边长，默认 8（64 位）
+        """
+        self.threshold = max(0, int(threshold))
+        self.hash_size = max(2, int(hash_size))
+        self.kept = 0
+        self.dropped = 0
+        self._last_hash: Optional[np.ndarray] = None
+
+    def accept(self, frame) -> bool:
+        """
+        判断当前帧是否保留；保留时更新参照哈希。
+
+        @param frame: 解码后的图像数组
+        @return: True 表示保留，False 表示与上一保留帧近似重复
+        """
+        current = difference_hash(frame, self.hash_size)
+        if self._last_hash is not None:
+            distance = int(np.count_nonzero(current != self._last_hash))
+            if distance <= self.threshold:
+                self.dropped += 1
+                return False
+        self._last_hash = current
+        self.kept += 1
+        return True
+
+
+class SceneDetector:
+    """
+    场景切换检测：将每帧缩小为低分辨率灰度图，与上一帧逐像素求平均绝对差，
+    差值超过阈值即视为新场景的首帧。
+
+    场景长度受 min_scene_frames / max_scene_frames 约束：
+    距上一个场景起点不足 min_scene_frames 帧的切换会被忽略（抑制闪光、快速晃动），
+    超过 max_scene_frames 帧仍未切换时强制开始新的一段，保证长镜头也有采样。
+    """
+
+    def __init__(
+        self,
+        threshold: float = 30.0,
+        min_scene_frames: int = 15,
+        max_scene_frames: Optional[int] = None,
+        width: int = 64,
+    ):
+        """
+        @param threshold: 切换阈值，缩略灰度图的平均像素差（0～255）
+        @param min_scene_frames: 场景最少帧数
+        @param max_scene_frames: 场景最多帧数，为空表示不限
+        @param width: 计算差异时的缩略图宽度（高度按比例）
+        """
+        self.threshold = float(threshold)
+        self.min_scene_frames = max(1, int(min_scene_frames))
+        self.max_scene_frames = int(max_scene_frames) if max_scene_frames else None
+        self.width = max(8, int(width))
+        self.scenes = 0
+        self.last_score = 0.0
+        self._prev: Optional[np.ndarray] = None
+        self._frames_in_scene = 0
+
+    def _thumbnail(self, frame) -> np.ndarray:
+        if frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        h, w = frame.shape[:2]
+        height = max(1, round(h * self.width / max(1, w)))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        return small.astype(np.int16)
+
+    def is_scene_start(self, frame) -> bool:
+        """
+        输入按时间顺序排列的每一帧，返回该帧是否为新场景的首帧。
+
+        @param frame: 解码后的图像数组
+        """
+        current = self._thumbnail(frame)
+        prev = self._prev
+        self._prev = current
+
+        if prev is None or prev.shape != current.shape:
+            start = True
+        else:
+            self._frames_in_scene += 1
+            self.last_score = float(np.mean(np.abs(current - prev)))
+            cut = self.last_score >= self.threshold and self._frames_in_scene >= self.min_scene_frames
+            too_long = (
+                self.max_scene_frames is not None
+                and self._frames_in_scene >= self.max_scene_frames
+            )
+            start = cut or too_long
+
+        if start:
+            self.scenes += 1
+            self._frames_in_scene = 0
+        return start
@@ -0,0 +1,266 @@
+"""
+帧的分片输出：把大量帧顺序写入少量大文件，代替成千上万个小图片文件。
+
+- TarShardWriter：WebDataset 风格的 tar 分片（`{key}.jpg` + `{key}.json`），
+  每个分片达到指定大小后切换到下一个，可直接被 webdataset 等数据加载器流式读取；
+- NpyStackWriter：单个 `.npy` 帧堆栈（N x H x W x C，uint8），可用 np.load(mmap_mode="r")
+  内存映射读取，另附 JSON 索引记录每帧的 key 与时间戳。
+
+两者与 FrameWriter 接口一致（submit / close / ext / written / failed / errors），
+缩放、编码仍在线程池中并行执行，但按提交顺序追加写入，保证分片内的帧序与时间顺序一致。
+"""
+import io
+import json
+import os
+import re
+import tarfile
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# 兼容直接以脚本运行与模块方式运行
+try:
+    from .frame_writer import FrameWriter
+except ImportError:
+    from frame_writer import FrameWriter  # type: ignore
+
+OUTPUT_MODES = ("files", "tar", "npy")
+
+# .npy 头部固定长度（含魔数），预留足够空间，写完后回填真实帧数
+_NPY_HEADER_SIZE = 128
+
+
+def sample_key(path: str) -> str:
+    """
+    由输出文件路径生成样本 key：去掉扩展名，并把点号替换为下划线
+    （WebDataset 以第一个点号区分 key 与扩展名）。
+    """
+    stem = os.path.splitext(os.path.basename(str(path)))[0]
+    return re.sub(r"[.\s]+", "_", stem)
+
+
+class _OrderedShardWriter(FrameWriter, ABC):
+    """
+    有序分片写入器基类：编码在线程池中并行，结果按提交顺序交给 _append 顺序写入。
+    子类实现 _encode（在编码线程中执行）与 _append / _finish（在调用方线程中执行）。
+    """
+
+    def __init__(self, output_dir: str, prefix: str, **kwargs):
+        super().__init__(**kwargs)
+        self.output_dir = str(output_dir)
+        self.prefix = sample_key(prefix) or "frames"
+        self.outputs: List[str] = []
+        self._pending: Deque[Tuple[str, Optional[dict], object]] = deque()
+        os.makedirs(self.output_dir, exist_ok=True)
+
+    def submit(self, path: str, frame, meta: Optional[dict] = None) -> None:
+        """
+        提交一帧；排队帧数超过上限时阻塞，等待最早提交的帧写入。
+
+        @param path: 逻辑文件名（用于生成样本 key）
+        @param frame: BGR 图像数组（提交后调用方不应再修改该数组）
+        @param meta: 随帧保存的元信息，如 {"timestamp": 1.5}
+        """
+        future = self._executor.submit(self._encode, frame)
+        self._pending.append((sample_key(path), meta, future))
+        self._drain(block=len(self._pending) > self.max_pending)
+
+    def _drain(self, block: bool) -> None:
+        while self._pending and (block or self._pending[0][2].done()):
+            key, meta, future = self._pending.popleft()
+            try:
+                self._append(key, future.result(), meta or {})
+                self.written += 1
+            except Exception as exc:  # noqa: BLE001
+                self.failed += 1
+                self.errors.append(str(exc))
+            block = len(self._pending) > self.max_pending
+
+    @abstractmethod
+    def _encode(self, frame):
+        """在编码线程中把一帧转换为待写入的数据。"""
+
+    @abstractmethod
+    def _append(self, key: str, payload, meta: dict) -> None:
+        """按提交顺序追加写入一帧。"""
+
+    @abstractmethod
+    def _finish(self) -> None:
+        """收尾：关闭当前分片并写出索引等。"""
+
+    def close(self) -> int:
+        """
+        等待所有帧写入并关闭分片文件。
+
+        @return: 成功写入的帧数
+        """
+        while self._pending:
+            self._drain(block=True)
+        self._executor.shutdown(wait=True)
+        self._finish()
+        return self.written
+
+
+class TarShardWriter(_OrderedShardWriter):
+    """
+    WebDataset 风格的 tar 分片写入器。
+
+    用法::
+
+        with TarShardWriter("out", "video", shard_size_mb=256) as writer:
+            writer.submit("video_frame_1.00s.jpg", frame, {"timestamp": 1.0})
+        print(writer.outputs)
+    """
+
+    def __init__(self, output_dir: str, prefix: str, shard_size_mb: float = 256,
+                 max_per_shard: Optional[int] = None, **kwargs):
+        """
+        @param output_dir: 分片输出目录
+        @param prefix: 分片文件名前缀，分片命名为 {prefix}-000000.tar
+        @param shard_size_mb: 单个分片的目标大小（MB），超过后切换新分片
+        @param max_per_shard: 单个分片的最大样本数，为空表示只按大小切分
+        @param kwargs: 其余参数同 FrameWriter（workers/image_format/quality/max_edge 等）
+        """
+        super().__init__(output_dir, prefix, **kwargs)
+        self.shard_bytes = max(1, int(float(shard_size_mb) * 1024 * 1024))
+        self.max_per_shard = int(max_per_shard) if max_per_shard else None
+        self._tar: Optional[tarfile.TarFile] = None
+        self._tar_bytes = 0
+        self._tar_count = 0
+
+    def _encode(self, frame) -> bytes:
+        frame = self._transform(frame)
+        ok, buf = cv2.imencode(self.ext, frame, self.encode_params)
+        if not ok:
+            raise IOError("图像编码失败")
+        return buf.tobytes()
+
+    def _open_next_shard(self) -> None:
+        if self._tar is not None:
+            self._tar.close()
+        path = os.path.join(self.output_dir, f"{self.prefix}-{len(self.outputs):06d}.tar")
+        self._tar = tarfile.open(path, "w")
+        self.outputs.append(path)
+        self._tar_bytes = 0
+        self._tar_count = 0
+
+    def _add_member(self, name: str, data: bytes, mtime: float) -> None:
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(mtime)
+        self._tar.addfile(info, io.BytesIO(data))
+        self._tar_bytes += len(data)
+
+    def add_sample(self, key: str, files: Dict[str, bytes]) -> None:
+        """
+        直接追加一个样本（已编码的数据），如图片 + YOLO 标签：{".jpg": ..., ".txt": ...}。
+        与 submit 共享分片切换逻辑，但不经过编码线程池。
+        """
+        full = self._tar is not None and (
+            self._tar_bytes >= self.shard_bytes
+            or (self.max_per_shard is not None and self._tar_count >= self.max_per_shard)
+        )
+        if self._tar is None or full:
+            self._open_next_shard()
+        mtime = time.time()
+        for ext, data in files.items():
+            self._add_member(f"{key}{ext}", data, mtime)
+        self._tar_count += 1
+
+    def _append(self, key: str, payload: bytes, meta: dict) -> None:
+        files = {self.ext: payload}
+        if meta:
+            files[".json"] = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+        self.add_sample(key, files)
+
+    def _finish(self) -> None:
+        if self._tar is not None:
+            self._tar.close()
+            self._tar = None
+
+
+class NpyStackWriter(_OrderedShardWriter):
+    """
+    `.npy` 帧堆栈写入器：帧数据顺序追加到同一文件，关闭时回填头部中的帧数，
+    所有帧（缩放 / 灰度处理后）必须尺寸一致。索引写入 {prefix}_index.json。
+    """
+
+    def __init__(self, output_dir: str, prefix: str, **kwargs):
+        """
+        @param output_dir: 输出目录
+        @param prefix: 文件名前缀，输出 {prefix}.npy 与 {prefix}_index.json
+        @param kwargs: 其余参数同 FrameWriter（image_format / quality 对该格式无效）
+        """
+        super().__init__(output_dir, prefix, **kwargs)
+        self.ext = ".npy"
+        self.npy_path = os.path.join(self.output_dir, f"{self.prefix}.npy")
+        self.index_path = os.path.join(self.output_dir, f"{self.prefix}_index.json")
+        self._file = None
+        self._shape: Optional[Tuple[int, ...]] = None
+        self._index: List[dict] = []
+
+    def _encode(self, frame) -> np.ndarray:
+        return np.ascontiguousarray(self._transform(frame), dtype=np.uint8)
+
+    def _header(self, count: int) -> bytes:
+        header = "{'descr': '|u1', 'fortran_order': False, 'shape': %r, }" % (
+            (count,) + self._shape,
+        )
+        body_len = _NPY_HEADER_SIZE - 10
+        if len(header) + 1 > body_len:
+            raise ValueError("帧尺寸过大，无法写入 .npy 头部")
+        header = header.ljust(body_len - 1) + "\n"
+        return b"\x93NUMPY\x01\x00" + body_len.to_bytes(2, "little") + header.encode("latin1")
+
+    def _append(self, key: str, payload: np.ndarray, meta: dict) -> None:
+        if self._file is None:
+            self._shape = tuple(payload.shape)
+            self._file = open(self.npy_path, "wb")
+            self._file.write(self._header(0))
+            self.outputs = [self.npy_path, self.index_path]
+        elif tuple(payload.shape) != self._shape:
+            raise ValueError(f"帧尺寸不一致: {payload.shape} != {self._shape}")
+        self._file.write(payload.tobytes())
+        self._index.append({"index": len(self._index), "key": key, **meta})
+
+    def _finish(self) -> None:
+        if self._file is None:
+            return
+        self._file.seek(0)
+        self._file.write(self._header(len(self._index)))
+        self._file.close()
+        self._file = None
+        with open(self.index_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"shape": [len(self._index), *self._shape], "dtype": "uint8", "frames": self._index},
+                f,
+                ensure_ascii=False,
+            )
+
+
+def create_frame_writer(output_dir: str, prefix: str, workers: Optional[int] = None,
+                        image_options: Optional[dict] = None,
+                        shard_options: Optional[dict] = None) -> FrameWriter:
+    """
+    按输出模式创建写入器。
+
+    @param output_dir: 输出目录
+    @param prefix: 分片文件名前缀（files 模式不使用）
+    @param workers: 编码线程数
+    @param image_options: 图像参数（image_format/quality/max_edge/interpolation/grayscale）
+    @param shard_options: {"mode": "files"|"tar"|"npy", "shard_size_mb": 256}，为空表示逐帧写文件
+    """
+    options = dict(shard_options or {})
+    mode = (options.pop("mode", None) or "files").strip().lower()
+    if mode not in OUTPUT_MODES:
+        raise ValueError(f"不支持的输出模式: {mode}，可选: {', '.join(OUTPUT_MODES)}")
+    image_options = image_options or {}
+    if mode == "tar":
+        return TarShardWriter(output_dir, prefix, workers=workers, **options, **image_options)
+    if mode == "npy":
+        return NpyStackWriter(output_dir, prefix, workers=workers, **image_options)
+    return FrameWriter(workers=workers, **image_options)
@@ -0,0 +1,177 @@
+"""
+帧图像异步写盘工具。
+
+解码线程只负责读取视频帧并提交给 FrameWriter，
+缩放、图像编码与文件写入在后台线程池中完成（OpenCV 编码时会释放 GIL），
+待处理帧数受上限约束，解码过快时提交会阻塞，从而限制内存占用。
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import cv2
+
+# 输出格式 -> (文件扩展名, 质量参数)；PNG 为无损格式，质量参数映射为压缩级别
+IMAGE_FORMATS = {
+    "jpg": (".jpg", cv2.IMWRITE_JPEG_QUALITY),
+    "webp": (".webp", cv2.IMWRITE_WEBP_QUALITY),
+    "png": (".png", cv2.IMWRITE_PNG_COMPRESSION),
+}
+
+# 缩放插值方式；缩小图像时 area 效果最好
+INTERPOLATIONS = {
+    "area": cv2.INTER_AREA,
+    "linear": cv2.INTER_LINEAR,
+    "cubic": cv2.INTER_CUBIC,
+    "lanczos": cv2.INTER_LANCZOS4,
+    "nearest": cv2.INTER_NEAREST,
+}
+
+
+def normalize_image_format(image_format: Optional[str]) -> str:
+    """
+    规范化输出格式名称，支持 jpg/jpeg/webp/png，大小写不敏感。
+    """
+    fmt = (image_format or "jpg").strip().lower().lstrip(".")
+    if fmt == "jpeg":
+        fmt = "jpg"
+    if fmt not in IMAGE_FORMATS:
+        raise ValueError(f"不支持的图片格式: {image_format}，可选: {', '.join(IMAGE_FORMATS)}")
+    return fmt
+
+
+def build_encode_params(image_format: str, quality: Optional[int]) -> List[int]:
+    """
+    构造 cv2.imencode 编码参数。
+
+    @param image_format: 规范化后的格式名
+    @param quality: 1～100 的质量值；为空时使用 OpenCV 默认值
+    """
+    if quality is None:
+        return []
+    q = max(1, min(100, int(quality)))
+    _, flag = IMAGE_FORMATS[image_format]
+    if image_format == "png":
+        # 质量越高压缩越轻：100 -> 0（最快），1 -> 9（最小）
+        return [flag, round((100 - q) * 9 / 99)]
+    return [flag, q]
+
+
+def default_worker_count() -> int:
+    """
+    默认编码线程数：CPU 核数减去解码线程占用的一个核，至少 1 个，至多 8 个。
+    """
+    return max(1, min(8, (os.cpu_count() or 2) - 1))
+
+
+class FrameWriter:
+    """
+    有界的生产者/消费者帧写入器。
+
+    用法::
+
+        with FrameWriter() as writer:
+            writer.submit(path, frame)
+        print(writer.written, writer.failed)
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        image_format: Optional[str] = None,
+        quality: Optional[int] = None,
+        max_edge: Optional[int] = None,
+        interpolation: Optional[str] = None,
+        grayscale: bool = False,
+    ):
+        """
+        @param workers: 编码线程数，默认见 default_worker_count()
+        @param max_pending: 排队中（已提交未写完）帧数上限，默认为线程数的 4 倍
+        @param image_format: 输出格式 jpg/webp/png，默认 jpg
+        @param quality: 1～100 的编码质量，默认使用 OpenCV 默认值
+        @param max_edge: 长边上限（像素），超出时等比缩小，不放大
+        @param interpolation: 缩放插值方式，见 INTERPOLATIONS，默认 area
+        @param grayscale: 是否转为灰度图
+        """
+        self.workers = int(workers) if workers else default_worker_count()
+        self.max_pending = int(max_pending) if max_pending else self.workers * 4
+        self.image_format = normalize_image_format(image_format)
+        self.ext = IMAGE_FORMATS[self.image_format][0]
+        self.encode_params = build_encode_params(self.image_format, quality)
+        self.max_edge = int(max_edge) if max_edge and int(max_edge) > 0 else None
+        interp_key = (interpolation or "area").strip().lower()
+        if interp_key not in INTERPOLATIONS:
+            raise ValueError(f"不支持的插值方式: {interpolation}，可选: {', '.join(INTERPOLATIONS)}")
+        self.interpolation = INTERPOLATIONS[interp_key]
+        self.grayscale = bool(grayscale)
+        self.written = 0
+        self.failed = 0
+        self.errors: List[str] = []
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="frame-writer"
+        )
+
+    def submit(self, path: str, frame, meta: Optional[dict] = None) -> None:
+        """
+        提交一帧待写入；队列已满时阻塞，直到有编码线程空出位置。
+
+        @param path: 输出文件路径，扩展名应与 self.ext 一致
+        @param frame: BGR 图像数组（提交后调用方不应再修改该数组）
+        @param meta: 帧元信息（如时间戳）；逐帧写文件时不使用，分片写入器会一并保存
+        """
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._write, str(path), frame)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _f: self._slots.release())
+
+    def _transform(self, frame):
+        """在编码线程中执行灰度转换与缩放，解码线程无需等待。"""
+        if self.grayscale and frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        if self.max_edge:
+            h, w = frame.shape[:2]
+            long_edge = max(h, w)
+            if long_edge > self.max_edge:
+                ratio = self.max_edge / long_edge
+                size = (max(1, round(w * ratio)), max(1, round(h * ratio)))
+                frame = cv2.resize(frame, size, interpolation=self.interpolation)
+        return frame
+
+    def _write(self, path: str, frame) -> None:
+        try:
+            frame = self._transform(frame)
+            ok, buf = cv2.imencode(self.ext, frame, self.encode_params)
+            if not ok:
+                raise IOError(f"图像编码失败: {path}")
+            # 使用 Python 文件接口写入，兼容 Windows 下的中文路径
+            with open(path, "wb") as f:
+                f.write(buf.tobytes())
+        except Exception as exc:  # noqa: BLE001
+            with self._lock:
+                self.failed += 1
+                self.errors.append(str(exc))
+            return
+        with self._lock:
+            self.written += 1
+
+    def close(self) -> int:
+        """
+        等待所有已提交帧写入完成并关闭线程池。
+
+        @return: 成功写入的帧数
+        """
+        self._executor.shutdown(wait=True)
+        return self.written
+
+    def __enter__(self) -> "FrameWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
@@ -0,0 +1,104 @@
+"""
+GIF 全局调色板：从抽样帧中收集像素，用 NumPy 向量化的中位切分（median cut）得到初始调色板，
+再做少量 k-means 迭代微调。所有帧共用同一调色板，后续帧只需写入变化像素，
+配合透明色即可让未变化区域几乎不占体积。
+"""
+from typing import List
+
+import numpy as np
+
+# 参与聚类的像素上限：足以覆盖画面主要颜色，又能让 k-means 在毫秒级完成
+MAX_SAMPLE_PIXELS = 120_000
+# k-means 距离矩阵分块行数，限制 (行数 x 颜色数) 的临时内存
+_KMEANS_CHUNK = 16_384
+
+
+def collect_samples(frames: List[np.ndarray], max_pixels: int = MAX_SAMPLE_PIXELS) -> np.ndarray:
+    """
+    从若干 RGB 帧中等间隔抽取像素。
+
+    @param frames: H x W x 3 的 uint8 数组列表
+    @param max_pixels: 返回像素数上限
+    @return: N x 3 的 uint8 数组
+    """
+    if not frames:
+        raise ValueError("没有可用于生成调色板的帧")
+    pixels = np.concatenate([f.reshape(-1, 3) for f in frames], axis=0)
+    step = max(1, len(pixels) // max_pixels)
+    return np.ascontiguousarray(pixels[::step][:max_pixels])
+
+
+def median_cut(pixels: np.ndarray, colors: int) -> np.ndarray:
+    """
+    中位切分：反复把取值范围最大的颜色盒沿最宽的通道在中位数处一分为二，
+    直到盒子数达到 colors，每个盒子取平均色。
+
+    @param pixels: N x 3 的 uint8 数组
+    @param colors: 目标颜色数
+    @return: K x 3 的 float32 数组（K <= colors）
+    """
+    def box_range(box: np.ndarray) -> np.ndarray:
+        return box.max(axis=0) - box.min(axis=0)
+
+    boxes = [pixels.astype(np.int16)]
+    ranges = [box_range(boxes[0])]
+    while len(boxes) < colors:
+        idx = int(np.argmax([int(r.max()) for r in ranges]))
+        if int(ranges[idx].max()) == 0:
+            break  # 剩余盒子都只有单一颜色，无法再分
+        box = boxes.pop(idx)
+        channel = int(np.argmax(ranges.pop(idx)))
+        order = np.argsort(box[:, channel], kind="stable")
+        half = len(box) // 2
+        for part in (box[order[:half]], box[order[half:]]):
+            boxes.append(part)
+            ranges.append(box_range(part))
+    return np.array([b.mean(axis=0) for b in boxes], dtype=np.float32)
+
+
+def _nearest(pixels: np.ndarray, centers: np.ndarray) -> np.ndarray:
+    """分块计算每个像素最近的调色板颜色下标。"""
+    labels = np.empty(len(pixels), dtype=np.int32)
+    center_sq = (centers ** 2).sum(axis=1)
+    for start in range(0, len(pixels), _KMEANS_CHUNK):
+        chunk = pixels[start : start + _KMEANS_CHUNK]
+        # |x - c|^2 = |x|^2 - 2 x·c + |c|^2，|x|^2 对取 argmin 无影响
+        dist = center_sq[None, :] - 2.0 * chunk @ centers.T
+        labels[start : start + _KMEANS_CHUNK] = dist.argmin(axis=1)
+    return labels
+
+
+def kmeans_refine(pixels: np.ndarray, centers: np.ndarray, iterations: int = 4) -> np.ndarray:
+    """
+    以中位切分结果为初值做几轮 Lloyd 迭代，使调色板更贴近像素分布。
+
+    @param pixels: N x 3 的 uint8 数组
+    @param centers: K x 3 的初始颜色
+    @param iterations: 迭代次数
+    @return: K x 3 的 float32 数组
+    """
+    data = pixels.astype(np.float32)
+    centers = centers.astype(np.float32).copy()
+    k = len(centers)
+    for _ in range(max(0, int(iterations))):
+        labels = _nearest(data, centers)
+        counts = np.bincount(labels, minlength=k).astype(np.float32)
+        used = counts > 0
+        for c in range(3):
+            sums = np.bincount(labels, weights=data[:, c], minlength=k)
+            centers[used, c] = sums[used] / counts[used]
+    return centers
+
+
+def build_global_palette(frames: List[np.ndarray], colors: int = 255) -> np.ndarray:
+    """
+    由抽样帧生成全局调色板。
+
+    @param frames: H x W x 3 的 uint8 RGB 帧列表
+    @param colors: 颜色数上限（2～256）
+    @return: K x 3 的 uint8 调色板
+    """
+    colors = max(2, min(256, int(colors)))
+    samples = collect_samples(frames)
+    centers = kmeans_refine(samples, median_cut(samples, colors))
+    return np.clip(np.rint(centers), 0, 255).astype(np.uint8)
@@ -0,0 +1,109 @@
+"""
+流式 GIF 写入：每一帧量化后立即编码写入文件，不再把所有帧保存在列表中最后统一 save。
+
+Pillow 的 save(save_all=True, append_images=...) 需要一次性拿到全部帧，内存随帧数线性增长；
+这里基于 GifImagePlugin 的 getheader / getdata（逐帧编码接口）自行组织文件结构，
+任意时刻只保留一帧待写入的数据（用于合并相同帧的显示时长），单个任务的内存与帧数无关。
+"""
+from typing import Optional, Tuple
+
+from PIL import GifImagePlugin, Image, ImageChops
+
+# 帧之间不清除画布（disposal=1）：后续帧只写变化区域，未覆盖的部分沿用上一帧
+DISPOSAL_KEEP = 1
+
+
+def changed_bbox(previous: Optional[Image.Image], current: Image.Image) -> Optional[Tuple[int, int, int, int]]:
+    """
+    计算两帧之间发生变化的矩形区域。
+
+    @param previous: 上一帧（RGB），为空表示当前是第一帧
+    @param current: 当前帧（RGB）
+    @return: (left, top, right, bottom)；两帧完全相同时返回 None
+    """
+    if previous is None or previous.size != current.size:
+        return (0, 0) + current.size
+    return ImageChops.difference(previous, current).getbbox()
+
+
+class StreamingGifWriter:
+    """
+    逐帧追加写入 GIF 文件。
+
+    用法::
+
+        with StreamingGifWriter("out.gif") as writer:
+            for image_p, offset in frames:
+                writer.add(image_p, offset, duration=40)
+            writer.extend(40)  # 与上一帧相同的帧只累加显示时长
+    """
+
+    def __init__(self, output_path: str, loop: int = 0):
+        """
+        @param output_path: 输出 GIF 路径
+        @param loop: 循环次数，0 表示无限循环
+        """
+        self.output_path = output_path
+        self.loop = loop
+        self.frames = 0
+        self._fp = open(output_path, "wb")
+        self._pending: Optional[Tuple[Image.Image, Tuple[int, int], float, dict]] = None
+
+    def add(self, image: Image.Image, offset: Tuple[int, int] = (0, 0), duration: float = 100,
+            **params) -> None:
+        """
+        追加一帧。第一帧必须覆盖整个画布（offset 为 (0, 0)），其尺寸即 GIF 尺寸。
+
+        @param image: 已量化的 P 模式图像（可以只是变化区域）
+        @param offset: 图像在画布中的左上角坐标
+        @param duration: 显示时长（毫秒）
+        @param params: 额外的帧参数，如 transparency、include_color_table
+        """
+        if image.mode != "P":
+            raise ValueError("StreamingGifWriter 只接受 P 模式（已量化）的图像")
+        self._flush()
+        self._pending = (image, offset, float(duration), params)
+
+    def extend(self, duration: float) -> None:
+        """上一帧再显示 duration 毫秒（用于跳过与上一帧相同的帧）。"""
+        if self._pending is None:
+            raise ValueError("尚未写入任何帧")
+        image, offset, total, params = self._pending
+        self._pending = (image, offset, total + float(duration), params)
+
+    def _flush(self) -> None:
+        if self._pending is None:
+            return
+        image, offset, duration, params = self._pending
+        self._pending = None
+        if self.frames == 0:
+            header, _ = GifImagePlugin.getheader(image, info={"loop": self.loop, "duration": duration})
+            for chunk in header:
+                self._fp.write(chunk)
+        frame_params = {"include_color_table": True, "disposal": DISPOSAL_KEEP, **params}
+        # GIF 的帧延时以 1/100 秒为单位，且不少于 1
+        frame_params["duration"] = max(10, int(round(duration / 10.0)) * 10)
+        for chunk in GifImagePlugin.getdata(image, offset, **frame_params):
+            self._fp.write(chunk)
+        self.frames += 1
+
+    def close(self) -> int:
+        """
+        写入最后一帧与文件结束符。
+
+        @return: 写入的帧数（合并后的实际帧数）
+        """
+        if self._fp.closed:
+            return self.frames
+        try:
+            self._flush()
+            self._fp.write(b";")
+        finally:
+            self._fp.close()
+        return self.frames
+
+    def __enter__(self) -> "StreamingGifWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
@@ -0,0 +1,330 @@
+"""
+图片并发下载器。
+
+所有请求共用一个 urllib3 连接池（同一主机的连接可复用，省去重复的 TCP / TLS 握手），
+下载在线程池中并发执行，并按主机限制同时进行的请求数，避免压垮单个站点；
+响应体按块流式写入临时文件，完成后再改名，内存占用与图片大小无关。
+连接失败、超时与 429/5xx 会按指数退避重试。
+
+可选的 HttpCache 在磁盘上持久保存每个 URL 的 ETag / Last-Modified 与内容，
+再次抓取时发送条件请求，服务端返回 304 时直接复用本地内容；
+同一任务中内容相同（SHA-256 一致）的图片只保存一份，文件名冲突时追加内容哈希，不会互相覆盖。
+"""
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Set
+from urllib.parse import urlparse
+
+import urllib3
+from urllib3.util import Retry, Timeout
+
+# 全局并发下载数与单个主机的并发上限
+DEFAULT_WORKERS = 16
+DEFAULT_PER_HOST = 4
+# 连接 / 读取超时（秒）与重试次数
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 30.0
+DEFAULT_RETRIES = 3
+CHUNK_SIZE = 64 * 1024
+# 提前放弃的响应体不超过该大小时读完丢弃以复用连接，否则直接关闭连接
+MAX_DRAIN_BYTES = 64 * 1024
+# 需要重试的 HTTP 状态码（限流与服务端临时错误）
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+DEFAULT_HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; images-download)"}
+
+
+class HttpCache:
+    """
+    持久化 HTTP 缓存：meta/ 下按 URL 哈希保存校验信息（ETag、Last-Modified、内容哈希），
+    blobs/ 下按内容哈希保存图片本体，多个 URL 指向同一内容时只存一份。
+    """
+
+    def __init__(self, cache_dir: str):
+        """
+        @param cache_dir: 缓存目录，可在多次任务之间共享
+        """
+        self.cache_dir = str(cache_dir)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _meta_path(self, url: str) -> str:
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, "meta", key[:2], f"{key}.json")
+
+    def blob_path(self, sha256: str) -> str:
+        return os.path.join(self.cache_dir, "blobs", sha256[:2], sha256)
+
+    def lookup(self, url: str) -> Optional[dict]:
+        """返回 URL 的缓存记录；不存在或内容已丢失时返回 None。"""
+        try:
+            with open(self._meta_path(url), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry if os.path.exists(self.blob_path(entry.get("sha256", ""))) else None
+
+    @staticmethod
+    def conditional_headers(entry: dict) -> Dict[str, str]:
+        """由缓存记录生成条件请求头。"""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, url: str, file_path: str, sha256: str, headers) -> None:
+        """
+        记录一次完整下载。响应既无 ETag 也无 Last-Modified 时无法做条件请求，不缓存。
+
+        @param file_path: 已下载的文件（会以硬链接 / 复制的方式存入 blobs）
+        @param headers: 响应头
+        """
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+        blob = self.blob_path(sha256)
+        if not os.path.exists(blob):
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            link_or_copy(file_path, blob)
+        entry = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "content_type": headers.get("Content-Type"),
+            "sha256": sha256,
+        }
+        meta = self._meta_path(url)
+        os.makedirs(os.path.dirname(meta), exist_ok=True)
+        tmp = f"{meta}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp, meta)
+
+
+def release_response(response) -> None:
+    """
+    归还连接。响应体未读完（错误状态码、非预期类型等提前返回）时不能直接放回连接池，
+    否则下一个请求会读到残留数据：较小的响应体读完丢弃，过大或长度未知时关闭连接。
+    """
+    if not response.closed:
+        # length_remaining：剩余字节数（304 等无响应体的状态为 0），长度未知时为 None
+        remaining = response.length_remaining
+        if remaining is not None and remaining <= MAX_DRAIN_BYTES:
+            response.drain_conn()
+        else:
+            response.close()
+    response.release_conn()
+
+
+def link_or_copy(src: str, dst: str) -> None:
+    """优先创建硬链接（同一文件系统时零拷贝），失败时退回复制。"""
+    try:
+        os.link(src, dst)
+    except FileExistsError:
+        pass
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+class ImageFetcher:
+    """
+    并发下载图片到指定目录。
+
+    用法::
+
+        with ImageFetcher("out") as fetcher:
+            for src in image_urls:
+                fetcher.submit(src)
+        print(fetcher.files, fetcher.errors)
+    """
+
+    def __init__(self, save_path: str, workers: int = DEFAULT_WORKERS,
+                 per_host: int = DEFAULT_PER_HOST, retries: int = DEFAULT_RETRIES,
+                 connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout: float = DEFAULT_READ_TIMEOUT,
+                 http: Optional[urllib3.PoolManager] = None,
+                 cache: Optional[HttpCache] = None):
+        """
+        @param save_path: 图片保存目录
+        @param workers: 全局并发下载数
+        @param per_host: 单个主机同时进行的请求数上限
+        @param retries: 失败重试次数
+        @param connect_timeout: 连接超时（秒）
+        @param read_timeout: 两次读取之间的最长等待（秒）
+        @param http: 可选的共享连接池，为空时自动创建
+        @param cache: 可选的持久化 HTTP 缓存
+        """
+        self.save_path = str(save_path)
+        self.per_host = max(1, int(per_host))
+        self.retries = max(0, int(retries))
+        self.http = http or create_pool_manager(self.per_host, retries, connect_timeout, read_timeout)
+        self.cache = cache
+        self.files: List[str] = []
+        self.errors: List[str] = []
+        self.not_modified = 0  # 304 命中缓存的数量
+        self.duplicates = 0  # 内容与已保存图片相同而跳过的数量
+        self._by_hash: Dict[str, str] = {}
+        self._names: Set[str] = set()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, int(workers)),
+                                            thread_name_prefix="image-fetch")
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._seen: Set[str] = set()
+        self._futures: List[Future] = []
+        self._lock = threading.Lock()
+        os.makedirs(self.save_path, exist_ok=True)
+
+    def submit(self, src: str) -> Optional[Future]:
+        """
+        提交一张图片（绝对 URL）；同一 URL 只下载一次。
+
+        @return: 对应的 Future；重复或非 http(s) 地址返回 None
+        """
+        if urlparse(src).scheme not in ("http", "https"):
+            return None
+        with self._lock:
+            if src in self._seen:
+                return None
+            self._seen.add(src)
+        future = self._executor.submit(self._fetch, src)
+        self._futures.append(future)
+        return future
+
+    def host_slot(self, src: str) -> threading.BoundedSemaphore:
+        """主机并发名额；抓取网页等其它请求也可持有它，与图片下载共享同一上限。"""
+        host = urlparse(src).netloc.lower()
+        with self._lock:
+            return self._host_slots.setdefault(host, threading.BoundedSemaphore(self.per_host))
+
+    def _claim_path(self, src: str, sha256: str, content_type: Optional[str]) -> Optional[str]:
+        """
+        为内容分配保存路径（需持有 self._lock）。内容已保存过时返回 None；
+        文件名被其它内容占用时追加内容哈希前缀，保证不会覆盖。
+        """
+        if sha256 in self._by_hash:
+            return None
+        name = os.path.basename(urlparse(src).path) or "image"
+        stem, ext = os.path.splitext(name)
+        if not ext and content_type:
+            ext = mimetypes.guess_extension(content_type.split(";")[0].strip()) or ""
+        candidate = f"{stem}{ext}"
+        counter = 0
+        while candidate in self._names or os.path.exists(os.path.join(self.save_path, candidate)):
+            counter += 1
+            suffix = sha256[:8] if counter == 1 else f"{sha256[:8]}_{counter}"
+            candidate = f"{stem}_{suffix}{ext}"
+        self._names.add(candidate)
+        path = os.path.join(self.save_path, candidate)
+        self._by_hash[sha256] = path
+        return path
+
+    def _place(self, src: str, source: str, sha256: str, content_type: Optional[str],
+               move: bool) -> str:
+        """把已下载（或缓存中）的内容放到保存目录，内容重复时不再保存。"""
+        with self._lock:
+            path = self._claim_path(src, sha256, content_type)
+            if path is None:
+                self.duplicates += 1
+                return self._by_hash[sha256]
+        if move:
+            os.replace(source, path)
+        else:
+            link_or_copy(source, path)
+        with self._lock:
+            self.files.append(path)
+        print(f"已下载: {os.path.basename(path)}")
+        return path
+
+    def _fetch(self, src: str) -> Optional[str]:
+        with self.host_slot(src):
+            last_error: Optional[Exception] = None
+            # 连接错误与状态码由 urllib3 的 Retry 重试；读取响应体时断开则在这里整体重试
+            for _ in range(self.retries + 1):
+                try:
+                    return self._download(src)
+                except (urllib3.exceptions.ProtocolError,
+                        urllib3.exceptions.ReadTimeoutError) as exc:
+                    last_error = exc
+                except Exception as exc:  # noqa: BLE001
+                    last_error = exc
+                    break
+        message = f"下载失败 {src}: {last_error}"
+        with self._lock:
+            self.errors.append(message)
+        print(message)
+        return None
+
+    def _download(self, src: str) -> str:
+        headers = dict(DEFAULT_HEADERS)
+        entry = self.cache.lookup(src) if self.cache is not None else None
+        if entry is not None:
+            headers.update(HttpCache.conditional_headers(entry))
+        response = self.http.request("GET", src, headers=headers, preload_content=False)
+        try:
+            if response.status == 304 and entry is not None:
+                with self._lock:
+                    self.not_modified += 1
+                return self._place(src, self.cache.blob_path(entry["sha256"]), entry["sha256"],
+                                   entry.get("content_type"), move=False)
+            if not 200 <= response.status < 300:
+                raise IOError(f"HTTP 状态码 {response.status}")
+            part = os.path.join(self.save_path, f".{threading.get_ident()}.part")
+            try:
+                digest = hashlib.sha256()
+                with open(part, "wb") as f:
+                    for chunk in response.stream(CHUNK_SIZE):
+                        digest.update(chunk)
+                        f.write(chunk)
+                sha256 = digest.hexdigest()
+                if self.cache is not None:
+                    self.cache.store(src, part, sha256, response.headers)
+                return self._place(src, part, sha256, response.headers.get("Content-Type"), move=True)
+            finally:
+                if os.path.exists(part):
+                    os.remove(part)
+        finally:
+            release_response(response)
+
+    def join(self) -> List[str]:
+        """等待已提交的下载全部结束，返回成功保存的文件路径。"""
+        for future in list(self._futures):
+            future.result()
+        return list(self.files)
+
+    def close(self) -> List[str]:
+        """等待所有下载结束并关闭线程池。"""
+        files = self.join()
+        self._executor.shutdown(wait=True)
+        return files
+
+    def __enter__(self) -> "ImageFetcher":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+def create_pool_manager(per_host: int = DEFAULT_PER_HOST, retries: int = DEFAULT_RETRIES,
+                        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                        read_timeout: float = DEFAULT_READ_TIMEOUT) -> urllib3.PoolManager:
+    """
+    创建共享连接池：每个主机最多保留 per_host 个连接，带超时与指数退避重试。
+    """
+    return urllib3.PoolManager(
+        num_pools=64,
+        maxsize=max(1, int(per_host)),
+        timeout=Timeout(connect=connect_timeout, read=read_timeout),
+        retries=Retry(
+            total=max(0, int(retries)),
+            backoff_factor=0.5,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            raise_on_status=False,
+        ),
+    )
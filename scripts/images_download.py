@@ -1,77 +1,266 @@
-import urllib3
-import os
-from urllib.parse import urljoin, urlparse
-
-# 用来下载网页，返回网页内容
-def download_content(url):
-    http = urllib3.PoolManager()
-    response = http.request("GET", url)
-    return response.data
-
-# 将字符串内容保存到文件中
-def save_to_file(filename, content):
-    print(filename)
-    os.makedirs(os.path.dirname(filename), exist_ok=True)  # 确保文件夹存在
-    with open(filename, "wb") as fo:  # 使用二进制写入方式保存字节内容
-        fo.write(content)
-
-from bs4 import BeautifulSoup
-
-# 输入参数为要分析的 html 文件名，返回值为对应的 BeautifulSoup 对象
-def create_doc_from_filename(filename):
-    with open(filename, "r", encoding='utf-8') as fo:
-        html_content = fo.read()
-    doc = BeautifulSoup(html_content, "lxml")
-    return doc
-
-
-# 下载图片
-def download_images(url, images, save_path):
-    os.makedirs(save_path, exist_ok=True)  # 确保文件夹存在
-    for i in images:
-        src = i.get("src")  # 使用 get 方法更安全
-        if not src:
+import hashlib
+import re
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+from lxml import etree
+
+# 兼容直接以脚本运行与模块方式运行
+try:
+    from .image_fetcher import CHUNK_SIZE, DEFAULT_HEADERS, DEFAULT_PER_HOST, DEFAULT_WORKERS, HttpCache, ImageFetcher, release_response
+except ImportError:
+    from image_fetcher import CHUNK_SIZE, DEFAULT_HEADERS, DEFAULT_PER_HOST, DEFAULT_WORKERS, HttpCache, ImageFetcher, release_response  # type: ignore
+
+# 懒加载常用的图片地址属性（按优先级），srcset 类属性单独解析
+IMAGE_SRC_ATTRS = ("src", "data-src", "data-original", "data-lazy-src", "data-lazy")
+IMAGE_SRCSET_ATTRS = ("srcset", "data-srcset")
+# CSS 中的 url(...)；排除字体、样式表等非图片资源
+CSS_URL_PATTERN = re.compile(r"""url\(\s*(['"]?)(.*?)\1\s*\)""", re.IGNORECASE)
+NON_IMAGE_EXTENSIONS = (".woff", ".woff2", ".ttf", ".otf", ".eot", ".css", ".js")
+# 直接指向图片的链接（如缩略图链接到原图）按图片下载，不当作网页抓取
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp", ".svg", ".avif")
+
+# 多页抓取默认的深度、网页数上限与同时抓取的网页数
+DEFAULT_MAX_DEPTH = 1
+DEFAULT_MAX_PAGES = 50
+DEFAULT_PAGE_WORKERS = 4
+
+
+# 解析 srcset，返回尺寸最大的候选地址（按 w / x 描述符比较）
+def pick_srcset(srcset):
+    best, best_size = None, -1.0
+    for candidate in srcset.split(","):
+        parts = candidate.strip().split()
+        if not parts:
             continue
+        size = 1.0
+        if len(parts) > 1 and parts[1][-1:] in ("w", "x"):
+            try:
+                size = float(parts[1][:-1])
+            except ValueError:
+                pass
+        if size > best_size:
+            best, best_size = parts[0], size
+    return best
 
-        # 将相对URL转换为绝对URL
-        src = urljoin(url, src)
 
-        # 获取图片的文件名
-        parsed_url = urlparse(src)
-        file_name = os.path.basename(parsed_url.path)
+# 提取 CSS 文本（style 属性或 <style> 标签）中的背景图地址
+def css_image_urls(css):
+    for match in CSS_URL_PATTERN.finditer(css or ""):
+        src = match.group(2).strip()
+        if src and not src.lower().split("?")[0].endswith(NON_IMAGE_EXTENSIONS):
+            yield src
 
-        # 下载图片
-        try:
-            http = urllib3.PoolManager()
-            response = http.request("GET", src)
-            if 200 <= response.status < 300:
-                with open(os.path.join(save_path, file_name), "wb") as f:
-                    f.write(response.data)
-                print(f"已下载: {file_name}")
+
+# 提取单个元素引用的图片地址：src / 懒加载属性、srcset 中最大的候选、内联样式中的背景图
+def element_image_urls(element):
+    tag = element.tag if isinstance(element.tag, str) else ""
+    if tag == "img" or (tag == "input" and element.get("type", "").lower() == "image"):
+        src_attrs = IMAGE_SRC_ATTRS
+    elif tag in ("source", "input", "script", "iframe", "video", "audio", "embed"):
+        # 这些标签的 src 指向的不是图片
+        src_attrs = ()
+    else:
+        # 其它元素上的懒加载背景图，如 <div data-bg="...">
+        src_attrs = ("data-src", "data-bg", "data-background")
+    for attr in src_attrs:
+        value = (element.get(attr) or "").strip()
+        # 懒加载图片的 src 常是 data: 占位图，真实地址在 data-src 等属性中
+        if value and not value.startswith("data:"):
+            yield value
+            break
+    if tag in ("img", "source"):
+        for attr in IMAGE_SRCSET_ATTRS:
+            value = pick_srcset(element.get(attr) or "")
+            if value:
+                yield value
+    yield from css_image_urls(element.get("style"))
+
+
+# 以增量方式解析网页：边接收数据边解析，发现地址后立即产出 (类型, 绝对地址)，
+# 类型为 "image"（图片）或 "link"（<a> / <area> 链接）
+def iter_page_urls(chunks, page_url):
+    parser = etree.HTMLPullParser(events=("start", "end"))
+    base_url = page_url
+
+    def drain():
+        nonlocal base_url
+        for event, element in parser.read_events():
+            if event == "start":
+                if element.tag == "base" and element.get("href"):
+                    base_url = urljoin(page_url, element.get("href"))
+                elif element.tag in ("a", "area") and element.get("href"):
+                    yield "link", urljoin(base_url, element.get("href").strip())
+                for src in element_image_urls(element):
+                    yield "image", urljoin(base_url, src)
             else:
-                print(f"下载图片时出错，HTTP状态码: {response.status}")
-        except Exception as e:
-            print(f"下载图片时出错: {e}")
+                if element.tag == "style":
+                    for src in css_image_urls(element.text):
+                        yield "image", urljoin(base_url, src)
+                # 已处理完的元素及时清空，整页解析的内存占用保持平稳
+                element.clear(keep_tail=True)
+
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from drain()
+    parser.close()
+    yield from drain()
 
 
-def download_images_from_url(url, save_path, tmp_html_path="./tmp_for_download_images.html"):
-    result = download_content(url)
-    save_to_file(tmp_html_path, result)
-    doc = create_doc_from_filename(tmp_html_path)
-    images = doc.find_all("img")
-    download_images(url, images, save_path)
+# 只产出网页中的图片地址
+def iter_image_urls(chunks, page_url):
+    for kind, src in iter_page_urls(chunks, page_url):
+        if kind == "image":
+            yield src
+
+
+# 规范化 URL：协议与主机小写、去掉默认端口、用户信息与锚点、空路径补 / 并消除 . / .. 段，
+# 查询参数排序并去掉 utm_* 跟踪参数，使同一网页的不同写法只抓取一次
+def canonicalize_url(url):
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if ":" in host:
+        host = f"[{host}]"  # IPv6
     try:
-        os.remove(tmp_html_path)
-        print(f"文件 '{tmp_html_path}' 已删除。")
-    except FileNotFoundError:
-        print(f"文件 '{tmp_html_path}' 不存在，无法删除。")
-    except PermissionError:
-        print(f"没有权限删除文件 '{tmp_html_path}'。")
-    except Exception as e:
-        print(f"删除文件时出错: {e}")
+        port = parts.port
+    except ValueError:
+        port = None
+    if port is not None and (scheme, port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{port}"
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_")
+    ))
+    # 借助 urljoin 消除路径中的 . / .. 段
+    path = urlsplit(urljoin("http://host/", parts.path or "/")).path
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+# 判断链接是否属于起始网页的站点（同一主机或其子域名，忽略 www. 前缀）
+def is_same_site(url, root_host):
+    host = (urlsplit(url).hostname or "").lower()
+    root = root_host.lower()
+    root = root[4:] if root.startswith("www.") else root
+    return host == root or host.endswith("." + root)
+
+
+# 逐块读取响应：read1 有数据就返回，不会像 stream() 那样凑满整块才交给解析器
+def iter_response_chunks(response, chunk_size=CHUNK_SIZE):
+    while True:
+        chunk = response.read1(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+# 输出下载统计
+def print_summary(fetcher):
+    print(f"共保存 {len(fetcher.files)} 张图片")
+    if fetcher.not_modified:
+        print(f"{fetcher.not_modified} 张图片未变化，直接使用本地缓存")
+    if fetcher.duplicates:
+        print(f"{fetcher.duplicates} 张图片内容重复，已跳过")
+    if fetcher.errors:
+        print(f"共 {len(fetcher.errors)} 张图片下载失败")
+
+
+# 抓取单个网页：图片地址直接提交给下载器（与网页解析同时进行），返回页面中的链接
+def fetch_page(fetcher, page_url):
+    links = []
+    with fetcher.host_slot(page_url):
+        response = fetcher.http.request("GET", page_url, headers=DEFAULT_HEADERS, preload_content=False)
+        try:
+            if not 200 <= response.status < 300:
+                raise IOError(f"网页下载失败，HTTP状态码: {response.status}")
+            content_type = (response.headers.get("Content-Type") or "").lower()
+            if content_type and "html" not in content_type:
+                return links
+            # response.url 可能只是路径（重定向后为最终地址），需以请求地址为基准补全
+            final_url = urljoin(page_url, response.url or "")
+            for kind, src in iter_page_urls(iter_response_chunks(response), final_url):
+                if kind == "image" or urlsplit(src).path.lower().endswith(IMAGE_EXTENSIONS):
+                    fetcher.submit(src)
+                else:
+                    links.append(src)
+        finally:
+            release_response(response)
+    return links
+
+
+# 下载网页中的所有图片：网页直接从响应流解析（不落盘），每发现一张图片就提交下载，
+# 图片下载与网页剩余部分的接收、解析同时进行；指定 cache_dir 时重复抓取只发送条件请求
+def download_images_from_url(url, save_path, workers=DEFAULT_WORKERS, per_host=DEFAULT_PER_HOST,
+                             cache_dir=None):
+    cache = HttpCache(cache_dir) if cache_dir else None
+    with ImageFetcher(save_path, workers=workers, per_host=per_host, cache=cache) as fetcher:
+        fetch_page(fetcher, url)
+    print_summary(fetcher)
+    return fetcher.files
+
+
+# 多页抓取：从起始网页出发按广度优先跟随同站链接，深度不超过 max_depth、网页数不超过 max_pages。
+# 待抓取队列与已访问集合（存 8 字节 URL 摘要）的大小都受 max_pages 限制，内存占用有上界；
+# 网页在小线程池中并发抓取，所有网页发现的图片共用同一个下载器，边抓取边写入 save_path
+def crawl_images_from_url(url, save_path, max_depth=DEFAULT_MAX_DEPTH, max_pages=DEFAULT_MAX_PAGES,
+                          workers=DEFAULT_WORKERS, per_host=DEFAULT_PER_HOST,
+                          page_workers=DEFAULT_PAGE_WORKERS, cache_dir=None, progress_callback=None):
+    """
+    @param progress_callback: 可选回调 callback(已抓取网页数, 已发现网页数, 已保存图片数)
+    @return: {"pages": 成功抓取的网页数, "files": 图片路径列表, "errors": 错误信息列表}
+    """
+    start = canonicalize_url(url)
+    if urlsplit(start).scheme not in ("http", "https"):
+        raise ValueError(f"仅支持 http(s) 网址: {url}")
+    root_host = urlsplit(start).hostname or ""
+    max_pages = max(1, int(max_pages))
+    page_workers = max(1, int(page_workers))
+
+    def digest(page_url):
+        return hashlib.blake2b(page_url.encode("utf-8"), digest_size=8).digest()
+
+    visited = {digest(start)}
+    frontier = deque([(start, 0)])
+    page_errors = []
+    pages_done = 0
+    cache = HttpCache(cache_dir) if cache_dir else None
+    with ImageFetcher(save_path, workers=workers, per_host=per_host, cache=cache) as fetcher, \
+            ThreadPoolExecutor(max_workers=page_workers, thread_name_prefix="page-fetch") as pages:
+        running = {}
+        while frontier or running:
+            while frontier and len(running) < page_workers:
+                page_url, depth = frontier.popleft()
+                running[pages.submit(fetch_page, fetcher, page_url)] = (page_url, depth)
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                page_url, depth = running.pop(future)
+                try:
+                    links = future.result()
+                except Exception as exc:  # noqa: BLE001
+                    page_errors.append(f"网页抓取失败 {page_url}: {exc}")
+                    continue
+                pages_done += 1
+                if depth >= max_depth:
+                    continue
+                for link in links:
+                    if len(visited) >= max_pages:
+                        break
+                    link = canonicalize_url(link)
+                    if urlsplit(link).scheme not in ("http", "https") or not is_same_site(link, root_host):
+                        continue
+                    key = digest(link)
+                    if key not in visited:
+                        visited.add(key)
+                        frontier.append((link, depth + 1))
+            if progress_callback is not None:
+                progress_callback(pages_done, len(visited), len(fetcher.files))
+    print(f"共抓取 {pages_done} 个网页")
+    print_summary(fetcher)
+    return {"pages": pages_done, "files": fetcher.files, "errors": page_errors + fetcher.errors}
 
 
 if __name__ == "__main__":
     url = input("请输入网址:")
     save_path = input("请输入保存路径:")
-    download_images_from_url(url, save_path)
\ No newline at end of file
+    download_images_from_url(url, save_path)
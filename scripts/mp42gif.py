@@ -1,8 +1,284 @@
-from moviepy import VideoFileClip
 import os
+import shutil
+import subprocess
+import tempfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import numpy as np
 from PIL import Image
 
-def mp4_to_gif(input_path, output_path, start_time, end_time, fps=None, color_depth=256, scale=1.0, dither=True):
+# 兼容直接以脚本运行与模块方式运行
+try:
+    from .gif_palette import build_global_palette
+    from .gif_stream import StreamingGifWriter, changed_bbox
+except ImportError:
+    from gif_palette import build_global_palette  # type: ignore
+    from gif_stream import StreamingGifWriter, changed_bbox  # type: ignore
+
+try:
+    from moviepy import VideoFileClip
+except ImportError:  # moviepy 仅 PIL 引擎需要；ffmpeg 引擎不依赖它
+    VideoFileClip = None
+
+GIF_ENGINES = ("auto", "ffmpeg", "pil")
+# 动画输出格式：GIF 兼容性最好；WebP / MP4 体积与编码耗时都小得多
+ANIMATION_FORMATS = ("gif", "webp", "mp4")
+# PIL 引擎的调色板模式：adaptive 逐帧自适应；global 全部帧共用一个调色板，后续帧只写变化像素
+GIF_PALETTES = ("adaptive", "global")
+# 生成全局调色板时均匀抽取的帧数
+GLOBAL_PALETTE_SAMPLES = 12
+# 目标体积模式：试编码片段时长、完整编码次数上限、降级时的帧率档位与最少颜色数
+TARGET_TRIAL_SECONDS = 3.0
+TARGET_MAX_FULL_ENCODES = 3
+# 完整编码体积达到上限的该比例后即停止，不再尝试更高画质
+TARGET_FILL_RATIO = 0.8
+TARGET_FPS_STEPS = (24, 20, 15, 12, 10, 8, 6, 5)
+TARGET_MIN_COLORS = 32
+# ffmpeg paletteuse 支持的抖动算法
+FFMPEG_DITHERS = ("sierra2_4a", "floyd_steinberg", "sierra2", "bayer", "heckbert", "none")
+
+
+def ffmpeg_available():
+    """检查系统 PATH 中是否存在 ffmpeg。"""
+    return shutil.which("ffmpeg") is not None
+
+
+def resolve_gif_engine(engine="auto"):
+    """
+    解析 GIF 编码引擎：auto 时优先使用 ffmpeg，不可用时回退到 PIL。
+
+    @param engine: auto / ffmpeg / pil
+    @return: 实际使用的引擎名称（ffmpeg 或 pil）
+    """
+    engine = (engine or "auto").strip().lower()
+    if engine not in GIF_ENGINES:
+        raise ValueError(f"不支持的 GIF 引擎: {engine}，可选: {', '.join(GIF_ENGINES)}")
+    if engine == "auto":
+        engine = "ffmpeg" if ffmpeg_available() else "pil"
+    if engine == "ffmpeg" and not ffmpeg_available():
+        raise RuntimeError("未找到 ffmpeg，请安装后重试或改用 pil 引擎")
+    if engine == "pil" and VideoFileClip is None:
+        raise RuntimeError("未安装 moviepy，无法使用 pil 引擎")
+    return engine
+
+
+def build_gif_filter_graph(fps=None, color_depth=256, scale=1.0, dither="sierra2_4a", crop=None):
+    """
+    构建单次执行的 ffmpeg 滤镜图：crop -> fps -> scale -> split -> palettegen / paletteuse。
+
+    @param fps: 输出帧率，为空时沿用源视频帧率
+    @param color_depth: 调色板颜色数（2～256）
+    @param scale: 缩放比例（0.1～1.0）
+    @param dither: paletteuse 抖动算法，见 FFMPEG_DITHERS
+    @param crop: 可选裁剪区域 (x, y, w, h)
+    @return: -filter_complex 参数字符串
+    """
+    dither = (dither or "sierra2_4a").strip().lower()
+    if dither not in FFMPEG_DITHERS:
+        raise ValueError(f"不支持的抖动算法: {dither}，可选: {', '.join(FFMPEG_DITHERS)}")
+    colors = max(2, min(256, int(color_depth) if color_depth is not None else 256))
+    s = max(0.1, min(1.0, float(scale) if scale is not None else 1.0))
+
+    filters = []
+    if crop:
+        x, y, w, h = crop
+        filters.append(f"crop={int(w)}:{int(h)}:{int(x)}:{int(y)}")
+    if fps:
+        filters.append(f"fps={float(fps):g}")
+    if s != 1.0:
+        filters.append(f"scale=trunc(iw*{s:g}):-1:flags=lanczos")
+    chain = ",".join(filters + ["split[a][b]"])
+    # stats_mode=diff 让调色板偏向变化区域，diff_mode=rectangle 只重新抖动变化矩形，体积更小
+    return (
+        f"[0:v]{chain};"
+        f"[a]palettegen=max_colors={colors}:stats_mode=diff[p];"
+        f"[b][p]paletteuse=dither={dither}:diff_mode=rectangle"
+    )
+
+
+def _run_ffmpeg(cmd, action):
+    """执行 ffmpeg 命令，失败时以 stderr 最后一行作为错误信息。"""
+    proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if proc.returncode != 0:
+        message = proc.stderr.decode("utf-8", errors="replace").strip().splitlines()
+        raise RuntimeError(f"ffmpeg {action}失败: {message[-1] if message else proc.returncode}")
+
+
+def _trim_args(start_time, end_time):
+    """输入端截取参数（-ss / -t），放在 -i 之前以快速定位。"""
+    start = max(0.0, float(start_time or 0.0))
+    args = ["-ss", f"{start:.3f}"] if start > 0 else []
+    if end_time is not None:
+        if float(end_time) <= start:
+            raise ValueError("结束时间必须大于开始时间")
+        args += ["-t", f"{float(end_time) - start:.3f}"]
+    return args
+
+
+def mp4_to_gif_ffmpeg(input_path, output_path, start_time=0.0, end_time=None, fps=None,
+                      color_depth=256, scale=1.0, dither="sierra2_4a", crop=None):
+    """
+    使用单个 ffmpeg 滤镜图生成 GIF：输入端按时间截取，一次解码完成裁剪、缩放、
+    调色板生成与映射，ffmpeg 内部多线程执行，比逐帧 PIL 量化快一到两个数量级。
+
+    @param input_path: 输入视频路径
+    @param output_path: 输出 GIF 路径
+    @param start_time: 开始时间（秒）
+    @param end_time: 结束时间（秒），为空表示到视频末尾
+    @param fps: 输出帧率，为空时沿用源视频帧率
+    @param color_depth: 调色板颜色数（2～256）
+    @param scale: 缩放比例（0.1～1.0）
+    @param dither: paletteuse 抖动算法，见 FFMPEG_DITHERS
+    @param crop: 可选裁剪区域 (x, y, w, h)，直接并入滤镜图，无需先生成裁剪视频
+    """
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"输入文件 {input_path} 不存在")
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error", "-threads", "0"]
+    cmd += _trim_args(start_time, end_time)
+    cmd += [
+        "-i", str(input_path),
+        "-filter_complex", build_gif_filter_graph(fps, color_depth, scale, dither, crop),
+        "-an",
+        "-loop", "0",
+        str(output_path),
+    ]
+    _run_ffmpeg(cmd, "生成 GIF")
+    if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+        raise ValueError("未采样到任何帧，请检查起止时间设置")
+    print(f"GIF 已成功保存到 {output_path}")
+
+def _animation_filters(fps=None, scale=1.0, crop=None, even=False):
+    """WebP / MP4 输出共用的滤镜链：裁剪、帧率、缩放；even=True 时宽高对齐到偶数（yuv420p 要求）。"""
+    s = max(0.1, min(1.0, float(scale) if scale is not None else 1.0))
+    filters = []
+    if crop:
+        x, y, w, h = crop
+        filters.append(f"crop={int(w)}:{int(h)}:{int(x)}:{int(y)}")
+    if fps:
+        filters.append(f"fps={float(fps):g}")
+    if even:
+        filters.append(f"scale=trunc(iw*{s:g}/2)*2:trunc(ih*{s:g}/2)*2:flags=lanczos")
+    elif s != 1.0:
+        filters.append(f"scale=trunc(iw*{s:g}):-1:flags=lanczos")
+    return filters
+
+
+def _encode_animation(input_path, output_path, start_time, end_time, filters, codec_args, action):
+    if not os.path.exists(input_path):
+        raise FileNotFoundError(f"输入文件 {input_path} 不存在")
+    if not ffmpeg_available():
+        raise RuntimeError("未找到 ffmpeg，无法生成 WebP / MP4 动画")
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error", "-threads", "0"]
+    cmd += _trim_args(start_time, end_time)
+    cmd += ["-i", str(input_path), "-an"]
+    if filters:
+        cmd += ["-vf", ",".join(filters)]
+    cmd += codec_args + [str(output_path)]
+    _run_ffmpeg(cmd, action)
+    if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+        raise ValueError("未采样到任何帧，请检查起止时间设置")
+    print(f"{action}完成: {output_path}")
+
+
+def mp4_to_webp(input_path, output_path, start_time=0.0, end_time=None, fps=None, scale=1.0,
+                quality=75, crop=None):
+    """
+    生成无限循环的动态 WebP：有损编码，通常只有同等 GIF 的几分之一，编码也快得多。
+
+    @param quality: 编码质量 0～100
+    其余参数同 mp4_to_gif_ffmpeg
+    """
+    quality = max(0, min(100, int(quality if quality is not None else 75)))
+    _encode_animation(
+        input_path, output_path, start_time, end_time,
+        _animation_filters(fps, scale, crop),
+        ["-c:v", "libwebp_anim", "-lossless", "0", "-quality", str(quality),
+         "-compression_level", "4", "-loop", "0"],
+        "生成 WebP 动画",
+    )
+
+
+def mp4_to_loop_mp4(input_path, output_path, start_time=0.0, end_time=None, fps=None, scale=1.0,
+                    crf=23, crop=None):
+    """
+    生成用于循环播放的无声 H.264 MP4（yuv420p + faststart，可边下边播），
+    由页面以 <video autoplay loop muted playsinline> 播放，体积通常比 GIF 小一个数量级。
+
+    @param crf: x264 质量参数，越小画质越高
+    其余参数同 mp4_to_gif_ffmpeg
+    """
+    _encode_animation(
+        input_path, output_path, start_time, end_time,
+        _animation_filters(fps, scale, crop, even=True),
+        ["-c:v", "libx264", "-pix_fmt", "yuv420p", "-preset", "veryfast", "-crf", str(int(crf)),
+         "-movflags", "+faststart"],
+        "生成循环 MP4",
+    )
+
+
+def _quantize_frame(region, colors, dither_flag):
+    """
+    把 RGB 图像量化为自适应调色板的 P 模式图像（可在子进程中执行）。
+
+    @param region: RGB 图像（通常只是与上一帧相比发生变化的矩形区域）
+    @param colors: 调色板颜色数
+    @param dither_flag: Image.FLOYDSTEINBERG 或 Image.NONE
+    """
+    # convert("P", palette=ADAPTIVE) 等价于量化；部分版本对 dithering 更稳定
+    return region.convert("P", palette=Image.ADAPTIVE, colors=colors, dither=dither_flag)
+
+
+def _map_to_palette(region, palette_image, dither_flag, n_colors):
+    """
+    把 RGB 图像映射到全局调色板，返回下标数组（可在子进程中执行）。
+
+    @param region: RGB 图像
+    @param palette_image: 携带全局调色板的 P 模式图像，n_colors 之后的位置填充为第 0 个颜色
+    @param dither_flag: Image.FLOYDSTEINBERG 或 Image.NONE
+    @param n_colors: 全局调色板的实际颜色数
+    """
+    indices = np.array(region.quantize(palette=palette_image, dither=dither_flag), dtype=np.uint8)
+    # 填充位与第 0 个颜色相同，归并回 0，保证透明下标不会被实际像素占用
+    indices[indices >= n_colors] = 0
+    return indices
+
+
+def _indexed_image(indices, palette_flat):
+    """由下标数组与调色板构造 P 模式图像。"""
+    image = Image.fromarray(indices, mode="P")
+    image.putpalette(palette_flat)
+    return image
+
+
+def _sample_frames(clip, start_time, end_time, count, size_of):
+    """在 [start_time, end_time) 内均匀抽取 count 帧（按输出尺寸缩放），用于生成全局调色板。"""
+    times = np.linspace(start_time, end_time, num=count, endpoint=False)
+    return [np.asarray(size_of(Image.fromarray(clip.get_frame(float(t))))) for t in times]
+
+
+def mp4_to_gif(input_path, output_path, start_time, end_time, fps=None, color_depth=256, scale=1.0, dither=True,
+               workers=None, executor=None, palette="adaptive"):
+    """
+    PIL 引擎：顺序解码视频，逐帧量化后流式写入 GIF。
+
+    @param workers: 量化进程数，默认 CPU 核数；为 1 时在当前进程内量化
+    @param executor: 可选的外部进程池（如后端共享进程池），提供时忽略 workers
+    @param palette: adaptive 逐帧自适应调色板；global 由抽样帧生成一个全局调色板（中位切分 + k-means），
+                    后续帧只写入变化的矩形，矩形内未变化的像素设为透明，文件通常小数倍
+    """
+    palette = (palette or "adaptive").strip().lower()
+    if palette not in GIF_PALETTES:
+        raise ValueError(f"不支持的调色板模式: {palette}，可选: {', '.join(GIF_PALETTES)}")
+    if VideoFileClip is None:
+        raise RuntimeError("未安装 moviepy，无法使用 pil 引擎")
     # 检查输入文件是否存在
     if not os.path.exists(input_path):
         raise FileNotFoundError(f"输入文件 {input_path} 不存在")
@@ -11,7 +287,36 @@ def mp4_to_gif(input_path, output_path, start_time, end_time, fps=None, color_de
     output_dir = os.path.dirname(output_path)
     if output_dir and not os.path.exists(output_dir):
         os.makedirs(output_dir)
-    
+
+    # 与帧无关的参数只解析一次
+    try:
+        s = float(scale) if scale is not None else 1.0
+    except Exception:
+        s = 1.0
+    s = max(0.1, min(1.0, s))
+    resample = getattr(Image, "Resampling", Image).LANCZOS
+    colors = int(color_depth) if color_depth is not None else 256
+    colors = max(2, min(256, colors))
+    dither_flag = Image.FLOYDSTEINBERG if dither else Image.NONE
+
+    def resize(img):
+        if s == 1.0:
+            return img
+        new_w = max(1, int(img.width * s))
+        new_h = max(1, int(img.height * s))
+        return img.resize((new_w, new_h), resample=resample)
+
+    own_executor = None
+    if executor is None and (workers is None or int(workers) > 1):
+        workers = int(workers) if workers else (os.cpu_count() or 1)
+        own_executor = executor = ProcessPoolExecutor(max_workers=workers)
+        # 先启动工作进程再打开视频：fork 出的子进程若继承 moviepy 的 ffmpeg 管道，关闭剪辑时会卡住
+        own_executor.submit(os.getpid).result()
+    # 在途帧上限：量化结果按提交顺序写入，排队帧数超过上限时等待最早的帧，内存有硬上限
+    max_pending = 2 * (int(workers) if workers else (os.cpu_count() or 1))
+    pending = deque()
+
+    clip = None
     try:
         # 使用 MoviePy 加载视频
         clip = VideoFileClip(input_path)
@@ -24,11 +329,9 @@ def mp4_to_gif(input_path, output_path, start_time, end_time, fps=None, color_de
             print("开始时间不能大于结束时间，将使用整个视频")
             start_time = 0
             end_time = clip.duration
-            
-        # 将剪辑后的视频转换为 GIF
-        # 使用 PIL 写入 GIF，可以更好地控制颜色和优化
-        frames = []
-        
+        if end_time <= start_time:
+            raise ValueError("未采样到任何帧，请检查起止时间设置")
+
         # 自动使用源视频帧率（若未显式指定）
         fps_value = None
         try:
@@ -37,57 +340,276 @@ def mp4_to_gif(input_path, output_path, start_time, end_time, fps=None, color_de
                 fps_value = 10.0
         except Exception:
             fps_value = 10.0
+        frame_ms = 1000.0 / fps_value
 
-        # 直接使用 get_frame 采样，无需创建子剪辑
-        for t in range(int(start_time * fps_value), int(end_time * fps_value)):
-            frame_time = t / fps_value
-            if frame_time >= clip.duration:
-                break
-            frame = clip.get_frame(frame_time)
-            # 将每一帧转换为 PIL 图像
-            img = Image.fromarray(frame)
-            # 按比例缩放（如需要）
-            try:
-                s = float(scale) if scale is not None else 1.0
-            except Exception:
-                s = 1.0
-            s = max(0.1, min(1.0, s))
-            if s != 1.0:
-                new_w = max(1, int(img.width * s))
-                new_h = max(1, int(img.height * s))
-                resample = getattr(Image, "Resampling", Image).__dict__.get("LANCZOS", Image.LANCZOS)
-                img = img.resize((new_w, new_h), resample=resample)
-
-            # 自适应调色板 + Floyd–Steinberg 抖动，尽量接近原视频色彩与过渡
-            # GIF 仅支持 256 色，通过逐帧量化可以比全局量化显著减少色带
-            colors = int(color_depth) if color_depth is not None else 256
-            colors = max(2, min(256, colors))
-            dither_flag = Image.FLOYDSTEINBERG if dither else Image.NONE
-            # convert("P", palette=ADAPTIVE) 等价于量化；部分版本对 dithering 更稳定
-            img_q = img.convert("P", palette=Image.ADAPTIVE, colors=colors, dither=dither_flag)
-            frames.append(img_q)
-        
-        # 保存为 GIF
-        if not frames:
+        if palette == "global":
+            # 预留一个下标作为透明色
+            global_palette = build_global_palette(
+                _sample_frames(clip, start_time, end_time, GLOBAL_PALETTE_SAMPLES, resize), colors - 1
+            )
+            n_colors = len(global_palette)
+            transparent = n_colors
+            palette_flat = global_palette.flatten().tolist() + [0, 0, 0]
+            palette_image = Image.new("P", (1, 1))
+            palette_image.putpalette(global_palette.flatten().tolist() + global_palette[0].tolist() * (256 - n_colors))
+        canvas = None
+
+        # 流式写入：每帧量化后立即写入文件，只保留上一帧用于计算变化区域，
+        # 内存占用与 GIF 帧数无关
+        previous = None
+        with StreamingGifWriter(output_path, loop=0) as writer:
+
+            def write_delta(indices, bbox, duration):
+                # 全局调色板：与画布（已显示内容的下标）比较，只写变化像素所在的矩形，其余设为透明
+                nonlocal canvas
+                if canvas is None:
+                    canvas = indices
+                    writer.add(_indexed_image(indices, palette_flat), (0, 0), duration=duration,
+                               include_color_table=False)
+                    return
+                x0, y0, x1, y1 = bbox
+                region = canvas[y0:y1, x0:x1]
+                changed = indices != region
+                rows = np.flatnonzero(changed.any(axis=1))
+                if rows.size == 0:
+                    writer.extend(duration)
+                    return
+                cols = np.flatnonzero(changed.any(axis=0))
+                r0, r1, c0, c1 = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+                mask = changed[r0:r1, c0:c1]
+                patch = np.where(mask, indices[r0:r1, c0:c1], transparent).astype(np.uint8)
+                region[changed] = indices[changed]
+                writer.add(_indexed_image(patch, palette_flat), (int(x0 + c0), int(y0 + r0)),
+                           duration=duration, transparency=transparent, include_color_table=False)
+
+            def drain(limit):
+                while len(pending) > limit:
+                    quantized, bbox, duration = pending.popleft()
+                    if quantized is None:
+                        writer.extend(duration)
+                        continue
+                    if isinstance(quantized, Future):
+                        quantized = quantized.result()
+                    if palette == "global":
+                        write_delta(quantized, bbox, duration)
+                    else:
+                        writer.add(quantized, bbox[:2], duration=duration)
+
+            # 顺序解码子剪辑，避免逐帧 get_frame 带来的随机 seek
+            frames = clip.subclipped(start_time, end_time).iter_frames(fps=fps_value, dtype="uint8")
+            for frame in frames:
+                # 将每一帧转换为 PIL 图像，按比例缩放（如需要）
+                img = resize(Image.fromarray(frame))
+
+                # 与上一帧完全相同：只延长上一帧的显示时长
+                bbox = changed_bbox(previous, img)
+                previous = img
+                if bbox is None:
+                    pending.append((None, None, frame_ms))
+                    drain(max_pending)
+                    continue
+
+                # 自适应调色板 + Floyd–Steinberg 抖动，尽量接近原视频色彩与过渡
+                # GIF 仅支持 256 色，通过逐帧量化可以比全局量化显著减少色带；
+                # 只量化并写入变化的矩形区域，其余部分沿用上一帧画面
+                region = img.crop(bbox)
+                if palette == "global":
+                    task, args = _map_to_palette, (region, palette_image, dither_flag, n_colors)
+                else:
+                    task, args = _quantize_frame, (region, colors, dither_flag)
+                quantized = task(*args) if executor is None else executor.submit(task, *args)
+                pending.append((quantized, bbox, frame_ms))
+                drain(max_pending)
+            drain(0)
+
+        if writer.frames == 0:
+            os.remove(output_path)
             raise ValueError("未采样到任何帧，请检查起止时间设置")
 
-        frames[0].save(
-            output_path,
-            save_all=True,
-            append_images=frames[1:],
-            duration=int(1000 / fps_value),  # 每帧显示时间(毫秒)
-            loop=0,  # 无限循环
-            optimize=True,
-            disposal=2,  # 每帧独立绘制，减少拖影
-        )
-        
         print(f"GIF 已成功保存到 {output_path}")
         
     except Exception as e:
+        for quantized, _, _ in pending:
+            if isinstance(quantized, Future):
+                quantized.cancel()
         print(f"转换过程中出错: {e}")
         raise
+    finally:
+        if clip is not None:
+            clip.close()
+        if own_executor is not None:
+            own_executor.shutdown(wait=True, cancel_futures=True)
+
+def _probe_video(input_path):
+    """读取视频帧率与时长（秒）。"""
+    import cv2
+
+    cap = cv2.VideoCapture(str(input_path))
+    try:
+        fps = float(cap.get(cv2.CAP_PROP_FPS) or 0.0)
+        frames = float(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0.0)
+    finally:
+        cap.release()
+    if fps <= 0 or frames <= 0:
+        raise ValueError("无法读取视频的帧率或时长")
+    return fps, frames / fps
+
+
+def build_quality_ladder(scale=1.0, fps=25.0, colors=256):
+    """
+    从用户参数出发逐级降低画质，生成 (scale, fps, colors) 序列。
+    每一级只降低一个参数、其余保持不变，因此输出体积沿序列单调递减，可直接二分查找。
+    降级顺序以缩放为主（对体积影响最大、观感损失最小），其次帧率，最后颜色数。
+    """
+    scale = max(0.1, min(1.0, float(scale)))
+    colors = max(2, min(256, int(colors)))
+    ladder = [(scale, float(fps), colors)]
+    fps_steps = [f for f in TARGET_FPS_STEPS if f < fps]
+    while True:
+        progressed = False
+        for knob in ("scale", "fps", "scale", "colors"):
+            s_, f_, c_ = ladder[-1]
+            if knob == "scale" and s_ > 0.1:
+                s_ = max(0.1, round(s_ * 0.85, 3))
+            elif knob == "fps" and fps_steps:
+                f_ = fps_steps.pop(0)
+            elif knob == "colors" and c_ > TARGET_MIN_COLORS:
+                c_ = max(TARGET_MIN_COLORS, c_ // 2)
+            else:
+                continue
+            ladder.append((s_, f_, c_))
+            progressed = True
+        if not progressed:
+            return ladder
+
+
+def mp4_to_gif_target_size(input_path, output_path, max_bytes, start_time=0.0, end_time=None, fps=None,
+                           color_depth=256, scale=1.0, engine="auto", dither="sierra2_4a", crop=None,
+                           palette="adaptive", executor=None, work_dir=None):
+    """
+    目标体积模式：在不超过 max_bytes 的前提下选择画质最高的 (scale, fps, colors)。
+
+    先把中间一段（至多 TARGET_TRIAL_SECONDS 秒，已裁剪、已截取）解码一次并存为无损中间文件，
+    之后每次试编码都只读取这段小文件；按时长比例由试编码体积估算完整输出体积，
+    在 build_quality_ladder 生成的参数序列上二分查找。完整编码若仍超出，
+    用实际/估算比例修正估算后继续查找，完整编码最多 TARGET_MAX_FULL_ENCODES 次。
+
+    @param max_bytes: 输出体积上限（字节）
+    @param crop: 可选裁剪区域 (x, y, w, h)；pil 引擎请传入已裁剪的视频
+    @param work_dir: 中间文件目录，默认与输出文件相同
+    @return: 包含 scale、fps、colors、bytes、fits、trials、encodes 的字典
+    """
+    max_bytes = int(max_bytes)
+    if max_bytes <= 0:
+        raise ValueError("max_bytes 必须为正整数")
+    engine = resolve_gif_engine(engine)
+    source_fps, duration = _probe_video(input_path)
+    start = max(0.0, float(start_time or 0.0))
+    end = min(duration, float(end_time)) if end_time is not None else duration
+    if end <= start:
+        raise ValueError("结束时间必须大于开始时间")
+    base_fps = min(float(fps), source_fps) if fps else source_fps
+    base_scale = max(0.1, min(1.0, float(scale) if scale is not None else 1.0))
+    ladder = build_quality_ladder(base_scale, base_fps, color_depth if color_depth is not None else 256)
 
-def main(start_time, end_time, fps, color_depth):
+    def encode(src, dst, seg_start, seg_end, level, rel_scale, seg_crop):
+        level_scale, level_fps, level_colors = level
+        if engine == "ffmpeg":
+            mp4_to_gif_ffmpeg(src, dst, seg_start, seg_end, fps=level_fps, color_depth=level_colors,
+                              scale=rel_scale, dither=dither, crop=seg_crop)
+        else:
+            mp4_to_gif(src, dst, seg_start, seg_end, fps=level_fps, color_depth=level_colors,
+                       scale=rel_scale, executor=executor, palette=palette)
+        return os.path.getsize(dst)
+
+    work = tempfile.mkdtemp(prefix=".gif-fit-", dir=work_dir or os.path.dirname(os.path.abspath(output_path)))
+    try:
+        # 试编码片段：取区间中部，裁剪、截取、缩放到基准尺寸后无损保存，所有试编码复用这份解码结果
+        trial_len = min(end - start, TARGET_TRIAL_SECONDS)
+        trial_start = start + (end - start - trial_len) / 2.0
+        trial_src, trial_crop, trial_scale = input_path, crop, 1.0
+        if ffmpeg_available():
+            trial_src = os.path.join(work, "trial.mkv")
+            filters = []
+            if crop:
+                x, y, w, h = crop
+                filters.append(f"crop={int(w)}:{int(h)}:{int(x)}:{int(y)}")
+            if base_scale != 1.0:
+                filters.append(f"scale=trunc(iw*{base_scale:g}):-1:flags=lanczos")
+            cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error", "-threads", "0",
+                   "-ss", f"{trial_start:.3f}", "-t", f"{trial_len:.3f}", "-i", str(input_path), "-an"]
+            if filters:
+                cmd += ["-vf", ",".join(filters)]
+            cmd += ["-c:v", "ffv1", trial_src]
+            _run_ffmpeg(cmd, "生成试编码片段")
+            trial_crop, trial_start, trial_scale = None, 0.0, base_scale
+        ratio = (end - start) / trial_len
+
+        trials = {}
+
+        def estimate(i):
+            if i not in trials:
+                level = ladder[i]
+                dst = os.path.join(work, f"trial_{i}.gif")
+                trials[i] = encode(trial_src, dst, trial_start, trial_start + trial_len, level,
+                                   level[0] / trial_scale, trial_crop) * ratio
+                os.remove(dst)
+            return trials[i]
+
+        def search(lo, hi, correction):
+            # 二分查找 [lo, hi] 中第一个（画质最高的）估算体积不超过上限的级别；都超出时返回 hi
+            if estimate(lo) * correction <= max_bytes:
+                return lo
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if estimate(mid) * correction <= max_bytes:
+                    hi = mid
+                else:
+                    lo = mid + 1
+            return lo
+
+        correction = 1.0
+        lo, best, last = 0, None, None  # lo 之前的级别已确认超出；best / last 为 (级别, 体积, 文件)
+        encodes = 0
+        while encodes < TARGET_MAX_FULL_ENCODES:
+            hi = best[0] - 1 if best else len(ladder) - 1
+            if lo > hi:
+                break
+            chosen = search(lo, hi, correction)
+            dst = os.path.join(work, f"full_{chosen}.gif")
+            actual = encode(input_path, dst, start, end, ladder[chosen], ladder[chosen][0], crop)
+            encodes += 1
+            # 用实际 / 估算的比例修正后续估算（首帧等固定开销会让按时长外推的估算偏大或偏小）
+            correction = actual / estimate(chosen)
+            if actual <= max_bytes:
+                best = (chosen, actual, dst)
+                if actual >= max_bytes * TARGET_FILL_RATIO:
+                    break  # 已足够接近上限，不再为更高画质多做完整编码
+            else:
+                last = (chosen, actual, dst)
+                lo = chosen + 1
+        chosen, actual, final = best or last
+        os.replace(final, output_path)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    level_scale, level_fps, level_colors = ladder[chosen]
+    fits = actual <= max_bytes
+    print(f"目标体积 {max_bytes} 字节：scale={level_scale:g} fps={level_fps:g} colors={level_colors}，"
+          f"实际 {actual} 字节（试编码 {len(trials)} 次，完整编码 {encodes} 次）")
+    return {
+        "scale": level_scale,
+        "fps": level_fps,
+        "colors": level_colors,
+        "bytes": actual,
+        "fits": fits,
+        "trials": len(trials),
+        "encodes": encodes,
+    }
+
+
+def main(start_time, end_time, fps, color_depth, engine="auto", dither="sierra2_4a", palette="adaptive",
+         max_bytes=None):
     # 将 Tkinter 相关依赖延迟导入，避免在无图形环境下导入失败
     import tkinter as tk  # type: ignore
     from tkinter import filedialog, messagebox  # type: ignore
@@ -120,8 +642,10 @@ def main(start_time, end_time, fps, color_depth):
     # 显示转换信息
     messagebox.showinfo("开始转换", f"将从 {input_path} 转换到 {output_path}")
     
-    # 若未提供 end_time，则以视频总时长为结束时间
-    if end_time is None:
+    engine = resolve_gif_engine(engine)
+
+    # 若未提供 end_time，则以视频总时长为结束时间（ffmpeg 引擎可直接处理到末尾）
+    if end_time is None and engine == "pil":
         try:
             clip = VideoFileClip(input_path)
             end_time = clip.duration
@@ -131,7 +655,13 @@ def main(start_time, end_time, fps, color_depth):
 
     # 执行转换
     try:
-        mp4_to_gif(input_path, output_path, start_time, end_time, fps, color_depth)
+        if max_bytes:
+            mp4_to_gif_target_size(input_path, output_path, max_bytes, start_time, end_time, fps, color_depth,
+                                   engine=engine, dither=dither, palette=palette)
+        elif engine == "ffmpeg":
+            mp4_to_gif_ffmpeg(input_path, output_path, start_time, end_time, fps, color_depth, dither=dither)
+        else:
+            mp4_to_gif(input_path, output_path, start_time, end_time, fps, color_depth, palette=palette)
         messagebox.showinfo("转换成功", f"GIF 已成功保存到 {output_path}")
     except Exception as e:
         messagebox.showerror("转换失败", f"转换过程中出错: {str(e)}")
@@ -146,9 +676,13 @@ if __name__ == "__main__":
     parser.add_argument('--end', type=float, default=None, help='结束时间(秒)')
     parser.add_argument('--fps', type=int, default=10, help='输出 GIF 的帧率')
     parser.add_argument('--color_depth', type=int, default=256, help='输出 GIF 的颜色深度')
+    parser.add_argument('--engine', default='auto', choices=GIF_ENGINES, help='编码引擎：auto 优先使用 ffmpeg')
+    parser.add_argument('--dither', default='sierra2_4a', choices=FFMPEG_DITHERS, help='ffmpeg 引擎的抖动算法')
+    parser.add_argument('--palette', default='adaptive', choices=GIF_PALETTES, help='pil 引擎的调色板模式')
+    parser.add_argument('--max_bytes', type=int, default=None, help='目标体积上限（字节），自动选择缩放、帧率与颜色数')
     
     args = parser.parse_args()
 
     # 调用转换函数
     # mp4_to_gif(args.input, args.output, args.start, args.end, args.fps, args.color_depth)
-    main(args.start, args.end, args.fps, args.color_depth)
\ No newline at end of file
+    main(args.start, args.end, args.fps, args.color_depth, args.engine, args.dither, args.palette, args.max_bytes)
\ No newline at end of file
@@ -1,86 +1,210 @@
 import os
+import re
+import shutil
 import subprocess
-from moviepy.editor import VideoFileClip
-from PIL import Image
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
-def convert_to_live_photo(input_video, output_prefix, duration=3.0, keyframe_time=0.5):
+import cv2
+
+# Live Photo 视频参数：H.264 Main@3.1、yuv420p、30fps，moov 前置便于相册快速读取
+LIVE_PHOTO_FPS = 30
+LIVE_PHOTO_VIDEO_ARGS = [
+    "-c:v", "libx264", "-preset", "fast",
+    "-profile:v", "main", "-level", "3.1", "-pix_fmt", "yuv420p",
+]
+# 批量转换时同时运行的 ffmpeg 进程数上限：x264 本身已多线程编码，进程过多只会争抢 CPU
+MAX_SEGMENT_WORKERS = 2
+
+
+def probe_duration(input_video):
+    """读取视频时长（秒），只解析容器头，不解码画面。"""
+    cap = cv2.VideoCapture(str(input_video))
+    try:
+        if not cap.isOpened():
+            raise RuntimeError(f"无法打开视频: {input_video}")
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        frames = cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0.0
+    finally:
+        cap.release()
+    if fps <= 0 or frames <= 0:
+        raise RuntimeError(f"无法读取视频时长: {input_video}")
+    return frames / fps
+
+
+def build_live_photo_command(input_video, mov_path, jpg_path, start_time, duration, keyframe_time,
+                             crop=None):
+    """
+    构建单次执行的 ffmpeg 命令：输入端截取片段，解码一次后 split 为两路，
+    一路按 Live Photo 参数编码为 MOV，另一路在关键帧时间点输出一张 JPEG 封面。
+
+    @param start_time: 片段在源视频中的起始时间（秒）
+    @param duration: 片段时长（秒）
+    @param keyframe_time: 封面相对片段起点的时间（秒）
+    @param crop: 可选裁剪区域 (x, y, w, h)，直接并入滤镜图
+    """
+    base = []
+    if crop:
+        x, y, w, h = crop
+        base.append(f"crop={int(w)}:{int(h)}:{int(x)}:{int(y)}")
+    base.append(f"fps={LIVE_PHOTO_FPS}")
+    # yuv420p 要求宽高为偶数
+    base.append("scale=trunc(iw/2)*2:trunc(ih/2)*2")
+    graph = (
+        f"[0:v]{','.join(base)},split=2[mov][key];"
+        f"[key]trim=start={keyframe_time:.3f},setpts=PTS-STARTPTS[cover]"
+    )
+    cmd = ["ffmpeg", "-y", "-hide_banner", "-loglevel", "error"]
+    if start_time > 0:
+        cmd += ["-ss", f"{start_time:.3f}"]
+    cmd += [
+        "-t", f"{duration:.3f}", "-i", str(input_video),
+        "-filter_complex", graph,
+        "-map", "[mov]", "-map", "0:a?",
+        *LIVE_PHOTO_VIDEO_ARGS,
+        "-c:a", "aac", "-movflags", "+faststart", str(mov_path),
+        "-map", "[cover]", "-frames:v", "1", "-q:v", "2", str(jpg_path),
+    ]
+    return cmd
+
+
+def convert_to_live_photo(input_video, output_prefix, duration=3.0, keyframe_time=0.5,
+                          start_time=0.0, crop=None, source_duration=None):
     """
     将视频片段转换为实况照片（JPEG + MOV）
-    
+
+    一次 ffmpeg 调用完成截取、编码与封面提取；中间文件写在输出目录下的独立临时目录中，
+    完成后再移动到最终路径，多个请求并发执行互不干扰。
+
     参数:
     input_video: 输入视频文件路径
     output_prefix: 输出文件前缀（不含扩展名）
     duration: 实况照片总时长（秒）
-    keyframe_time: 关键帧时间点（秒）
+    keyframe_time: 关键帧时间点（秒，相对片段起点）
+    start_time: 片段在源视频中的起始时间（秒）
+    crop: 可选裁剪区域 (x, y, w, h)，无需先生成裁剪视频
+    source_duration: 源视频时长（秒），为空时自动读取
+    返回:
+    (jpg 路径, mov 路径)
     """
-    # 临时文件路径
-    temp_video = "temp_cropped.mp4"
-    temp_keyframe = "temp_keyframe.jpg"
-    
+    if shutil.which("ffmpeg") is None:
+        raise RuntimeError("未检测到 ffmpeg，无法生成实况照片")
+
+    total = float(source_duration) if source_duration else probe_duration(input_video)
+    start_time = max(0.0, float(start_time or 0.0))
+    if start_time >= total:
+        raise ValueError(f"起始时间({start_time:.1f}s)超出视频长度({total:.1f}s)")
+    duration = float(duration)
+    if duration <= 0:
+        raise ValueError("实况照片时长必须大于 0")
+    if total - start_time < duration:
+        print(f"警告: 可用视频长度({total - start_time:.1f}s)小于目标时长({duration}s)")
+        duration = total - start_time
+
+    # 确保关键帧在有效范围内
+    keyframe_time = min(max(float(keyframe_time), 0.1), duration - 0.1)
+    keyframe_time = max(0.0, keyframe_time)
+
+    output_mov = f"{output_prefix}.mov"
+    output_jpg = f"{output_prefix}.jpg"
+    output_dir = os.path.dirname(os.path.abspath(output_prefix))
+    os.makedirs(output_dir, exist_ok=True)
+    temp_dir = tempfile.mkdtemp(prefix=".live-", dir=output_dir)
     try:
-        # 1. 裁剪视频到指定时长
-        clip = VideoFileClip(input_video)
-        if clip.duration < duration:
-            print(f"警告: 视频长度({clip.duration:.1f}s)小于目标时长({duration}s)")
-            duration = clip.duration
-        
-        # 确保关键帧在有效范围内
-        keyframe_time = min(max(keyframe_time, 0.1), duration - 0.1)
-        
-        # 裁剪视频
-        sub_clip = clip.subclip(0, duration)
-        sub_clip.write_videofile(
-            temp_video, 
-            codec="libx264", 
-            audio_codec="aac",
-            fps=30,
-            preset='fast',
-            logger=None
+        temp_mov = os.path.join(temp_dir, "live.mov")
+        temp_jpg = os.path.join(temp_dir, "cover.jpg")
+        cmd = build_live_photo_command(
+            input_video, temp_mov, temp_jpg, start_time, duration, keyframe_time, crop
         )
-        sub_clip.close()
-        clip.close()
-        
-        # 2. 提取关键帧作为封面
-        keyframe_clip = VideoFileClip(input_video).subclip(keyframe_time, keyframe_time+0.1)
-        keyframe_clip.save_frame(temp_keyframe, t=0)
-        keyframe_clip.close()
-        
-        # 3. 转换视频为MOV格式（苹果Live Photo兼容格式）
-        output_mov = f"{output_prefix}.mov"
-        output_jpg = f"{output_prefix}.jpg"
-        
-        subprocess.run([
-            "ffmpeg", "-y", "-i", temp_video,
-            "-c:v", "libx264", "-profile:v", "main",
-            "-level", "3.1", "-pix_fmt", "yuv420p",
-            "-movflags", "+faststart",
-            output_mov
-        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        
-        # 4. 保存关键帧为JPEG
-        img = Image.open(temp_keyframe)
-        img.save(output_jpg, "JPEG", quality=95)
-        
-        print(f"转换成功！生成文件:")
-        print(f"- 实况照片封面: {output_jpg}")
-        print(f"- 实况照片视频: {output_mov}")
-        
-    except Exception as e:
-        print(f"转换失败: {str(e)}")
+        proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if proc.returncode != 0 or not os.path.exists(temp_jpg):
+            message = proc.stderr.decode("utf-8", errors="replace").strip().splitlines()
+            raise RuntimeError(f"实况照片转换失败: {message[-1] if message else proc.returncode}")
+        os.replace(temp_mov, output_mov)
+        os.replace(temp_jpg, output_jpg)
     finally:
-        # 清理临时文件
-        for f in [temp_video, temp_keyframe]:
-            if os.path.exists(f):
-                os.remove(f)
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    print(f"转换成功！生成文件:")
+    print(f"- 实况照片封面: {output_jpg}")
+    print(f"- 实况照片视频: {output_mov}")
+    return output_jpg, output_mov
+
+
+def parse_segments(text, default_duration=3.0, default_keyframe=1.0):
+    """
+    解析批量片段，每行一个片段：起始时间,时长,封面时间点（后两项可省略，使用默认值）。
+
+    参数:
+    text: 片段文本，如 "0,3,1\n12.5,3,1.5"；也支持空白分隔
+    返回:
+    [(start, duration, keyframe_time), ...]
+    """
+    segments = []
+    for line_num, line in enumerate((text or "").splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        parts = [p for p in re.split(r"[,\s]+", line) if p]
+        if len(parts) > 3:
+            raise ValueError(f"第 {line_num} 行格式错误，应为 起始时间,时长,封面时间点: {line}")
+        try:
+            values = [float(p) for p in parts]
+        except ValueError as exc:
+            raise ValueError(f"第 {line_num} 行包含无效数字: {line}") from exc
+        start = values[0]
+        duration = values[1] if len(values) > 1 else default_duration
+        keyframe = values[2] if len(values) > 2 else default_keyframe
+        if start < 0 or duration <= 0:
+            raise ValueError(f"第 {line_num} 行的起始时间不能为负且时长必须大于 0: {line}")
+        segments.append((start, duration, keyframe))
+    return segments
+
+
+def convert_segments_to_live_photos(input_video, output_prefix, segments, crop=None, workers=None):
+    """
+    从同一视频批量生成多组实况照片：源视频只上传、探测一次，各片段在线程池中并行转换，
+    每个 ffmpeg 进程通过输入端 -ss 直接定位到自己的片段，只解码该片段的帧
+    （片段相距较远时，这比整段解码一次再 trim 出各片段更省）。
+
+    参数:
+    input_video: 输入视频文件路径
+    output_prefix: 输出文件前缀，第 i 组命名为 {output_prefix}_{i:02d}.mov/.jpg
+    segments: [(start, duration, keyframe_time), ...]
+    crop: 可选裁剪区域 (x, y, w, h)
+    workers: 并行转换数，默认且最多 MAX_SEGMENT_WORKERS
+    返回:
+    [(jpg 路径, mov 路径), ...]，顺序与 segments 一致
+    """
+    if not segments:
+        raise ValueError("没有需要转换的片段")
+    total = probe_duration(input_video)
+    workers = max(1, min(len(segments), MAX_SEGMENT_WORKERS, int(workers or MAX_SEGMENT_WORKERS)))
+
+    def convert(item):
+        index, (start, duration, keyframe_time) = item
+        return convert_to_live_photo(
+            input_video,
+            f"{output_prefix}_{index:02d}",
+            duration=duration,
+            keyframe_time=keyframe_time,
+            start_time=start,
+            crop=crop,
+            source_duration=total,
+        )
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(convert, enumerate(segments, 1)))
+
 
 if __name__ == "__main__":
     # 使用示例
     input_video = "C:\\Users\\27265\Desktop\\tmp\Script\\test\\46a04f5618757cfa9f15d3a6b81681ee.mp4"
     output_prefix = "test\\test"  # 输出文件名前缀
-    
+
     convert_to_live_photo(
         input_video,
         output_prefix,
         duration=3.0,      # 实况照片时长(建议3秒)
         keyframe_time=1.0  # 封面帧时间点
-    )
\ No newline at end of file
+    )
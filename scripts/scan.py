@@ -1,6 +1,8 @@
+import asyncio
+import errno
 import socket
 import ipaddress
-from typing import Dict, List, Optional, Set, Tuple
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 
 import scapy.all as scapy
 
@@ -104,17 +106,169 @@ def _resolve_hostname(ip: str) -> Optional[str]:
         return None
 
 
-def _check_tcp_port(ip: str, port: int, timeout: float = 0.3) -> bool:
+_PORTS_PROFILE: Tuple[int, ...] = (22, 80, 443, 554, 8000, 8080, 139, 445, 9100, 1883, 8883)
+
+# 端口探测：单次连接超时（秒）、全局同时进行的连接数、单个主机同时探测的端口数
+DEFAULT_PORT_TIMEOUT = 0.3
+DEFAULT_PROBE_CONCURRENCY = 512
+DEFAULT_HOST_CONCURRENCY = len(_PORTS_PROFILE)
+
+# 表示主机不可达的错误码：出现后该主机其余端口不再探测
+_UNREACHABLE_ERRNOS: Set[int] = {
+    code
+    for code in (
+        getattr(errno, "EHOSTUNREACH", None),
+        getattr(errno, "EHOSTDOWN", None),
+        getattr(errno, "ENETUNREACH", None),
+        getattr(errno, "WSAEHOSTUNREACH", None),
+        getattr(errno, "WSAEHOSTDOWN", None),
+        getattr(errno, "WSAENETUNREACH", None),
+    )
+    if code is not None
+}
+
+
+async def _probe_port(ip: str, port: int, timeout: float) -> Optional[bool]:
+    """
+    异步探测单个 TCP 端口。
+
+    @return: True 端口开放；False 关闭或超时；None 主机不可达
+    """
+    loop = asyncio.get_running_loop()
+    sock = None
     try:
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
-            sock.settimeout(timeout)
-            result = sock.connect_ex((ip, port))
-            return result == 0
-    except Exception:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        await asyncio.wait_for(loop.sock_connect(sock, (ip, port)), timeout)
+        return True
+    except asyncio.TimeoutError:
         return False
+    except OSError as exc:
+        return None if exc.errno in _UNREACHABLE_ERRNOS else False
+    finally:
+        if sock is not None:
+            sock.close()
+
+
+async def _probe_host(
+    ip: str,
+    ports: Tuple[int, ...],
+    timeout: float,
+    global_slots: asyncio.Semaphore,
+    per_host: int,
+) -> List[int]:
+    """探测单个主机的端口；任一端口报告主机不可达时取消其余探测，直接返回空列表。"""
+    host_slots = asyncio.Semaphore(per_host)
+
+    async def probe(port: int) -> Tuple[int, Optional[bool]]:
+        async with host_slots, global_slots:
+            return port, await _probe_port(ip, port, timeout)
+
+    tasks = [asyncio.ensure_future(probe(port)) for port in ports]
+    open_ports: Set[int] = set()
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            port, state = await next_done
+            if state is None:
+                return []
+            if state:
+                open_ports.add(port)
+    finally:
+        for task in tasks:
+            task.cancel()
+    # 保持与 ports 一致的顺序
+    return [p for p in ports if p in open_ports]
+
+
+async def probe_ports_async(
+    ips: Iterable[str],
+    ports: Tuple[int, ...] = _PORTS_PROFILE,
+    timeout: float = DEFAULT_PORT_TIMEOUT,
+    concurrency: int = DEFAULT_PROBE_CONCURRENCY,
+    per_host: int = DEFAULT_HOST_CONCURRENCY,
+) -> Dict[str, List[int]]:
+    """
+    并发探测多个主机的 TCP 端口，总耗时约等于最慢一次连接超时（连接数未超过 concurrency 时）。
+
+    @param ips: 待探测的 IPv4 地址
+    @param ports: 待探测的端口
+    @param timeout: 单次连接超时（秒）
+    @param concurrency: 全局同时进行的连接数上限
+    @param per_host: 单个主机同时探测的端口数上限
+    @return: {ip: 开放端口列表}
+    """
+    hosts = list(dict.fromkeys(ips))
+    global_slots = asyncio.Semaphore(max(1, int(concurrency)))
+    per_host = max(1, int(per_host))
+    results = await asyncio.gather(
+        *(_probe_host(ip, tuple(ports), timeout, global_slots, per_host) for ip in hosts)
+    )
+    return dict(zip(hosts, results))
+
+
+def probe_ports(
+    ips: Iterable[str],
+    ports: Tuple[int, ...] = _PORTS_PROFILE,
+    timeout: float = DEFAULT_PORT_TIMEOUT,
+    concurrency: int = DEFAULT_PROBE_CONCURRENCY,
+    per_host: int = DEFAULT_HOST_CONCURRENCY,
+) -> Dict[str, List[int]]:
+    """probe_ports_async 的同步入口（在新的事件循环中运行，不能在已运行的事件循环内调用）。"""
+    return asyncio.run(probe_ports_async(ips, ports, timeout, concurrency, per_host))
+
+
+async def _enrich_devices_async(
+    raw_devices: List[Dict[str, str]],
+    timeout: float,
+    concurrency: int,
+    per_host: int,
+) -> List[Dict[str, object]]:
+    # 端口探测与反向解析（阻塞调用，放入线程池）同时进行
+    ips = [dev["ip"] for dev in raw_devices]
+    loop = asyncio.get_running_loop()
+    hostnames_future = asyncio.gather(
+        *(loop.run_in_executor(None, _resolve_hostname, ip) for ip in ips)
+    )
+    ports_by_ip = await probe_ports_async(
+        ips, timeout=timeout, concurrency=concurrency, per_host=per_host
+    )
+    hostnames = await hostnames_future
 
-
-_PORTS_PROFILE: Tuple[int, ...] = (22, 80, 443, 554, 8000, 8080, 139, 445, 9100, 1883, 8883)
+    devices_enriched: List[Dict[str, object]] = []
+    for dev, hostname in zip(raw_devices, hostnames):
+        ip = dev["ip"]
+        open_ports = ports_by_ip.get(ip, [])
+        devices_enriched.append(
+            {
+                "ip": ip,
+                "mac": dev.get("mac"),
+                "hostname": hostname,
+                "open_ports": open_ports,
+                "category": _classify_device(hostname, open_ports),
+                "name": hostname or ip,
+            }
+        )
+    return devices_enriched
+
+
+def _enrich_devices(
+    raw_devices: List[Dict[str, str]],
+    timeout: float = DEFAULT_PORT_TIMEOUT,
+    concurrency: int = DEFAULT_PROBE_CONCURRENCY,
+    per_host: int = DEFAULT_HOST_CONCURRENCY,
+) -> List[Dict[str, object]]:
+    """为 ARP 结果补充主机名、开放端口与分类（按 IP 去重，保持发现顺序）。"""
+    seen_ips: Set[str] = set()
+    unique: List[Dict[str, str]] = []
+    for dev in raw_devices:
+        ip = dev.get("ip")
+        if not ip or ip in seen_ips:
+            continue
+        seen_ips.add(ip)
+        unique.append(dev)
+    if not unique:
+        return []
+    return asyncio.run(_enrich_devices_async(unique, timeout, concurrency, per_host))
 
 
 def _classify_device(hostname: Optional[str], open_ports: List[int]) -> str:
@@ -146,35 +300,20 @@ def _classify_device(hostname: Optional[str], open_ports: List[int]) -> str:
     return "unknown"
 
 
-def scan_lan_devices() -> Dict[str, object]:
-    """扫描当前连接的局域网内全部设备，并进行分类与整合输出。"""
+def scan_lan_devices(
+    port_timeout: float = DEFAULT_PORT_TIMEOUT,
+    concurrency: int = DEFAULT_PROBE_CONCURRENCY,
+    per_host: int = DEFAULT_HOST_CONCURRENCY,
+) -> Dict[str, object]:
+    """
+    扫描当前连接的局域网内全部设备，并进行分类与整合输出。
+    端口探测参数见 probe_ports_async。
+    """
     networks = get_all_networks()
-    seen_ips: Set[str] = set()
-    devices_enriched: List[Dict[str, object]] = []
-
+    raw_devices: List[Dict[str, str]] = []
     for cidr in networks:
-        for dev in scan_network(cidr):
-            ip = dev.get("ip")
-            mac = dev.get("mac")
-            if not ip or ip in seen_ips:
-                continue
-            seen_ips.add(ip)
-
-            hostname = _resolve_hostname(ip)
-            open_ports = [p for p in _PORTS_PROFILE if _check_tcp_port(ip, p)]
-            category = _classify_device(hostname, open_ports)
-            name = hostname or ip
-
-            devices_enriched.append(
-                {
-                    "ip": ip,
-                    "mac": mac,
-                    "hostname": hostname,
-                    "open_ports": open_ports,
-                    "category": category,
-                    "name": name,
-                }
-            )
+        raw_devices.extend(scan_network(cidr))
+    devices_enriched = _enrich_devices(raw_devices, port_timeout, concurrency, per_host)
 
     # 分组统计
     groups: Dict[str, List[Dict[str, object]]] = {
@@ -210,10 +349,16 @@ def print_devices(devices: List[Dict[str, str]]) -> None:
         print(f"{device['ip']:<20}{device['mac']:<20}")
 
 
-def scan_devices_in_ranges(network_ranges: List[str]) -> Dict[str, object]:
+def scan_devices_in_ranges(
+    network_ranges: List[str],
+    port_timeout: float = DEFAULT_PORT_TIMEOUT,
+    concurrency: int = DEFAULT_PROBE_CONCURRENCY,
+    per_host: int = DEFAULT_HOST_CONCURRENCY,
+) -> Dict[str, object]:
     """
     扫描指定的一个或多个网段（CIDR），并返回与 scan_lan_devices 相同结构的结果。
     仅使用用户显式提供的网段，不再尝试自动识别本机网段。
+    端口探测参数见 probe_ports_async。
     """
     # 规范化与去重输入的网段
     normalized: List[str] = []
@@ -237,30 +382,10 @@ def scan_devices_in_ranges(network_ranges: List[str]) -> Dict[str, object]:
             # 忽略非法输入
             continue
 
-    devices_enriched: List[Dict[str, object]] = []
-    seen_ips: Set[str] = set()
+    raw_devices: List[Dict[str, str]] = []
     for cidr in normalized:
-        for dev in scan_network(cidr):
-            ip = dev.get("ip")
-            mac = dev.get("mac")
-            if not ip or ip in seen_ips:
-                continue
-            seen_ips.add(ip)
-
-            hostname = _resolve_hostname(ip)
-            open_ports = [p for p in _PORTS_PROFILE if _check_tcp_port(ip, p)]
-            category = _classify_device(hostname, open_ports)
-            name = hostname or ip
-            devices_enriched.append(
-                {
-                    "ip": ip,
-                    "mac": mac,
-                    "hostname": hostname,
-                    "open_ports": open_ports,
-                    "category": category,
-                    "name": name,
-                }
-            )
+        raw_devices.extend(scan_network(cidr))
+    devices_enriched = _enrich_devices(raw_devices, port_timeout, concurrency, per_host)
 
     groups: Dict[str, List[Dict[str, object]]] = {
         "camera": [],
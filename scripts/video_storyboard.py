@@ -0,0 +1,254 @@
+"""
+视频故事板（联系表）生成。
+
+顺序解码一次视频：非采样帧只 grab 不解码像素，采样帧取出后立即缩小为缩略图，
+用 NumPy 拼接到预先分配的大图数组中，每张大图（sprite）包含 columns x rows 个缩略图。
+同时输出 WebVTT 缩略图轨道（`sheet.jpg#xywh=x,y,w,h`），
+播放器或前端进度条悬停时可直接按时间定位到大图中的对应区域，无需再次上传或 seek。
+"""
+import argparse
+import json
+import os
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+# 兼容直接以脚本运行与模块方式运行
+try:
+    from .frame_writer import FrameWriter
+except ImportError:
+    from frame_writer import FrameWriter  # type: ignore
+
+
+def format_vtt_time(seconds: float) -> str:
+    """将秒数格式化为 WebVTT 时间戳 HH:MM:SS.mmm。"""
+    millis = int(round(max(0.0, seconds) * 1000))
+    hours, millis = divmod(millis, 3600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}.{millis:03d}"
+
+
+def write_storyboard_vtt(vtt_path: str, cues: List[Dict]) -> None:
+    """
+    写入 WebVTT 缩略图轨道。
+
+    @param vtt_path: 输出路径
+    @param cues: 每项包含 start/end/sheet/x/y/w/h，sheet 为相对 VTT 文件的大图文件名
+    """
+    lines = ["WEBVTT", ""]
+    for cue in cues:
+        lines.append(f"{format_vtt_time(cue['start'])} --> {format_vtt_time(cue['end'])}")
+        lines.append(f"{cue['sheet']}#xywh={cue['x']},{cue['y']},{cue['w']},{cue['h']}")
+        lines.append("")
+    with open(vtt_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+
+
+def write_storyboard_index(json_path: str, result: Dict) -> None:
+    """
+    写入紧凑的 JSON 索引：只记录网格参数，前端按 index = floor(t / interval) 自行计算坐标。
+    适用于所有缩略图位于同一张大图的情况（rows 为空时生成）。
+
+    @param json_path: 输出路径
+    @param result: generate_storyboard 的返回值
+    """
+    index = {
+        "image": os.path.basename(result["sheets"][0]),
+        "vtt": os.path.basename(result["vtt"]),
+        "interval": result["interval"],
+        "duration": result["duration"],
+        "count": result["thumbnails"],
+        "columns": result["columns"],
+        "tile_width": result["tile_width"],
+        "tile_height": result["tile_height"],
+    }
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False)
+
+
+def generate_storyboard(video_path, output_dir, interval=None, columns=5, rows=5,
+                        thumb_width=160, max_thumbnails=200, filename=None,
+                        image_options=None, progress_callback=None):
+    """
+    生成故事板大图与 WebVTT 缩略图轨道。
+
+    @param video_path: 输入视频路径
+    @param output_dir: 输出目录
+    @param interval: 缩略图间隔（秒），为空时按 max_thumbnails 自动计算（至少 1 秒）
+    @param columns: 每张大图的列数
+    @param rows: 每张大图的行数，为空时所有缩略图拼在同一张大图中
+    @param thumb_width: 缩略图宽度（像素），高度按视频比例计算
+    @param max_thumbnails: 自动计算间隔时的缩略图数量上限
+    @param filename: 输出文件名前缀，默认取视频文件名（不含扩展名）
+    @param image_options: 大图编码参数（image_format/quality），传给 FrameWriter
+    @param progress_callback: progress_callback(percent, message)，percent 为 0.0～100.0
+    @return: 包含 sheets（大图路径列表）、vtt、cues、interval、thumbnails、columns、rows、
+             tile_width、tile_height、duration 的字典
+    """
+    if not os.path.isfile(video_path):
+        raise FileNotFoundError(f"视频文件不存在: {video_path}")
+    columns = max(1, int(columns))
+    thumb_width = max(16, int(thumb_width))
+    os.makedirs(output_dir, exist_ok=True)
+    if not filename:
+        filename = os.path.splitext(os.path.basename(video_path))[0]
+
+    options = dict(image_options or {})
+    # 大图数量很少，两个编码线程足够；缩放已在拼接前完成
+    writer = FrameWriter(
+        workers=2,
+        image_format=options.get("image_format"),
+        quality=options.get("quality"),
+    )
+
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        writer.close()
+        raise IOError("无法打开视频文件")
+
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    if fps <= 0 or total_frames <= 0 or width <= 0 or height <= 0:
+        cap.release()
+        writer.close()
+        raise ValueError("无法读取视频的帧率、帧数或分辨率")
+    duration = total_frames / fps
+
+    if interval is None or float(interval) <= 0:
+        interval = max(1.0, duration / max(1, int(max_thumbnails)))
+    interval = float(interval)
+    tile_w = thumb_width
+    tile_h = max(2, round(height * thumb_width / width))
+
+    # 采样帧号 -> 缩略图序号；每个缩略图取区间起点对应的帧
+    sample_frames = []
+    t = 0.0
+    while t < duration:
+        sample_frames.append(min(total_frames - 1, int(round(t * fps))))
+        t = len(sample_frames) * interval
+    total_thumbs = len(sample_frames)
+    # 行数不超过实际需要；rows 为空时全部缩略图放进一张大图
+    needed_rows = max(1, -(-total_thumbs // columns))
+    rows = needed_rows if rows is None else min(max(1, int(rows)), needed_rows)
+    per_sheet = columns * rows
+
+    print(f"视频信息: {total_frames} 帧, FPS: {fps:.2f}, 时长: {duration:.2f}秒")
+    print(f"故事板: 每 {interval:.2f} 秒一张缩略图，共 {total_thumbs} 张，"
+          f"{columns}x{rows} 拼接，缩略图 {tile_w}x{tile_h}")
+
+    sheets: List[str] = []
+    cues: List[Dict] = []
+    sheet: Optional[np.ndarray] = None
+    last_tile: Optional[np.ndarray] = None
+    frame_idx = 0
+    last_reported = -1.0
+
+    def flush_sheet(used: int) -> None:
+        # 最后一张大图只保留用到的行，提交后不再修改该数组
+        used_rows = (used + columns - 1) // columns
+        sheet_name = f"{filename}_storyboard_{len(sheets) + 1:03d}{writer.ext}"
+        sheet_path = os.path.join(output_dir, sheet_name)
+        writer.submit(sheet_path, sheet[: used_rows * tile_h])
+        sheets.append(sheet_path)
+
+    try:
+        for thumb_idx, target in enumerate(sample_frames):
+            # 顺序读取到目标帧：中间帧只 grab，不做像素转换
+            tile = None
+            while frame_idx <= target:
+                if not cap.grab():
+                    break
+                if frame_idx == target:
+                    ok, frame = cap.retrieve()
+                    if ok:
+                        tile = cv2.resize(frame, (tile_w, tile_h), interpolation=cv2.INTER_AREA)
+                frame_idx += 1
+            if tile is None:
+                # 读到文件末尾或解码失败时沿用上一张，保证轨道连续
+                if last_tile is None:
+                    break
+                tile = last_tile
+            last_tile = tile
+
+            slot = thumb_idx % per_sheet
+            if slot == 0:
+                sheet = np.zeros((rows * tile_h, columns * tile_w, 3), dtype=np.uint8)
+            x = (slot % columns) * tile_w
+            y = (slot // columns) * tile_h
+            sheet[y : y + tile_h, x : x + tile_w] = tile
+            cues.append({
+                "start": thumb_idx * interval,
+                "end": min(duration, (thumb_idx + 1) * interval),
+                "sheet": f"{filename}_storyboard_{len(sheets) + 1:03d}{writer.ext}",
+                "x": x, "y": y, "w": tile_w, "h": tile_h,
+            })
+            if slot == per_sheet - 1:
+                flush_sheet(per_sheet)
+                sheet = None
+
+            if progress_callback:
+                percent = (thumb_idx + 1) / total_thumbs * 100.0
+                if percent - last_reported >= 5.0 or thumb_idx + 1 == total_thumbs:
+                    last_reported = percent
+                    progress_callback(percent, f"已生成 {thumb_idx + 1}/{total_thumbs} 张缩略图")
+
+        if sheet is not None and cues:
+            flush_sheet(len(cues) - len(sheets) * per_sheet)
+    finally:
+        cap.release()
+        writer.close()
+
+    if writer.failed:
+        raise IOError(f"故事板大图写入失败: {writer.errors[0]}")
+    if not cues:
+        raise ValueError("未能从视频中读取任何帧")
+
+    vtt_path = os.path.join(output_dir, f"{filename}_storyboard.vtt")
+    write_storyboard_vtt(vtt_path, cues)
+    print(f"完成! 共 {len(cues)} 张缩略图，{len(sheets)} 张大图，轨道: {vtt_path}")
+
+    return {
+        "sheets": sheets,
+        "vtt": vtt_path,
+        "cues": cues,
+        "interval": interval,
+        "thumbnails": len(cues),
+        "columns": columns,
+        "rows": rows,
+        "tile_width": tile_w,
+        "tile_height": tile_h,
+        "duration": duration,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="生成视频故事板（缩略图大图 + WebVTT 缩略图轨道）",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument("--video_path", required=True, help="输入视频路径")
+    parser.add_argument("--output_dir", default="storyboard", help="输出目录路径")
+    parser.add_argument("--interval", type=float, default=None, help="缩略图间隔（秒），默认按 max_thumbnails 自动计算")
+    parser.add_argument("--columns", type=int, default=5, help="每张大图的列数")
+    parser.add_argument("--rows", type=int, default=5, help="每张大图的行数")
+    parser.add_argument("--thumb_width", type=int, default=160, help="缩略图宽度（像素）")
+    parser.add_argument("--max_thumbnails", type=int, default=200, help="自动计算间隔时的缩略图数量上限")
+    parser.add_argument("--image_format", default="jpg", choices=["jpg", "webp", "png"], help="大图格式")
+    parser.add_argument("--quality", type=int, default=None, help="编码质量 1-100")
+
+    args = parser.parse_args()
+
+    generate_storyboard(
+        video_path=args.video_path,
+        output_dir=args.output_dir,
+        interval=args.interval,
+        columns=args.columns,
+        rows=args.rows,
+        thumb_width=args.thumb_width,
+        max_thumbnails=args.max_thumbnails,
+        image_options={"image_format": args.image_format, "quality": args.quality},
+    )
@@ -1,9 +1,17 @@
 import cv2
 import os
+import sys
 import numpy as np
 import glob
 import argparse
 
+# 兼容直接以脚本运行与模块方式运行
+try:
+    from ..frame_shards import TarShardWriter
+except ImportError:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from frame_shards import TarShardWriter  # type: ignore
+
 def find_image_file(image_dir, base_name):
     """
     在图像目录中查找与基础名称匹配的图像文件
@@ -35,7 +43,8 @@ def find_image_file(image_dir, base_name):
     
     return None
 
-def visualize_annotations(annotation_path, image_dir, output_dir, output_suffix="_annotated", class_names=None):
+def visualize_annotations(annotation_path, image_dir, output_dir, output_suffix="_annotated", class_names=None,
+                          writer=None):
     """
     在原始图像上可视化标注边界框
     
@@ -45,6 +54,7 @@ def visualize_annotations(annotation_path, image_dir, output_dir, output_suffix=
         output_dir: 输出目录
         output_suffix: 输出图像文件名后缀
         class_names: 类别名称列表（可选）
+        writer: 可选的分片写入器（如 TarShardWriter），提供时结果写入分片而非单独文件
     """
     # 获取标注文件的基础名称（不含扩展名）
     base_name = os.path.splitext(os.path.basename(annotation_path))[0]
@@ -146,11 +156,15 @@ def visualize_annotations(annotation_path, image_dir, output_dir, output_suffix=
     output_path = os.path.join(output_dir, output_filename)
     
     # 保存结果图像
+    if writer is not None:
+        writer.submit(output_path, image, {"annotation": os.path.basename(annotation_path)})
+        return output_path
     cv2.imwrite(output_path, image)
     print(f"标注可视化结果已保存至: {output_path}")
     return output_path
 
-def process_all_annotations(annotations_dir, images_dir, output_dir, output_suffix="_annotated", class_names=None):
+def process_all_annotations(annotations_dir, images_dir, output_dir, output_suffix="_annotated", class_names=None,
+                            output_mode="files", shard_size_mb=256):
     """
     处理目录中的所有标注文件
     
@@ -160,7 +174,11 @@ def process_all_annotations(annotations_dir, images_dir, output_dir, output_suff
         output_dir: 输出目录
         output_suffix: 输出图像文件名后缀
         class_names: 类别名称列表（可选）
+        output_mode: files（逐张图片）或 tar（WebDataset 风格 tar 分片，统一编码为 jpg）
+        shard_size_mb: tar 分片的目标大小（MB）
     """
+    if output_mode not in ("files", "tar"):
+        raise ValueError(f"不支持的输出模式: {output_mode}，可选: files, tar")
     # 获取所有标注文件
     annotation_files = [f for f in os.listdir(annotations_dir) if f.endswith('.txt')]
     
@@ -172,22 +190,32 @@ def process_all_annotations(annotations_dir, images_dir, output_dir, output_suff
     
     processed_count = 0
     skipped_count = 0
+    writer = None
+    if output_mode == "tar":
+        writer = TarShardWriter(output_dir, "label_vis", shard_size_mb=shard_size_mb)
     
-    # 处理每个标注文件
-    for annotation_file in annotation_files:
-        annotation_path = os.path.join(annotations_dir, annotation_file)
-        result = visualize_annotations(
-            annotation_path, 
-            images_dir, 
-            output_dir, 
-            output_suffix, 
-            class_names
-        )
-        
-        if result:
-            processed_count += 1
-        else:
-            skipped_count += 1
+    # 处理每个标注文件（分片模式按文件名排序，保证分片内顺序稳定）
+    try:
+        for annotation_file in sorted(annotation_files):
+            annotation_path = os.path.join(annotations_dir, annotation_file)
+            result = visualize_annotations(
+                annotation_path, 
+                images_dir, 
+                output_dir, 
+                output_suffix, 
+                class_names,
+                writer=writer
+            )
+            
+            if result:
+                processed_count += 1
+            else:
+                skipped_count += 1
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is not None:
+        print(f"已写入 {len(writer.outputs)} 个 tar 分片")
     
     print("\n处理完成!")
     print(f"成功处理: {processed_count} 个文件")
@@ -207,6 +235,10 @@ if __name__ == "__main__":
                         help='输出文件后缀 (默认: "_annotated")')
     parser.add_argument('--class_names', type=str, nargs='+', default="0 1",
                         help='类别名称列表 (空格分隔)')
+    parser.add_argument('--output_mode', type=str, default="files", choices=["files", "tar"],
+                        help='输出方式：逐张图片或 tar 分片（WebDataset）')
+    parser.add_argument('--shard_size_mb', type=float, default=256,
+                        help='tar 分片的目标大小（MB）')
     
     args = parser.parse_args()
     
@@ -220,5 +252,7 @@ if __name__ == "__main__":
         images_dir=args.images,
         output_dir=args.output,
         output_suffix=args.suffix,
-        class_names=class_names
+        class_names=class_names,
+        output_mode=args.output_mode,
+        shard_size_mb=args.shard_size_mb
     )
\ No newline at end of file
@@ -0,0 +1,80 @@
+import os
+import sys
+import argparse
+
+# 兼容直接以脚本运行与模块方式运行
+try:
+    from ..frame_shards import TarShardWriter, sample_key
+except ImportError:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from frame_shards import TarShardWriter, sample_key  # type: ignore
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+def pack_yolo_shards(images_dir, labels_dir, output_dir, prefix="dataset", shard_size_mb=256,
+                     list_file=None):
+    """
+    把 YOLO 数据集打包为 WebDataset 风格的 tar 分片：每个样本包含原图（不重新编码）与同名 txt 标签，
+    训练时可顺序流式读取，避免大量小文件。
+
+    参数:
+        images_dir: 图像目录
+        labels_dir: YOLO txt 标签目录（缺少标签的图片写入空标签，视为负样本）
+        output_dir: 分片输出目录
+        prefix: 分片文件名前缀，分片命名为 {prefix}-000000.tar
+        shard_size_mb: 单个分片的目标大小（MB）
+        list_file: 可选的划分列表（如 split_train_val.py 生成的 train.txt，每行一个文件名），只打包列表中的样本
+    返回:
+        (分片路径列表, 样本数)
+    """
+    names = sorted(f for f in os.listdir(images_dir) if f.lower().endswith(IMAGE_EXTENSIONS))
+    if list_file:
+        with open(list_file, 'r', encoding='utf-8') as f:
+            wanted = {line.strip() for line in f if line.strip()}
+        names = [n for n in names if os.path.splitext(n)[0] in wanted]
+    if not names:
+        raise FileNotFoundError(f"在 {images_dir} 中没有找到需要打包的图像")
+
+    writer = TarShardWriter(output_dir, prefix, shard_size_mb=shard_size_mb, workers=1)
+    missing_labels = 0
+    try:
+        for name in names:
+            stem, ext = os.path.splitext(name)
+            with open(os.path.join(images_dir, name), 'rb') as f:
+                image_bytes = f.read()
+            label_path = os.path.join(labels_dir, stem + '.txt')
+            if os.path.exists(label_path):
+                with open(label_path, 'rb') as f:
+                    label_bytes = f.read()
+            else:
+                label_bytes = b''
+                missing_labels += 1
+            writer.add_sample(sample_key(name), {ext.lower(): image_bytes, '.txt': label_bytes})
+    finally:
+        writer.close()
+
+    print(f"打包完成: {len(names)} 个样本，{len(writer.outputs)} 个分片，输出目录: {output_dir}")
+    if missing_labels:
+        print(f"提示: {missing_labels} 张图片没有对应标签，已写入空标签")
+    return writer.outputs, len(names)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='把 YOLO 数据集打包为 tar 分片（WebDataset）')
+    parser.add_argument('--images', type=str, default="./data/dataset/images", help='图像文件目录路径')
+    parser.add_argument('--labels', type=str, default="./data/dataset/labels", help='YOLO 标签目录路径')
+    parser.add_argument('--output', type=str, default="shards", help='分片输出目录')
+    parser.add_argument('--prefix', type=str, default="dataset", help='分片文件名前缀')
+    parser.add_argument('--shard_size_mb', type=float, default=256, help='单个分片的目标大小（MB）')
+    parser.add_argument('--list_file', type=str, default=None, help='可选：只打包该列表中的样本（如 ImageSets/Main/train.txt）')
+
+    args = parser.parse_args()
+    pack_yolo_shards(
+        images_dir=args.images,
+        labels_dir=args.labels,
+        output_dir=args.output,
+        prefix=args.prefix,
+        shard_size_mb=args.shard_size_mb,
+        list_file=args.list_file
+    )